@@ -0,0 +1,132 @@
+import os
+import csv
+import time
+import argparse
+import multiprocessing
+
+#no window or sound card needed in the workers
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from scripts.assets import load_assets, load_sounds
+from scripts.bots import BotInput
+from scripts.entities import ScriptedInput, BATTLE_MAPS
+from scripts.fighters import MAX_FIGHTERS
+from scripts.levels import MapCache
+from scripts.matchstats import ROUND_COLUMNS, StatsSummary
+from scripts.simulation import Simulation, TICK_RATE
+
+STATS_PATH = 'data/stats/'
+COLUMNS = ['match', 'seed', 'round'] + ROUND_COLUMNS
+#three minutes of play a match
+MATCH_TICKS = 3 * 60 * TICK_RATE
+#rows written between flushes, so a killed run still leaves most of its results
+FLUSH_ROWS = 256
+
+#plays lots of seeded headless matches on every core for balance numbers. Every round (a match
+#goes on to the next map whenever one is taken) is a row in a csv that's written as matches
+#finish, with a per map and per weapon summary printed at the end
+
+#one per worker process: assets, sounds and parsed maps are loaded once and shared by every
+#match the worker plays (nav graphs too, scripts/navgraph.py keeps them per process). The last
+#bots players are bots, the rest mash keys
+class MatchWorker:
+    def __init__(self, players, ticks, bots=0):
+        pygame.display.init()
+        if not pygame.display.get_surface():
+            pygame.display.set_mode((1, 1))
+        self.assets = load_assets()
+        self.sfx = load_sounds()
+        self.maps = MapCache()
+        self.players = players
+        self.ticks = ticks
+        self.bots = min(bots, players)
+
+    #a match from map_id, returns its rounds as rows
+    def play(self, match, seed, map_id):
+        sim = Simulation(self.assets, self.sfx, level=map_id, seed=seed, players=self.players, maps=self.maps)
+        sim.battle_manager.current_map = map_id
+        scripted = self.players - self.bots
+        controllers = [ScriptedInput(seed * MAX_FIGHTERS + i) for i in range(scripted)]
+        controllers += [BotInput(sim, i) for i in range(scripted, self.players)]
+        rows = []
+        for tick in range(self.ticks):
+            sim.step([controller.update() for controller in controllers])
+            if sim.stats.ended:
+                rows.append(sim.stats.end_round())
+        if sim.tick_count > sim.stats.start_tick:
+            rows.append(sim.stats.end_round())
+        for i, row in enumerate(rows):
+            row.update(match=match, seed=seed, round=i)
+        return rows
+
+worker = None
+
+def init_worker(players, ticks, bots=0):
+    global worker
+    worker = MatchWorker(players, ticks, bots)
+
+def play_match(spec):
+    return worker.play(*spec)
+
+def new_stats_path():
+    os.makedirs(STATS_PATH, exist_ok=True)
+    return STATS_PATH + time.strftime('batch-%Y%m%d-%H%M%S') + '.csv'
+
+def summarize_file(path):
+    summary = StatsSummary()
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            summary.add(row)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='play seeded headless matches on every core and collect balance statistics')
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--bots', type=int, default=0, help='how many of the players (the last ones) are bots instead of random key mashing')
+    parser.add_argument('--ticks', type=int, default=MATCH_TICKS, help='length of each match in ticks (60 a second)')
+    parser.add_argument('--maps', type=int, nargs='*', help='maps the matches start on, in turn. Defaults to every map a match goes through')
+    parser.add_argument('--seed', type=int, default=1, help='match n is played with seed + n')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', help='csv to write, defaults to a new file in ' + STATS_PATH)
+    parser.add_argument('--summary', help='only print the summary of an existing csv')
+    args = parser.parse_args()
+
+    if args.summary:
+        print(summarize_file(args.summary).report(TICK_RATE))
+        return
+
+    maps = args.maps if args.maps else BATTLE_MAPS
+    specs = [(match, args.seed + match, maps[match % len(maps)]) for match in range(args.matches)]
+    path = args.out if args.out else new_stats_path()
+    summary = StatsSummary()
+    start = time.perf_counter()
+    done = 0
+    unflushed = 0
+
+    with open(path, 'w', newline='') as f, multiprocessing.Pool(args.workers, init_worker, (args.players, args.ticks, args.bots)) as pool:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        for rows in pool.imap_unordered(play_match, specs):
+            writer.writerows(rows)
+            for row in rows:
+                summary.add(row)
+            done += 1
+            unflushed += len(rows)
+            if unflushed >= FLUSH_ROWS:
+                f.flush()
+                unflushed = 0
+            print(f"\r{done}/{len(specs)} matches, {time.perf_counter() - start:.0f}s", end='', flush=True)
+        #let the workers run out of work and exit, the terminate() leaving the with block does
+        #otherwise hangs: SDL catches the SIGTERM it sends in the workers
+        pool.close()
+        pool.join()
+
+    print(f"\nwrote {summary.rounds} rounds to {path}\n")
+    print(summary.report(TICK_RATE))
+
+if __name__ == '__main__':
+    main()
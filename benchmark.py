@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+
+#no window or sound card needed, everything renders into the dummy drivers
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from game import Game
+from scripts.entities import ScriptedInput, ACTION_ATTACK_PRESSED, WEAPON_GUN
+from scripts.assets import Prefetcher
+from scripts.levels import LevelLoader
+from scripts.replay import ReplayPlayer, read_replay
+
+BASELINE_PATH = 'benchmarks/baselines.json'
+GUN_INTERVAL = 90
+SUBSYSTEMS = ['tilemap_render', 'physics', 'projectiles', 'particles', 'silhouette', 'scale']
+
+#runs a deterministic match on every map and times each subsystem per frame. Timings only mean
+#something on the machine they came from, so the baseline is written locally (--save-baseline)
+#and only compared against with --check, where a regression fails loudly (exit code 1)
+def map_ids():
+    return sorted(int(os.path.basename(path)[:-5]) for path in glob.glob('data/maps/*.json'))
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+#same work as one Game.run frame (one tick at 60fps), split up so each piece gets its own timer.
+#next_actions(tick) is called right after the tick starts and returns every player's actions
+def run_ticks(game, ticks, next_actions, after_tick=None):
+    sim = game.sim
+    timings = {name: [] for name in SUBSYSTEMS}
+    clock = time.perf_counter_ns
+
+    for tick in range(ticks):
+        game.display.fill((0, 0, 0, 0))
+        game.display_2.blit(game.assets['background'], (0, 0))
+
+        sim.begin_tick()
+        actions = next_actions(tick)
+
+        start = clock()
+        sim.update_players(actions)
+        timings['physics'].append(clock() - start)
+        sim.battle_manager.update()
+
+        start = clock()
+        sim.update_projectiles()
+        timings['projectiles'].append(clock() - start)
+
+        start = clock()
+        sim.update_particles()
+        timings['particles'].append(clock() - start)
+        if after_tick:
+            after_tick()
+
+        game.clouds.update()
+        game.update_camera()
+        render_scroll = (int(game.scroll[0]), int(game.scroll[1]))
+        game.clouds.render(game.display_2, offset=render_scroll)
+        game.outliner.begin()
+        game.dirty_rects = game.render_effects(render_scroll)
+
+        start = clock()
+        sim.tilemap.render(game.display, offset=render_scroll)
+        timings['tilemap_render'].append(clock() - start)
+
+        game.dirty_rects.extend(sim.fighters.render(game.display, offset=render_scroll))
+
+        start = clock()
+        game.render_silhouette(render_scroll)
+        timings['silhouette'].append(clock() - start)
+
+        game.display_2.blit(game.display, (0, 0))
+        start = clock()
+        game.present()
+        timings['scale'].append(clock() - start)
+
+    return timings
+
+#a deterministic scripted match on one map
+def run_map(game, map_id, ticks, seed):
+    sim = game.sim
+    sim.reseed(seed)
+    sim.battle_manager.current_map = max(0, map_id)
+    sim.load_level(map_id)
+    controllers = [ScriptedInput(seed * 10 + i) for i in range(len(sim.fighters))]
+
+    def next_actions(tick):
+        actions = [controller.update() for controller in controllers]
+        #hand out guns now and then so the projectile path gets real work. Attacks only go off on
+        #a press, so the players pull the trigger right away
+        if tick % GUN_INTERVAL == GUN_INTERVAL - 1:
+            for i in range(len(sim.fighters)):
+                sim.fighters.change_weapon(i, WEAPON_GUN)
+            actions = [player_actions | ACTION_ATTACK_PRESSED for player_actions in actions]
+        return actions
+    return run_ticks(game, ticks, next_actions)
+
+#a recorded session as the workload, on a fresh simulation from the replay's seed. Still checks
+#the checkpoints, a desynced replay isn't timing the match it recorded
+def run_replay(game, replay):
+    game.sim = game.create_simulation(replay.seed, replay.level, replay.players)
+    player = ReplayPlayer(replay, game.sim)
+    timings = run_ticks(game, replay.ticks, lambda tick: player.next_actions(), player.verify)
+    return timings, player.desync
+
+#how long a map change holds up the frame: loading the map on the spot (what load_level used
+#to do) against swapping in one the background loader already prepared
+def time_level_loads(sim, map_ids):
+    loader = LevelLoader(sim, Prefetcher())
+    for map_id in map_ids:
+        loader.take(map_id)
+        loader.prefetch([map_id])
+        loader.prefetcher.wait()
+        loader.take(map_id)
+    timings = {}
+    for map_id, mode, ms in loader.history:
+        timings.setdefault(map_id, {})[mode] = ms
+    return timings
+
+def summarize(samples):
+    return {
+        'mean': sum(samples) / len(samples) / 1e6,
+        'p95': percentile(samples, 95) / 1e6,
+        'p99': percentile(samples, 99) / 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='headless per-subsystem frame time benchmark over every map')
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--maps', type=int, nargs='*', help='map ids to run, defaults to every data/maps/*.json')
+    parser.add_argument('--players', type=int, default=2, help='players in each scripted match, results for anything but 2 are keyed <map>@<players>p')
+    parser.add_argument('--replays', nargs='*', default=[], help='recorded .rpl sessions to time as well, keyed replay:<file name>')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='results saved on this machine to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write these results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='fail if anything got slower than the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown over the baseline, 0.5 = 50%%')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='ignore slowdowns smaller than this many ms')
+    args = parser.parse_args()
+
+    game = Game(players=args.players)
+    results = {}
+    maps = args.maps if args.maps else map_ids()
+    suffix = '' if args.players == 2 else f"@{args.players}p"
+    for map_id in maps:
+        timings = run_map(game, map_id, args.ticks, args.seed)
+        results[str(map_id) + suffix] = {name: summarize(samples) for name, samples in timings.items()}
+    desyncs = []
+    for path in args.replays:
+        timings, desync = run_replay(game, read_replay(path))
+        results['replay:' + os.path.basename(path)] = {name: summarize(samples) for name, samples in timings.items()}
+        if desync is not None:
+            desyncs.append(f"{path} desynced at tick {desync}")
+
+    baseline = {}
+    if args.check:
+        if not os.path.exists(args.baseline):
+            parser.error(f"no baseline at {args.baseline}, run with --save-baseline on this machine first")
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    regressions = []
+    width = max(4, max(len(key) for key in results))
+    print(f"{'map':>{width}} {'subsystem':<15} {'mean ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'base p95':>9}")
+    for map_id, subsystems in results.items():
+        for name, stats in subsystems.items():
+            base = baseline.get(map_id, {}).get(name)
+            base_p95 = f"{base['p95']:9.4f}" if base else f"{'-':>9}"
+            print(f"{map_id:>{width}} {name:<15} {stats['mean']:9.4f} {stats['p95']:9.4f} {stats['p99']:9.4f} {base_p95}")
+            if base:
+                for key in ('mean', 'p95'):
+                    if stats[key] > base[key] * (1 + args.tolerance) and stats[key] - base[key] > args.min_delta:
+                        regressions.append(f"map {map_id} {name} {key}: {stats[key]:.4f}ms vs baseline {base[key]:.4f}ms")
+
+    print(f"\n{'map':>4} {'sync load ms':>13} {'swap ms':>9}")
+    for map_id, modes in time_level_loads(game.sim, maps).items():
+        print(f"{map_id:>4} {modes['sync']:13.3f} {modes['swap']:9.4f}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline to {args.baseline}")
+
+    if regressions or desyncs:
+        print('\nREGRESSIONS:')
+        for line in regressions + desyncs:
+            print('  ' + line)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
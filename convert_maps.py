@@ -0,0 +1,139 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from scripts.tilemap import Tilemap
+from scripts.mapformat import MapData, MAP_EXT, read_map, write_map, source_crc
+from scripts.navgraph import build_graph, write_graph, nav_path
+
+MAP_DIR = 'data/maps/'
+
+#converts the maps between the editable json and the binary format, both ways, and checks the
+#round trip gives back exactly what went in (same tiles, same offgrid order, ints stay ints)
+def same(a, b):
+    if type(a) != type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+def load_json(path):
+    f = open(path, 'r')
+    map_data = json.load(f)
+    f.close()
+    return map_data
+
+def save_json(path, map_data):
+    f = open(path, 'w')
+    json.dump(map_data, f)
+    f.close()
+
+#json -> binary, then reads the binary back and compares against the json. The binary records
+#the json's checksum, the game only loads it while the two still match
+def to_binary(json_path):
+    map_data = load_json(json_path)
+    map_path = json_path[:-5] + MAP_EXT
+    write_map(map_path, MapData.from_json(map_data), source_crc(json_path))
+    return map_path, same(read_map(map_path).to_json(), map_data)
+
+#binary -> json, then packs the json again and compares what the two binaries decode to. The
+#binary is stamped with the new json's checksum so the game keeps loading it
+def to_json(map_path):
+    json_path = map_path[:-len(MAP_EXT)] + '.json'
+    data = read_map(map_path)
+    original = data.to_json()
+    save_json(json_path, original)
+    write_map(map_path, data, source_crc(json_path))
+    check_path = os.path.join(tempfile.gettempdir(), 'roundtrip' + MAP_EXT)
+    write_map(check_path, MapData.from_json(load_json(json_path)))
+    repacked = read_map(check_path).to_json()
+    os.remove(check_path)
+    return json_path, same(repacked, original)
+
+#the bots' nav graph for a map (scripts/navgraph.py), written next to it. The game builds any
+#that are missing or stale on its own, this just saves doing it mid match
+def to_nav(path):
+    tilemap = Tilemap(None, assets=False)
+    tilemap.load(path)
+    graph = build_graph(tilemap)
+    out_path = nav_path(os.path.basename(path).split('.')[0])
+    write_graph(out_path, graph)
+    return out_path, graph
+
+#load time (best of a few) and peak python allocations of Tilemap.load for one file
+def measure_load(path, repeats=5):
+    tilemap = Tilemap(None, assets=False)
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        tilemap.load(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    tilemap.load(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1000, peak / 1024
+
+#a size x size map of random stone/grass, to see how both formats scale past the shipped maps
+def write_large_map(folder, size):
+    rng = random.Random(size)
+    tiles = [(x, y, rng.choice(['stone', 'grass']), rng.randrange(9)) for x in range(size) for y in range(size) if rng.random() < 0.6]
+    data = MapData.from_tiles(16, tiles, [{'type': 'large_decor', 'variant': 2, 'pos': [rng.random() * size * 16, rng.random() * size * 16]} for i in range(size)])
+    json_path = os.path.join(folder, 'large.json')
+    save_json(json_path, data.to_json())
+    write_map(os.path.join(folder, 'large' + MAP_EXT), data)
+    return json_path
+
+def report(json_path):
+    map_path = json_path[:-5] + MAP_EXT
+    json_ms, json_kb = measure_load(json_path)
+    map_ms, map_kb = measure_load(map_path)
+    print(f"{os.path.basename(json_path)[:-5]:>6} {os.path.getsize(json_path) / 1024:9.1f} {os.path.getsize(map_path) / 1024:9.1f} "
+          f"{json_ms:9.3f} {map_ms:9.3f} {json_kb:10.1f} {map_kb:10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='convert maps between json and the binary .map format and verify the round trip')
+    parser.add_argument('paths', nargs='*', help='maps to convert, defaults to everything in ' + MAP_DIR)
+    parser.add_argument('--to-json', action='store_true', help='convert .map files back to json instead')
+    parser.add_argument('--nav', action='store_true', help='also rebuild the nav graphs the bots walk')
+    parser.add_argument('--stats', action='store_true', help='compare file size, load time and peak memory of both formats')
+    parser.add_argument('--large', type=int, default=0, help='also measure a generated map this many tiles square (with --stats)')
+    args = parser.parse_args()
+
+    ext = MAP_EXT if args.to_json else '.json'
+    paths = args.paths if args.paths else sorted(glob.glob(MAP_DIR + '*' + ext))
+    failed = []
+    for path in paths:
+        out_path, ok = to_json(path) if args.to_json else to_binary(path)
+        print(f"{path} -> {out_path} {'ok' if ok else 'ROUND TRIP MISMATCH'}")
+        if not ok:
+            failed.append(path)
+        if args.nav:
+            nav_out, graph = to_nav(out_path if args.to_json else path)
+            print(f"{path} -> {nav_out} {len(graph.nodes)} nodes, {graph.edges.size} moves")
+
+    if args.stats:
+        json_paths = [path[:-len(MAP_EXT)] + '.json' for path in paths] if args.to_json else paths
+        print(f"\n{'map':>6} {'json KB':>9} {'map KB':>9} {'json ms':>9} {'map ms':>9} {'json peak':>10} {'map peak':>10}")
+        for json_path in json_paths:
+            report(json_path)
+        if args.large:
+            folder = tempfile.mkdtemp()
+            report(write_large_map(folder, args.large))
+            shutil.rmtree(folder)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
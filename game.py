@@ -1,277 +1,280 @@
-import os
-import sys
-import math
-import random
-
-import pygame
-
-from scripts.utils import load_image, load_images, Animation
-from scripts.entities import  Player,InputHandler,BattleManager
-from scripts.tilemap import Tilemap
-from scripts.clouds import Clouds
-from scripts.effects import EffectGenerator
-
-class Game:
-    def __init__(self):
-        pygame.init()
-        
-        pygame.display.set_caption('Ninja Clash')
-        self.screen = pygame.display.set_mode((900, 600))
-        self.display = pygame.Surface((320, 240), pygame.SRCALPHA)
-        self.display_2 = pygame.Surface((320, 240))
-        self.clock = pygame.time.Clock()
-        self.assets = {
-            'decor': load_images('tiles/decor'),
-            'grass': load_images('tiles/grass'),
-            'large_decor': load_images('tiles/large_decor'),
-            'stone': load_images('tiles/stone'),
-            'clouds': load_images('clouds'),
-            'background': load_image('background.png'),
-            'pause_screen': load_image('pause_screen.png'),
-            'pauseFill': load_image('pauseFill.png'),
-            'gunTile': load_images('tiles/gun'),
-            'transition': load_images('tiles/transition'),
-            'particle/leaf': Animation(load_images('particles/leaf'), img_dur=20, loop=False),
-            'particle/particle': Animation(load_images('particles/particle'), img_dur=6, loop=False),
-            'particle/blood':Animation(load_images('particles/blood'), img_dur=6, loop=False),
-            
-            'player1': load_image('entities/player1/player1.png'),
-            'player1/idle': Animation(load_images('entities/player1/idle'), img_dur=6),
-            'player1/run': Animation(load_images('entities/player1/run'), img_dur=4),
-            'player1/jump': Animation(load_images('entities/player1/jump')),
-            'player1/slide': Animation(load_images('entities/player1/slide')),
-            'player1/wall_slide': Animation(load_images('entities/player1/wall_slide')),
-            
-            'player2' : load_image('entities/player2/player2.png'),
-            'player2/idle': Animation(load_images('entities/player2/idle'), img_dur=6),
-            'player2/run': Animation(load_images('entities/player2/run'), img_dur=4),
-            'player2/jump': Animation(load_images('entities/player2/jump')),
-            'player2/slide': Animation(load_images('entities/player2/slide')),
-            'player2/wall_slide': Animation(load_images('entities/player2/wall_slide')),
-            
-            'gunImg': load_image('gun.png'),
-            'sword': load_image('sword.png'),
-            'projectile': load_image('projectile.png'),
-        }
-        self.sfx = {
-            'jump': pygame.mixer.Sound('data/sfx/jump.wav'),
-            'dash': pygame.mixer.Sound('data/sfx/dash.wav'),
-            'damage': pygame.mixer.Sound('data/sfx/damage.wav'),
-            'hit': pygame.mixer.Sound('data/sfx/hit.wav'),
-            'shoot': pygame.mixer.Sound('data/sfx/shoot.wav'),
-            'pickup': pygame.mixer.Sound('data/sfx/pickup.wav'),
-            'ambience': pygame.mixer.Sound('data/sfx/ambience.wav'),
-            'transition': pygame.mixer.Sound('data/sfx/transition.wav'),
-        }
-        self.player1_controls = {
-                                'left' : pygame.K_a,
-                                'right' : pygame.K_d,
-                                'jump' : pygame.K_w,
-                                'dash' : pygame.K_e,
-                                'attack' : pygame.K_SPACE,
-                                'pause' : pygame.K_ESCAPE
-                            }
-        self.player2_controls = {
-                                'left' : pygame.K_LEFT,
-                                'right' : pygame.K_RIGHT,
-                                'jump' : pygame.K_UP,
-                                'dash' : pygame.K_m,
-                                'attack' : pygame.K_RSHIFT,
-                                'pause' : pygame.K_ESCAPE
-                            }
-        self.players = []
-        self.projectiles = []
-        self.particles = []
-        self.sparks = []
-        self.scroll = [0, 0]
-        
-           
-        # self.sfx['damage'].set_volume(0.2)
-        # self.sfx['shoot'].set_volume(0.4)
-        # self.sfx['hit'].set_volume(0.8)
-        # self.sfx['dash'].set_volume(0.3)
-        # self.sfx['pickup'].set_volume(0.7)
-        # self.sfx['jump'].set_volume(0.7)
-        
-        self.tilemap = Tilemap(self, tile_size=16)
-        self.clouds = Clouds(self.assets['clouds'], count=16)
-        self.player1 = self.create_player((50, 50), (8, 15), 'player1')
-        self.player2 = self.create_player((50, 400), (8, 15), 'player2')
-        self.player1_input = InputHandler(self.player1_controls, self.player1)
-        self.player2_input = InputHandler(self.player2_controls, self.player2)
-        self.battle_manager = BattleManager(self, self.player1, self.player2)
-        self.level = -1 #main menu screen
-        self.paused = False
-        self.load_level(self.level)
-        self.transition = 0
-        self.screenshake = 0 
-        self.main_menu = True
-        self.effects = EffectGenerator(self, self.assets, self.transition)
-    
-    def next_map_effect(self):
-        self.transition = min(30, self.transition + 1)  
-    
-    #I shouldve always been adding players to a list.. implemented this for weapon manager
-    def create_player(self, pos, size, entity):
-        player = Player(self, pos, size, entity)
-        self.players.append(player)
-        return player
-    
-    #loads the level. If it tries to load a map that doesn't exist, load main menu instead
-    #handles all the extracting of spawners for players, leaves, and creates the lists for projectiles, sparks, ect
-    def load_level(self, map_id):
-        self.main_menu = True if map_id == -1 else False
-        try:
-            self.tilemap.load('data/maps/' + str(map_id) + '.json')
-            
-        except Exception as e:
-            self.tilemap.load('data/maps/-1.json')
-            print(f"Failed to load map {map_id}, sent to main menu!")
-            
-        try:
-            pygame.mixer.music.load('data/game_music/' + str(map_id) + '.wav')
-            pygame.mixer.music.set_volume(0.5)
-            pygame.mixer.music.play(-1)
-            
-        except Exception as e:
-            print(f"Failed to load {'data/game_music/' + str(map_id) + '.wav'}") 
-            
-        self.leaf_spawners = []
-        self.particles = []
-        self.sparks = []
-        self.scroll = [0, 0]
-        self.ispause = False
-        
-        for tree in self.tilemap.extract([('large_decor', 2)], keep=True):
-            self.leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))
-        
-        #extracts player location based on off grid tiles   
-        for spawner in self.tilemap.extract([('spawners', 0), ('spawners', 1), ('spawners', 2)]):
-            if spawner['variant'] == 0:
-                self.player1.pos = list(spawner['pos'])
-                self.player1.respawn_pos = list(spawner['pos'])
-                self.player1.air_time = 0
-            if spawner['variant'] == 1:
-                self.player2.pos = list(spawner['pos'])
-                self.player2.respawn_pos = list(spawner['pos'])
-                self.player2.flip = True
-                self.player2.air_time = 0
-        self.transition = -30
-    
-    #Main game update loop. 
-    def update(self, render_scroll):
-        self.clouds.update()
-        self.update_battle()
-        self.update_particles(render_scroll)
-    
-    #updates players and battle manager 
-    def update_battle(self):
-        self.player1.update(self.tilemap, (self.player1_input.update(), 0))
-        self.player2.update(self.tilemap, (self.player2_input.update(), 0))
-        self.battle_manager.update()
-    
-    #updates all the effects, such as sparks, particles, projectiles, leafs ect 
-    def update_particles(self, render_scroll):
-        for rect in self.leaf_spawners:
-            self.effects.create_leaf(rect)
-        
-        #handling projectiles    
-        for projectile in self.projectiles.copy():
-            projectile[0][0] += projectile[1]
-            projectile[2] += 1
-            img = self.assets['projectile']
-            
-            self.display.blit(img, (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1]))
-        
-            #checking if a projectile hit a solid block
-            if self.tilemap.solid_check(projectile[0]):
-                self.projectiles.remove(projectile)
-                self.effects.create_collision_spark(projectile)
-                
-            #disposing of bullet after 6 seconds
-            elif projectile[2] > 360:
-                self.projectiles.remove(projectile)
-    
-        #handling sparks 
-        for spark in self.sparks.copy():
-            kill = spark.update()
-            spark.render(self.display, offset=render_scroll)
-            if kill:
-                self.sparks.remove(spark)    
-        
-        #handling leaves
-        for particle in self.particles.copy():
-            kill = particle.update()
-            particle.render(self.display, offset=render_scroll)
-            if particle.type == 'leaf':
-                particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-            if kill:
-                self.particles.remove(particle)
-    
-    #render everything 
-    def render_all(self, render_scroll):
-        self.clouds.render(self.display_2, offset=render_scroll)
-        self.tilemap.render(self.display, offset=render_scroll)
-        self.player1.render(self.display, offset=render_scroll)
-        self.player2.render(self.display, offset=render_scroll)
-    
-    def pause(self):
-        #pygame.draw.rect(self.display, (128, 128, 128, 150), [0, 0, 900, 600])
-        #self.screen.blit(self.display_2, (0, 0))
-        self.display.blit(self.assets['pause_screen'], (0, 0))
-
-    def run(self):
-        while True:
-            if not self.paused:
-                self.display.fill((0, 0, 0, 0))
-                self.display_2.blit(self.assets['background'], (0, 0))
-                self.screenshake = max(0, self.screenshake - 1)
-            
-                if self.transition < 0:
-                    self.transition += 1
-
-                mid_x = (self.player1.rect().centerx + self.player2.rect().centerx) / 2
-                mid_y = (self.player1.rect().centery + self.player2.rect().centery) / 2
-                self.scroll[0] += (mid_x - self.display.get_width() / 2 - self.scroll[0]) / 30
-                self.scroll[1] += (mid_y - self.display.get_height() / 2 - self.scroll[1]) / 15
-                render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-                    
-                self.update(render_scroll)
-                self.render_all(render_scroll)
-                        
-                display_mask = pygame.mask.from_surface(self.display)
-                display_sillhouette = display_mask.to_surface(setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0))
-            
-                for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    self.display_2.blit(display_sillhouette, offset)
-            
-            else:
-                self.pause()
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                    
-                #idk if this is better then using the input handler, imo its more logical if
-                #the input handler has no direct effect on the game, just the player(s)
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_ESCAPE:
-                        self.paused = False if self.paused else True
-        
-            #map transition, done by changing the size of a circle
-            if self.transition:
-                transition_surf = pygame.Surface(self.display.get_size())
-                pygame.draw.circle(transition_surf, (255, 255, 255), (self.display.get_width() // 2, self.display.get_height() // 2), (30 - abs(self.transition)) * 8)
-                transition_surf.set_colorkey((255, 255, 255))
-                self.display.blit(transition_surf, (0, 0))
-                
-            self.display_2.blit(self.display, (0, 0))
-            
-            #screenshake (never properly implemented, so doesn't get used)
-            screenshake_offset = (random.random() * self.screenshake - self.screenshake / 2, random.random() * self.screenshake - self.screenshake / 2)
-            self.screen.blit(pygame.transform.scale(self.display_2, self.screen.get_size()), screenshake_offset)
-            pygame.display.update()
-            self.clock.tick(60)
-
-Game().run()
\ No newline at end of file
+import sys
+import random
+import argparse
+
+import pygame
+
+from scripts.assets import Prefetcher, load_assets, load_sounds, SFX_PREFETCH
+from scripts.controls import InputManager
+from scripts.bots import BotInput
+from scripts.simulation import Simulation, TICK_TIME
+from scripts.clouds import Clouds
+from scripts.outline import OutlineRenderer
+from scripts.presenter import Presenter
+from scripts.config import load_config
+from scripts.profiler import Profiler, ProfilerOverlay
+from scripts.replay import ReplayRecorder, ReplayPlayer, read_replay, new_replay_path
+from scripts.netplay import RollbackSession, UdpTransport, INPUT_DELAY
+
+#the window side of the game. Reads the keyboard, steps the simulation at a fixed rate
+#and draws whatever state it's in, interpolating players between ticks
+class Game:
+    #seed fixes every random roll of the match (random if not given). With a replay the match is
+    #played back from its seed instead, record_path writes this session out as a replay on quit.
+    #players defaults to one per configured controller (plus the bots), any past that stand still.
+    #The last bots players are played by the computer. netplay is (local port, (peer host, peer
+    #port), local player) for a 1v1 against another machine running the same seed, the first
+    #controller plays the local player
+    def __init__(self, seed=None, replay=None, record_path=None, players=None, bots=0, netplay=None, input_delay=INPUT_DELAY):
+        pygame.init()
+        
+        pygame.display.set_caption('Ninja Clash')
+        self.config = load_config()
+        internal_resolution = tuple(self.config['display']['internal_resolution'])
+        self.screen = pygame.display.set_mode(tuple(self.config['display']['window_resolution']))
+        self.display = pygame.Surface(internal_resolution, pygame.SRCALPHA)
+        self.display_2 = pygame.Surface(internal_resolution)
+        self.presenter = Presenter(self.screen, internal_resolution, self.config['display']['integer_scale'], self.display_2)
+        self.clock = pygame.time.Clock()
+        #frame timings, see scripts/profiler.py. Costs next to nothing until it's switched on
+        self.profiler = Profiler(enabled=self.config['profiler']['enabled'])
+        self.overlay = ProfilerOverlay(self.profiler)
+        self.overlay_key = pygame.key.key_code(self.config['profiler']['overlay_key'])
+        self.capture_key = pygame.key.key_code(self.config['profiler']['capture_key'])
+        self.outliner = OutlineRenderer(self.display.get_size())
+        #where anything that moves got drawn this frame, only these get masked for the outline
+        self.dirty_rects = []
+        #images and sounds load when first used, the rest trickles in on a background thread
+        self.prefetcher = Prefetcher()
+        self.assets = load_assets(self.prefetcher)
+        self.sfx = load_sounds(self.prefetcher)
+        self.scroll = [0, 0]
+        
+           
+        # self.sfx['damage'].set_volume(0.2)
+        # self.sfx['shoot'].set_volume(0.4)
+        # self.sfx['hit'].set_volume(0.8)
+        # self.sfx['dash'].set_volume(0.3)
+        # self.sfx['pickup'].set_volume(0.7)
+        # self.sfx['jump'].set_volume(0.7)
+        
+        if replay:
+            seed = replay.seed
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.clouds = Clouds(self.assets['clouds'], count=16, rng=random.Random(self.seed))
+        #keyboard and gamepads, bound in data/config.json
+        self.input = InputManager(self.config['controls'])
+        self.controllers = self.input.controllers()
+        if replay:
+            players = replay.players
+        if netplay:
+            players = 2
+        self.players = players if players else len(self.controllers) + bots
+        self.bots = min(bots, self.players)
+        self.paused = False
+        self.screenshake = 0 
+        self.sim = self.create_simulation(self.seed, replay.level if replay else -1)
+        self.playback = ReplayPlayer(replay, self.sim) if replay else None
+        self.recorder = ReplayRecorder(self.sim) if record_path and not replay else None
+        self.bot_inputs = [BotInput(self.sim, i) for i in range(self.players - self.bots, self.players)]
+        #rollback netplay, see scripts/netplay.py
+        self.session = None
+        if netplay:
+            port, peer, local_player = netplay
+            self.session = RollbackSession(self.sim, local_player, UdpTransport(port, peer), input_delay)
+        self.record_path = record_path
+        #the menu is up by now, load whatever it didn't need in the background
+        self.sfx.prefetch(SFX_PREFETCH)
+        self.assets.prefetch(self.assets.names())
+    
+    def create_simulation(self, seed, level=-1, players=None):
+        return Simulation(self.assets, self.sfx, level=level, on_load_level=self.level_loaded, prefetcher=self.prefetcher, profiler=self.profiler,
+                          seed=seed, players=players if players else self.players)
+
+    #called by the simulation whenever a map loads, handles the parts that are presentation only.
+    #Opening the music file goes to the background loader so the swap frame doesn't wait on disk
+    def level_loaded(self, map_id):
+        self.scroll = [0, 0]
+        self.prefetcher.submit(self.play_music, map_id)
+
+    def play_music(self, map_id):
+        try:
+            pygame.mixer.music.load('data/game_music/' + str(map_id) + '.wav')
+            pygame.mixer.music.set_volume(0.5)
+            pygame.mixer.music.play(-1)
+            
+        except Exception as e:
+            print(f"Failed to load {'data/game_music/' + str(map_id) + '.wav'}") 
+    
+    #runs one fixed tick of game logic with this frame's keyboard state, or the replay's next
+    #tick while one is playing (the keyboard takes over once it runs out). With netplay the
+    #session steps the match, or sits the tick out while it waits for the other side
+    def update(self):
+        with self.profiler.scope('clouds.update'):
+            self.clouds.update()
+        if self.playback and not self.playback.done:
+            self.playback.step()
+            if self.playback.done:
+                print(f"Replay finished after {self.playback.tick} ticks, " + (f"desynced at tick {self.playback.desync}" if self.playback.desync is not None else "no desyncs"))
+        elif self.session:
+            self.session.advance(self.controllers[0].update() if self.controllers else 0)
+        else:
+            humans = self.players - self.bots
+            actions = [controller.update() for controller in self.controllers][:humans]
+            actions += [0] * (humans - len(actions))
+            actions += [bot.update() for bot in self.bot_inputs]
+            if self.recorder:
+                self.recorder.step(actions)
+            else:
+                self.sim.step(actions)
+        self.update_camera()
+
+    def quit(self):
+        if self.session:
+            self.session.close()
+            if self.session.desync is not None:
+                print(f"Netplay desynced at tick {self.session.desync}")
+        if self.recorder:
+            self.recorder.save(self.record_path)
+            print(f"Saved replay of {self.recorder.replay.ticks} ticks to {self.record_path}")
+        pygame.quit()
+        sys.exit()
+    
+    #camera follows the midpoint of the players
+    def update_camera(self):
+        mid_x, mid_y = self.sim.fighters.centers().mean(axis=0).tolist()
+        self.scroll[0] += (mid_x - self.display.get_width() / 2 - self.scroll[0]) / 30
+        self.scroll[1] += (mid_y - self.display.get_height() / 2 - self.scroll[1]) / 15
+    
+    #draws projectiles, sparks and particles. They go down before the tilemap like they always have.
+    #Bullets and particles add themselves to the outline mask, returns the rects the sparks went in
+    def render_effects(self, render_scroll):
+        self.sim.projectiles.render(self.display, self.assets['projectile'], offset=render_scroll, mask=self.outliner.dynamic_mask)
+        
+        rects = self.sim.sparks.render(self.display, offset=render_scroll)
+            
+        self.sim.particles.render(self.display, offset=render_scroll, mask=self.outliner.dynamic_mask)
+        return rects
+    
+    #render everything. alpha is how far we are between the last tick and the next one, the
+    #players get drawn that far along
+    def render_all(self, render_scroll, alpha):
+        with self.profiler.scope('clouds.render'):
+            self.clouds.render(self.display_2, offset=render_scroll)
+        self.outliner.begin()
+        self.dirty_rects = self.render_effects(render_scroll)
+        with self.profiler.scope('tilemap.render'):
+            self.sim.tilemap.render(self.display, offset=render_scroll)
+        self.dirty_rects.extend(self.sim.fighters.render(self.display, offset=render_scroll, alpha=alpha))
+    
+    #dark outline around everything on the display layer. The tiles' outlines are baked, only
+    #what moved gets masked each frame
+    def render_silhouette(self, render_scroll):
+        with self.profiler.scope('silhouette'):
+            self.outliner.render(self.display_2, self.display, self.sim.tilemap, render_scroll, self.dirty_rects)
+    
+    #scales the finished frame up to the window
+    def present(self):
+        #screenshake (never properly implemented, so doesn't get used)
+        screenshake_offset = (random.random() * self.screenshake - self.screenshake / 2, random.random() * self.screenshake - self.screenshake / 2)
+        with self.profiler.scope('present'):
+            self.presenter.present(self.display_2, screenshake_offset)
+    
+    #the overlay needs timings, so showing it switches the profiler on (and hiding it back off,
+    #unless the config has it on all the time)
+    def toggle_overlay(self):
+        self.overlay.toggle()
+        self.profiler.enabled = self.overlay.visible or self.config['profiler']['enabled']
+
+    def capture_profile(self):
+        if not self.profiler.frame_total:
+            print("Nothing to capture, the profiler is off")
+            return
+        csv_path, trace_path = self.profiler.capture()
+        print(f"Saved profile to {csv_path} and {trace_path}")
+
+    def profile_counts(self):
+        return [len(self.sim.fighters), len(self.sim.projectiles), len(self.sim.particles), len(self.sim.sparks)]
+
+    def pause(self):
+        #pygame.draw.rect(self.display, (128, 128, 128, 150), [0, 0, 900, 600])
+        #self.screen.blit(self.display_2, (0, 0))
+        self.display.blit(self.assets['pause_screen'], (0, 0))
+
+    #the input manager sees every event (player controls), the game only picks out the keys that
+    #aren't for the players
+    def handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit()
+            if self.input.handle_event(event):
+                self.paused = False if self.paused else True
+            if event.type == pygame.KEYUP:
+                if event.key == self.overlay_key:
+                    self.toggle_overlay()
+                if event.key == self.capture_key:
+                    self.capture_profile()
+
+    def run(self):
+        #start a tick in so the first frame has weapon positions to draw
+        accumulator = TICK_TIME
+        while True:
+            self.profiler.begin_frame()
+            #events first, so whatever was pressed since the last frame goes into this frame's ticks
+            self.handle_events()
+            #never try to catch up more than a quarter second, e.g. after dragging the window
+            accumulator += min(self.clock.get_time() / 1000, 0.25)
+            if not self.paused:
+                self.display.fill((0, 0, 0, 0))
+                self.display_2.blit(self.assets['background'], (0, 0))
+                self.screenshake = max(0, self.screenshake - 1)
+                
+                while accumulator >= TICK_TIME:
+                    self.update()
+                    accumulator -= TICK_TIME
+                with self.profiler.scope('sound'):
+                    self.sim.sounds.flush()
+                render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+                    
+                self.render_all(render_scroll, accumulator / TICK_TIME)
+                self.render_silhouette(render_scroll)
+            
+            else:
+                accumulator = 0
+                self.pause()
+
+            #map transition, done by changing the size of a circle
+            if self.sim.transition:
+                self.display.blit(self.presenter.wipe(self.sim.transition), (0, 0))
+                
+            self.display_2.blit(self.display, (0, 0))
+            self.present()
+            with self.profiler.scope('overlay'):
+                self.overlay.render(self.screen, self.presenter.rect.topleft)
+            self.profiler.end_frame(self.profile_counts())
+            pygame.display.update()
+            self.clock.tick(60)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ninja Clash')
+    parser.add_argument('--seed', type=int, help='seed for every random roll in the match')
+    parser.add_argument('--record', nargs='?', const='', metavar='PATH', help='save this session as a replay (defaults to a new file in data/replays)')
+    parser.add_argument('--replay', metavar='PATH', help='watch a recorded replay, the keyboard takes over when it ends')
+    parser.add_argument('--players', type=int, help='players in the match (up to 16), defaults to one per configured controller')
+    parser.add_argument('--bots', type=int, default=0, help='how many of the players (the last ones) the computer plays')
+    parser.add_argument('--netplay', nargs=3, metavar=('PORT', 'PEER', 'PLAYER'),
+                        help='1v1 against another machine: the local UDP port, the other side as host:port, and which player (0 or 1) is played here')
+    parser.add_argument('--input-delay', type=int, default=INPUT_DELAY, help='ticks local input waits with --netplay')
+    args = parser.parse_args()
+    netplay = None
+    if args.netplay:
+        if args.seed is None:
+            parser.error('--netplay needs the same --seed on both machines')
+        port, peer, player = args.netplay
+        host, peer_port = peer.rsplit(':', 1)
+        netplay = (int(port), (host, int(peer_port)), int(player))
+    record_path = None
+    if args.record is not None:
+        record_path = args.record if args.record else new_replay_path()
+    Game(seed=args.seed, replay=read_replay(args.replay) if args.replay else None, record_path=record_path, players=args.players, bots=args.bots,
+         netplay=netplay, input_delay=args.input_delay).run()
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import argparse
+
+#no window or sound card needed, both sides run headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from scripts.bots import BotInput
+from scripts.entities import ScriptedInput
+from scripts.netplay import RollbackSession, MemoryTransport, UdpTransport, LossyTransport, INPUT_DELAY, MAX_ROLLBACK
+from scripts.simulation import create_headless, TICK_TIME
+
+#plays a netplay match between two simulations in this process over a link with made up
+#latency, jitter and loss, then checks both sides played the same match: their state hashes
+#along the way, and the last settled one against a fresh simulation fed the inputs both agreed
+#on. In memory on a simulated clock by default (runs as fast as it can), or over real UDP
+#sockets on localhost in real time with --udp. Exits 1 if the sides went apart
+
+#seconds for LossyTransport when the ticks aren't real time
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def create_side(args):
+    sim = create_headless(level=args.map, seed=args.seed, players=2)
+    sim.battle_manager.current_map = max(0, args.map)
+    return sim
+
+def create_transports(args, clock):
+    if args.udp:
+        a = UdpTransport(args.port, ('127.0.0.1', args.port + 1), '127.0.0.1')
+        b = UdpTransport(args.port + 1, ('127.0.0.1', args.port), '127.0.0.1')
+    else:
+        a, b = MemoryTransport.pair()
+    return [LossyTransport(transport, args.latency, args.jitter, args.loss, args.seed + side, clock) for side, transport in enumerate((a, b))]
+
+#the match played straight through with the inputs both sides settled on, its hash at tick
+def reference_hash(args, session, tick):
+    sim = create_side(args)
+    for t in range(tick):
+        actions = [0, 0]
+        actions[session.local_player] = session.local_inputs[t]
+        actions[1 - session.local_player] = session.remote_inputs[t]
+        sim.step(actions)
+    return sim.state_hash()
+
+#mean time of Simulation.save_state and load_state in ms, what a rollback pays on top of the ticks
+def time_snapshots(sim, repeats=100):
+    start = time.perf_counter()
+    for i in range(repeats):
+        state = sim.save_state()
+    saved = time.perf_counter()
+    for i in range(repeats):
+        sim.load_state(state)
+    return (saved - start) / repeats * 1000, (time.perf_counter() - saved) / repeats * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='play a rollback netplay match against itself over a simulated bad connection')
+    parser.add_argument('--ticks', type=int, default=3600)
+    parser.add_argument('--map', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=60, help='one way delay in ms')
+    parser.add_argument('--jitter', type=float, default=15, help='up to this many ms more on top, per packet')
+    parser.add_argument('--loss', type=float, default=0.05, help='fraction of packets dropped')
+    parser.add_argument('--delay', type=int, default=INPUT_DELAY, help='input delay in ticks')
+    parser.add_argument('--rollback', type=int, default=MAX_ROLLBACK, help='most ticks a rollback goes back')
+    parser.add_argument('--bots', action='store_true', help='bots play both sides instead of random key mashing')
+    parser.add_argument('--udp', action='store_true', help='real sockets on localhost, in real time')
+    parser.add_argument('--port', type=int, default=47000, help='with --udp, the sides use this port and the next')
+    args = parser.parse_args()
+
+    clock = time.perf_counter if args.udp else SimulatedClock()
+    sims = [create_side(args) for side in (0, 1)]
+    transports = create_transports(args, clock)
+    sessions = [RollbackSession(sim, side, transport, args.delay, args.rollback) for side, (sim, transport) in enumerate(zip(sims, transports))]
+    controllers = [BotInput(sim, side) if args.bots else ScriptedInput(args.seed * 2 + side) for side, sim in enumerate(sims)]
+    worst = [0.0, 0.0]
+
+    start = time.perf_counter()
+    for tick in range(args.ticks):
+        if args.udp:
+            time.sleep(max(0, start + tick * TICK_TIME - time.perf_counter()))
+        else:
+            clock.now = tick * TICK_TIME
+        for side, (session, controller) in enumerate(zip(sessions, controllers)):
+            began = time.perf_counter()
+            session.advance(controller.update())
+            worst[side] = max(worst[side], time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.ticks} ticks in {elapsed:.1f}s, {args.latency:.0f}ms latency, {args.jitter:.0f}ms jitter, {args.loss:.0%} loss, "
+          f"input delay {args.delay}, rollback up to {args.rollback}{', udp' if args.udp else ''}")
+    save_ms, load_ms = time_snapshots(sims[0])
+    print(f"save_state {save_ms:.3f}ms, load_state {load_ms:.3f}ms\n")
+    print(f"{'side':>4} {'ticks':>6} {'stalls':>7} {'rollbacks':>10} {'avg back':>9} {'max back':>9} {'avg ms':>7} {'max ms':>7} {'worst tick ms':>14} {'sent':>6} {'lost':>5}")
+    for side, (session, transport) in enumerate(zip(sessions, transports)):
+        stats = session.stats
+        rollbacks = max(stats['rollbacks'], 1)
+        print(f"{side:>4} {stats['ticks']:>6} {stats['stalls']:>7} {stats['rollbacks']:>10} {stats['rollback_frames'] / rollbacks:>9.1f} "
+              f"{stats['max_rollback']:>9} {stats['rollback_time'] / rollbacks * 1000:>7.2f} {stats['max_rollback_time'] * 1000:>7.2f} "
+              f"{worst[side] * 1000:>14.2f} {transport.sent:>6} {transport.dropped:>5}")
+
+    failed = False
+    for side, session in enumerate(sessions):
+        if session.desync is not None:
+            print(f"side {side} desynced at tick {session.desync}")
+            failed = True
+    tick, state_hash = sessions[0].settled_hash()
+    other = sessions[1].hashes.get(tick)
+    reference = reference_hash(args, sessions[0], tick)
+    matched = state_hash == reference and other in (None, reference)
+    print(f"\n{sessions[0].hash_checks + sessions[1].hash_checks} hash checks on the way, settled tick {tick} "
+          f"{'matches' if matched else 'DOES NOT MATCH'} a straight replay of the agreed inputs")
+    for session in sessions:
+        session.close()
+    if failed or not matched:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
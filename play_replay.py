@@ -0,0 +1,34 @@
+import os
+import sys
+import argparse
+
+from scripts.replay import read_replay, play_headless
+
+#plays replays back with no window as fast as they go and checks every checkpoint still
+#matches. Exit code 1 if any replay desynced, so it works as a determinism check
+def main():
+    parser = argparse.ArgumentParser(description='play replays back headless and check they still match what was recorded')
+    parser.add_argument('paths', nargs='+', help='.rpl files')
+    parser.add_argument('--window', action='store_true', help='watch the (first) replay in the game window instead')
+    args = parser.parse_args()
+
+    if args.window:
+        from game import Game
+        Game(replay=read_replay(args.paths[0])).run()
+        return
+
+    failed = []
+    print(f"{'replay':<28} {'ticks':>7} {'seconds':>8} {'ticks/s':>9} result")
+    for path in args.paths:
+        replay = read_replay(path)
+        player, elapsed = play_headless(replay)
+        result = 'ok' if player.desync is None else f"DESYNC at tick {player.desync}"
+        print(f"{os.path.basename(path):<28} {replay.ticks:>7} {elapsed:8.2f} {replay.ticks / max(elapsed, 1e-9):9.0f} {result}")
+        if player.desync is not None:
+            failed.append(path)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+import queue
+import threading
+from collections import OrderedDict
+
+import pygame
+
+from scripts.utils import load_image, load_images, Animation, NullSound, BASE_SFX_PATH
+
+#decoded sound effects kept in memory at most (bytes). Music isn't counted, pygame.mixer.music
+#streams it from disk so only a small buffer is ever resident
+SOUND_BUDGET = 1024 * 1024
+
+#how to build every image asset. Nothing is loaded until someone asks for the key (or the
+#prefetcher gets to it), so startup only pays for what the first frame draws
+ASSET_LOADERS = {
+    'decor': lambda: load_images('tiles/decor'),
+    'grass': lambda: load_images('tiles/grass'),
+    'large_decor': lambda: load_images('tiles/large_decor'),
+    'stone': lambda: load_images('tiles/stone'),
+    'spawners': lambda: load_images('tiles/spawners'),
+    'gunTile': lambda: load_images('tiles/gun'),
+    'transition': lambda: load_images('tiles/transition'),
+    'clouds': lambda: load_images('clouds'),
+    'background': lambda: load_image('background.png'),
+    'pause_screen': lambda: load_image('pause_screen.png'),
+    'pauseFill': lambda: load_image('pauseFill.png'),
+    'particle/leaf': lambda: Animation(load_images('particles/leaf'), img_dur=20, loop=False),
+    'particle/particle': lambda: Animation(load_images('particles/particle'), img_dur=6, loop=False),
+    'particle/blood': lambda: Animation(load_images('particles/blood'), img_dur=6, loop=False),
+
+    'player1': lambda: load_image('entities/player1/player1.png'),
+    'player1/idle': lambda: Animation(load_images('entities/player1/idle'), img_dur=6),
+    'player1/run': lambda: Animation(load_images('entities/player1/run'), img_dur=4),
+    'player1/jump': lambda: Animation(load_images('entities/player1/jump')),
+    'player1/slide': lambda: Animation(load_images('entities/player1/slide')),
+    'player1/wall_slide': lambda: Animation(load_images('entities/player1/wall_slide')),
+
+    'player2': lambda: load_image('entities/player2/player2.png'),
+    'player2/idle': lambda: Animation(load_images('entities/player2/idle'), img_dur=6),
+    'player2/run': lambda: Animation(load_images('entities/player2/run'), img_dur=4),
+    'player2/jump': lambda: Animation(load_images('entities/player2/jump')),
+    'player2/slide': lambda: Animation(load_images('entities/player2/slide')),
+    'player2/wall_slide': lambda: Animation(load_images('entities/player2/wall_slide')),
+
+    'gunImg': lambda: load_image('gun.png'),
+    'sword': lambda: load_image('sword.png'),
+    'projectile': lambda: load_image('projectile.png'),
+}
+
+#the tile groups the editor lets you place, in the order it cycles through them
+TILE_ASSETS = ['decor', 'grass', 'large_decor', 'stone', 'spawners', 'gunTile', 'transition']
+
+SFX_NAMES = ['jump', 'dash', 'damage', 'hit', 'shoot', 'pickup', 'ambience', 'transition']
+#background decoding order at startup. Rarest first, so if the budget is hit it's the map
+#transition sound (least recently used) that gets dropped rather than jump or hit
+SFX_PREFETCH = ['transition', 'ambience', 'pickup', 'damage', 'shoot', 'hit', 'dash', 'jump']
+
+
+#one daemon thread working through a queue of load jobs. Shared by the image registry and the
+#sound bank so background loading never competes with itself
+class Prefetcher:
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = None
+
+    def submit(self, job, *args):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='asset-prefetch', daemon=True)
+            self.thread.start()
+        self.jobs.put((job, args))
+
+    def run(self):
+        while True:
+            job, args = self.jobs.get()
+            try:
+                job(*args)
+            except Exception as e:
+                print(f"Prefetch failed for {args} ({e})")
+            self.jobs.task_done()
+
+    #blocks until everything submitted so far is loaded
+    def wait(self):
+        self.jobs.join()
+
+
+#the assets dict, but every entry is built on first access. Once loaded an entry is a plain dict
+#item, so the per frame lookups stay as fast as they were with the eager dict.
+#Iterating only covers what's loaded so far, names() lists everything that can be
+class AssetRegistry(dict):
+    def __init__(self, loaders=ASSET_LOADERS, prefetcher=None):
+        super().__init__()
+        self.loaders = loaders
+        self.prefetcher = prefetcher if prefetcher else Prefetcher()
+        self.lock = threading.RLock()
+
+    def __missing__(self, key):
+        if key not in self.loaders:
+            raise KeyError(key)
+        with self.lock:
+            #the prefetcher may have finished it while we were waiting for the lock
+            if not dict.__contains__(self, key):
+                dict.__setitem__(self, key, self.loaders[key]())
+        return dict.__getitem__(self, key)
+
+    def names(self):
+        return list(self.loaders)
+
+    def is_loaded(self, key):
+        return dict.__contains__(self, key)
+
+    #queues keys to be loaded in the background, in the order given. Already loaded or
+    #unknown keys are skipped
+    def prefetch(self, keys):
+        for key in keys:
+            if key in self.loaders and not self.is_loaded(key):
+                self.prefetcher.submit(self.__getitem__, key)
+
+
+#sound effects decoded on first play and kept in least recently used order. When the decoded
+#total goes over the budget the oldest ones that aren't currently playing get dropped, and
+#simply get decoded again next time they're needed
+class SoundBank:
+    def __init__(self, names=SFX_NAMES, budget=SOUND_BUDGET, prefetcher=None):
+        self.names = names
+        self.budget = budget
+        self.prefetcher = prefetcher if prefetcher else Prefetcher()
+        self.sounds = OrderedDict()
+        self.sizes = {}
+        self.resident = 0
+        self.lock = threading.RLock()
+        #missing files and headless runs. Never evicted, they cost nothing
+        self.silent = {}
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name in self.silent:
+                return self.silent[name]
+            sound = self.sounds.get(name)
+            if sound is not None:
+                self.sounds.move_to_end(name)
+                return sound
+        if name not in self.names:
+            raise KeyError(name)
+        return self.load(name)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    #decodes one sound and makes room for it. Without a mixer (or for a missing file) you get a
+    #NullSound so the simulation can keep calling play() either way.
+    #Decoding happens outside the lock so a background load never holds up a play() call
+    def load(self, name):
+        sound = NullSound()
+        if pygame.mixer.get_init():
+            try:
+                sound = pygame.mixer.Sound(BASE_SFX_PATH + name + '.wav')
+            except Exception as e:
+                print(f"Failed to load {BASE_SFX_PATH + name + '.wav'}")
+
+        with self.lock:
+            #someone else got there first
+            if name in self.sounds or name in self.silent:
+                return self[name]
+            if isinstance(sound, NullSound):
+                self.silent[name] = sound
+                return sound
+            self.sounds[name] = sound
+            self.sizes[name] = sound_size(sound)
+            self.resident += self.sizes[name]
+            self.evict(keep=name)
+        return sound
+
+    def evict(self, keep=None):
+        for name in list(self.sounds):
+            if self.resident <= self.budget:
+                break
+            #freeing a Sound stops it, so anything still playing stays
+            if name == keep or self.sounds[name].get_num_channels():
+                continue
+            del self.sounds[name]
+            self.resident -= self.sizes.pop(name)
+
+    def is_loaded(self, name):
+        return name in self.sounds or name in self.silent
+
+    def prefetch(self, names):
+        for name in names:
+            if name in self.names and not self.is_loaded(name):
+                self.prefetcher.submit(self.__getitem__, name)
+
+
+#bytes a decoded sound takes up in the mixer's format
+def sound_size(sound):
+    freq, sample_format, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * freq) * channels * (abs(sample_format) // 8)
+
+#the registry and sound bank the game runs on. Both share one background loader
+def load_assets(prefetcher=None):
+    return AssetRegistry(ASSET_LOADERS, prefetcher)
+
+def load_sounds(prefetcher=None):
+    return SoundBank(SFX_NAMES, SOUND_BUDGET, prefetcher)
@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import fnmatch
+
+import numpy as np
+import pygame
+
+ATLAS_VERSION = 1
+CACHE_DIR = 'data/cache/'
+SHEET_SIZE = 1024
+
+#the colour that counts as transparent for an image. Accidentally used a different background
+#color for the idle player 2 sprite, everything else is keyed on black
+def colorkey_for(path):
+    if fnmatch.fnmatch(path, 'entities/player2/idle/*'):
+        return (255, 255, 255)
+    return (0, 0, 0)
+
+#mtime and size of every png under the image folder, keyed by path relative to it. This is
+#what decides if the cached atlas is still good
+def scan_sources(base_path):
+    sources = {}
+    for root, dirs, files in os.walk(base_path):
+        for name in files:
+            if name.lower().endswith('.png'):
+                full_path = os.path.join(root, name)
+                stat = os.stat(full_path)
+                sources[os.path.relpath(full_path, base_path).replace(os.sep, '/')] = [stat.st_mtime_ns, stat.st_size]
+    return sources
+
+#loads a png as an RGBA array with the colorkey already turned into alpha. The RGB goes through
+#unchanged, same as convert() + set_colorkey() did at runtime
+def load_rgba(base_path, path):
+    img = pygame.image.load(base_path + path)
+    rgb = np.frombuffer(pygame.image.tobytes(img, 'RGB'), dtype=np.uint8).reshape(img.get_height(), img.get_width(), 3)
+    keyed = (rgb == colorkey_for(path)).all(axis=2)
+    rgba = np.dstack([rgb, np.where(keyed, 0, 255).astype(np.uint8)])
+    #clear the colour of transparent pixels too, so blending onto an empty SRCALPHA surface leaves it empty
+    rgba[keyed] = 0
+    return rgba
+
+#shelf packing: tallest images first, left to right, new shelf when a row is full and a new
+#sheet when a sheet is full. Returns the sheet arrays and {path: [sheet, x, y, w, h]}
+def pack(images, sheet_size=SHEET_SIZE):
+    placements = {}
+    sheets = []
+    x = y = shelf_height = 0
+    for path in sorted(images, key=lambda path: (-images[path].shape[0], path)):
+        h, w = images[path].shape[:2]
+        if x + w > sheet_size:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        if not sheets or y + h > sheet_size:
+            sheets.append(np.zeros((sheet_size, sheet_size, 4), dtype=np.uint8))
+            x = y = shelf_height = 0
+        sheets[-1][y:y + h, x:x + w] = images[path]
+        placements[path] = [len(sheets) - 1, x, y, w, h]
+        x += w
+        shelf_height = max(shelf_height, h)
+
+    #trim the unused bottom of every sheet
+    for i in range(len(sheets)):
+        used = max([p[2] + p[4] for p in placements.values() if p[0] == i] + [1])
+        sheets[i] = sheets[i][:used]
+    return sheets, placements
+
+#packs every image under base_path into sheets and writes them plus a manifest into cache_dir
+def build_atlas(base_path, cache_dir=CACHE_DIR):
+    sources = scan_sources(base_path)
+    sheets, placements = pack({path: load_rgba(base_path, path) for path in sources})
+    os.makedirs(cache_dir, exist_ok=True)
+    sheet_files = []
+    for i, sheet in enumerate(sheets):
+        sheet_files.append('atlas_' + str(i) + '.png')
+        surf = pygame.image.frombytes(np.ascontiguousarray(sheet).tobytes(), (sheet.shape[1], sheet.shape[0]), 'RGBA')
+        pygame.image.save(surf, cache_dir + sheet_files[-1])
+    manifest = {'version': ATLAS_VERSION, 'sources': sources, 'sheets': sheet_files, 'images': placements}
+    f = open(cache_dir + 'atlas.json', 'w')
+    json.dump(manifest, f)
+    f.close()
+    return manifest
+
+
+#every image of the game as subsurfaces of a couple of sheet surfaces. The cached build gets
+#reused as long as no source png was added, removed or touched since
+class Atlas:
+    def __init__(self, base_path, cache_dir=CACHE_DIR):
+        self.base_path = base_path
+        self.cache_dir = cache_dir
+        self.manifest = self.load_manifest()
+        if self.manifest is None:
+            self.manifest = build_atlas(base_path, cache_dir)
+        self.sheets = [pygame.image.load(cache_dir + name).convert_alpha() for name in self.manifest['sheets']]
+        self.images = {}
+
+        #directory -> sorted file names, so load_images doesn't need os.listdir
+        self.folders = {}
+        for path in self.manifest['images']:
+            folder, name = path.rsplit('/', 1) if '/' in path else ('', path)
+            self.folders.setdefault(folder, []).append(name)
+        for names in self.folders.values():
+            names.sort()
+
+    #the cached manifest, or None if it's missing, from an older version or out of date
+    def load_manifest(self):
+        try:
+            f = open(self.cache_dir + 'atlas.json', 'r')
+            manifest = json.load(f)
+            f.close()
+        except Exception as e:
+            return None
+        if manifest.get('version') != ATLAS_VERSION or manifest.get('sources') != scan_sources(self.base_path):
+            return None
+        for name in manifest['sheets']:
+            if not os.path.exists(self.cache_dir + name):
+                return None
+        return manifest
+
+    def __contains__(self, path):
+        return path in self.manifest['images']
+
+    def image(self, path):
+        if path not in self.images:
+            sheet, x, y, w, h = self.manifest['images'][path]
+            self.images[path] = self.sheets[sheet].subsurface((x, y, w, h))
+        return self.images[path]
+
+    #sorted file names in an image folder, None if the folder doesn't exist
+    def listdir(self, folder):
+        return self.folders.get(folder)
+
+
+#build step: python -m scripts.atlas [image folder]
+if __name__ == '__main__':
+    base_path = sys.argv[1] if len(sys.argv) > 1 else 'data/images/'
+    manifest = build_atlas(base_path)
+    print(f"packed {len(manifest['images'])} images into {len(manifest['sheets'])} sheet(s) in {CACHE_DIR}")
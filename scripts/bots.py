@@ -0,0 +1,200 @@
+from scripts.entities import (ACTION_LEFT, ACTION_RIGHT, ACTION_DASH, ACTION_ATTACK, ACTION_DASH_PRESSED, ACTION_ATTACK_PRESSED,
+                              WEAPON_SWORD, WEAPON_GUN)
+from scripts.fighters import AIRBORNE_TICKS, FRICTION
+from scripts.navgraph import START_SLACK, load_graph
+
+#how often (ticks) a bot looks again at what it's heading for
+RETHINK_TICKS = 20
+#a gun shot is taken when the target's middle is this close vertically, and from this far at most
+GUN_LINE = 4
+GUN_RANGE = 200
+#a dash (80 pixels) is only thrown at a gun holder this close and lined up like a shot
+DASH_RANGE = 72
+#a move that hasn't landed this long after its actions ran out is given up on
+MOVE_OVERRUN = 60
+#a bot that hasn't reached another node in this long drops its plan and walks off the way it faces
+STUCK_TICKS = 240
+
+ATTACK = ACTION_ATTACK | ACTION_ATTACK_PRESSED
+DASH = ACTION_DASH | ACTION_DASH_PRESSED
+
+
+def toward(dx):
+    return ACTION_RIGHT if dx > 0 else ACTION_LEFT if dx < 0 else 0
+
+
+#a computer player, plugged in wherever a keyboard or pad controller goes: update() returns that
+#tick's action bits for player index. It walks the map's nav graph (scripts/navgraph.py) to the
+#nearest opponent on the other side, the gun when one's lying around, or its side's exit once it's
+#unlocked, and attacks whatever's in reach. Moves are played back exactly as the graph recorded
+#them from the middle of a node, so it lines up there first. Everything it does comes from the
+#game state, the same match with the same bots always plays out the same way
+class BotInput:
+    def __init__(self, sim, index):
+        self.sim = sim
+        self.index = index
+        self.tilemap = None
+        self.graph = None
+        self.goal = None
+        self.target = None
+        self.opponent = None
+        self.next_think = 0
+        #the move being played back: its actions, how far in, and where it goes
+        self.move = None
+        self.move_tick = 0
+        self.last_node = None
+        self.node_ticks = 0
+        self.wander = 0
+
+    #a new map: its graph and the nodes nearest the exits and the gun
+    def load_map(self):
+        sim = self.sim
+        self.tilemap = sim.tilemap
+        self.graph = load_graph(sim.level, sim.tilemap)
+        self.move = None
+        self.goal = None
+        self.next_think = 0
+        self.last_node = None
+
+    def update(self):
+        sim = self.sim
+        if sim.tilemap is not self.tilemap:
+            self.load_map()
+        if not self.graph.nodes:
+            return 0
+        fighters = sim.fighters
+        i = self.index
+        x, y = fighters.pos[i].tolist()
+        grounded = fighters.air_time[i] <= AIRBORNE_TICKS
+
+        if sim.tick_count >= self.next_think or self.target is None:
+            self.think(x, y)
+        attack = self.attack(x, y)
+        if attack is not None:
+            #lining up a hit beats walking, unless it's halfway through a jump
+            if self.move is None or grounded:
+                self.move = None
+                return attack
+        return self.navigate(x, y, grounded) | (attack & ATTACK if attack else 0)
+
+    #picks what to head for: the exit once unlocked, the gun if there is one and it's only got a
+    #sword, otherwise the closest opponent. target is the spot to walk up to at the end
+    def think(self, x, y):
+        sim = self.sim
+        fighters = sim.fighters
+        i = self.index
+        self.next_think = sim.tick_count + RETHINK_TICKS
+        self.opponent = self.nearest_opponent(x, y)
+        self.target = None
+
+        tilemap = sim.tilemap
+        exits = tilemap.get_transition_tiles_loc()
+        if sim.main_menu or sim.battle_manager.unlock[i]:
+            #side 0 leaves through variant 1, side 1 through variant 0 (see BattleManager)
+            spots = [tile['coord'].center for tile in exits if sim.main_menu or tile['variant'] == 1 - i % 2]
+            if spots:
+                self.target = min(spots, key=lambda spot: abs(spot[0] - x) + abs(spot[1] - y))
+        if self.target is None and fighters.weapon[i] == WEAPON_SWORD:
+            guns = tilemap.get_gun_tile_loc()
+            if guns:
+                self.target = guns[0].center
+        if self.target is None and self.opponent is not None:
+            ox, oy = fighters.pos[self.opponent].tolist()
+            self.target = (ox, oy)
+            self.goal = self.graph.node_below(ox, oy)
+            if self.goal is None:
+                self.goal = self.graph.nearest(ox, oy)
+            return
+        if self.target is None:
+            self.target = (x, y)
+        self.goal = self.graph.nearest(self.target[0], self.target[1] - self.graph.tile_size)
+
+    def nearest_opponent(self, x, y):
+        i = self.index
+        best = None
+        for j, (ox, oy) in enumerate(self.sim.fighters.pos.tolist()):
+            if j % 2 == i % 2:
+                continue
+            distance = abs(ox - x) + abs(oy - y)
+            if best is None or distance < best[0]:
+                best = (distance, j)
+        return best[1] if best else None
+
+    #the bits to hit the opponent from here (facing them), None if they're out of reach
+    def attack(self, x, y):
+        j = self.opponent
+        if j is None:
+            return None
+        fighters = self.sim.fighters
+        i = self.index
+        ox, oy = fighters.pos[j].tolist()
+        dx = ox - x
+        dy = oy - y
+        #a direction bit turns them around, but it's also a step, only when facing the wrong way
+        face = toward(dx) if (dx < 0) != bool(fighters.flip[i]) else 0
+        ready = fighters.attack_cooldown[i] == 0
+        weapon = fighters.weapon[i]
+        if weapon == WEAPON_SWORD:
+            sword_w, sword_h = fighters.sword_size
+            w, h = fighters.size[i].tolist()
+            if abs(dx) < sword_w + w and abs(dy) < (sword_h + h) // 2:
+                #the sword starts at the front edge, right on top of them it misses. Step off first
+                if not dx:
+                    return ACTION_LEFT if i % 2 else ACTION_RIGHT
+                return face | (ATTACK if ready else 0)
+            #dashing with a sword out only hurts someone who isn't holding one
+            if fighters.weapon[j] == WEAPON_GUN and abs(dy) < GUN_LINE and abs(dx) < DASH_RANGE and fighters.dashing[i] == 0:
+                return face | DASH
+        elif weapon == WEAPON_GUN and abs(dy) < GUN_LINE and abs(dx) < GUN_RANGE:
+            return face | (ATTACK if ready else 0)
+        return None
+
+    #the bits for walking the graph towards the goal
+    def navigate(self, x, y, grounded):
+        graph = self.graph
+        if self.move is not None:
+            return self.follow(x, y, grounded)
+        if not grounded:
+            return 0
+        node = graph.node_at(x, y)
+        if node is None:
+            node = graph.nearest(x, y)
+            return toward(graph.start(node)[0] - x)
+
+        sim = self.sim
+        if node != self.last_node:
+            self.last_node = node
+            self.node_ticks = 0
+        self.node_ticks += 1
+        if self.wander > 0:
+            self.wander -= 1
+            return ACTION_LEFT if sim.fighters.flip[self.index] else ACTION_RIGHT
+        if self.node_ticks > STUCK_TICKS:
+            self.node_ticks = 0
+            self.wander = RETHINK_TICKS
+
+        path = graph.path(node, self.goal) if self.goal is not None else None
+        if not path:
+            #there (or no way there), walk up to the spot itself
+            dx = self.target[0] - x
+            return toward(dx) if abs(dx) > START_SLACK else 0
+        start_x = graph.start(node)[0]
+        vx = self.sim.fighters.vx[self.index]
+        if abs(x - start_x) > START_SLACK or abs(vx) > FRICTION:
+            return toward(start_x - x) if abs(x - start_x) > START_SLACK else 0
+        self.move = graph.edge_actions(path[0])
+        self.move_tick = 0
+        return self.follow(x, y, grounded)
+
+    #the next tick of the move being played back. Past its end the last bits are held until it
+    #lands (what the graph assumed when it checked the move)
+    def follow(self, x, y, grounded):
+        move = self.move
+        tick = self.move_tick
+        self.move_tick += 1
+        if tick < len(move):
+            return move[tick]
+        if grounded and self.graph.node_at(x, y) is not None or tick > len(move) + MOVE_OVERRUN:
+            self.move = None
+            return self.navigate(x, y, grounded)
+        return move[-1]
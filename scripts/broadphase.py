@@ -0,0 +1,65 @@
+#cells of the spatial hash, in pixels. Two tiles, so a player (8x15) sits in 1 to 4 of them and
+#a sword hitbox in 1 or 2
+CELL_SIZE = 32
+
+
+#uniform grid of the players' rects, built once a tick. Combat asks it which players are near a
+#rect or a point and only runs the precise overlap tests on those, instead of testing everyone
+#against everyone. Rects are (left, top, right, bottom) tuples, the same numbers as a pygame.Rect,
+#and the precise tests compare those directly so nothing allocates a Rect per test
+class SpatialHash:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = []
+
+    def build(self, rects):
+        cs = self.cell_size
+        cells = {}
+        for i, (left, top, right, bottom) in enumerate(rects):
+            for cx in range(left // cs, (right - 1) // cs + 1):
+                for cy in range(top // cs, (bottom - 1) // cs + 1):
+                    cell = cells.get((cx, cy))
+                    if cell is None:
+                        cells[(cx, cy)] = [i]
+                    else:
+                        cell.append(i)
+        self.cells = cells
+        self.rects = rects
+
+    #indices of everyone sharing a cell with the rect, in order
+    def near_rect(self, left, top, right, bottom):
+        cs = self.cell_size
+        cells = self.cells
+        near = set()
+        for cx in range(left // cs, (right - 1) // cs + 1):
+            for cy in range(top // cs, (bottom - 1) // cs + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    near.update(cell)
+        return sorted(near)
+
+    #indices of everyone whose rect overlaps the rect (colliderect)
+    def overlapping(self, left, top, right, bottom):
+        rects = self.rects
+        hits = []
+        for i in self.near_rect(left, top, right, bottom):
+            other = rects[i]
+            if left < other[2] and other[0] < right and top < other[3] and other[1] < bottom:
+                hits.append(i)
+        return hits
+
+    #indices of everyone whose rect contains the point (collidepoint), in order. The cell list is
+    #already in index order, nothing to sort
+    def containing(self, x, y):
+        cs = self.cell_size
+        cell = self.cells.get((int(x // cs), int(y // cs)))
+        if not cell:
+            return []
+        rects = self.rects
+        hits = []
+        for i in cell:
+            left, top, right, bottom = rects[i]
+            if left <= x < right and top <= y < bottom:
+                hits.append(i)
+        return hits
@@ -0,0 +1,59 @@
+import copy
+import json
+
+CONFIG_PATH = 'data/config.json'
+
+#what the game runs with when the config file (or a key in it) is missing
+DEFAULT_CONFIG = {
+    'display': {
+        #resolution the game is drawn at, and the window it gets scaled up to
+        'internal_resolution': [320, 240],
+        'window_resolution': [900, 600],
+        #only scale by whole numbers and letterbox the rest, keeps the pixels square
+        'integer_scale': False,
+    },
+    #pygame key names per action. Gamepads go to players by the order they were plugged in
+    #(0 is the first pad), buttons are SDL button numbers
+    'controls': {
+        'players': [
+            {'keys': {'left': ['a'], 'right': ['d'], 'jump': ['w'], 'dash': ['e'], 'attack': ['space']}, 'gamepad': 0},
+            {'keys': {'left': ['left'], 'right': ['right'], 'jump': ['up'], 'dash': ['m'], 'attack': ['right shift']}, 'gamepad': 1},
+        ],
+        'gamepad': {
+            'buttons': {'jump': [0], 'dash': [2], 'attack': [1]},
+            #left stick x, and how far it has to go before it counts
+            'axis': 0,
+            'deadzone': 0.5,
+        },
+        'pause': ['escape'],
+    },
+    'profiler': {
+        #time scopes from startup, otherwise only while the overlay is up
+        'enabled': False,
+        #pygame key names, the overlay toggle and writing a capture to data/profiles
+        'overlay_key': 'f3',
+        'capture_key': 'f4',
+    },
+}
+
+#values from the file win, anything it leaves out comes from the defaults
+def merge(defaults, overrides):
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(defaults.get(key), dict):
+            merged[key] = merge(defaults[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def load_config(path=CONFIG_PATH):
+    try:
+        f = open(path, 'r')
+        overrides = json.load(f)
+        f.close()
+    except FileNotFoundError:
+        return merge(DEFAULT_CONFIG, {})
+    except Exception as e:
+        print(f"Failed to read {path}, using the default config ({e})")
+        return merge(DEFAULT_CONFIG, {})
+    return merge(DEFAULT_CONFIG, overrides)
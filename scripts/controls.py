@@ -0,0 +1,195 @@
+import pygame
+
+from scripts.entities import ACTION_LEFT, ACTION_RIGHT, ACTION_JUMP, ACTION_DASH, ACTION_ATTACK, PRESSED_SHIFT
+
+ACTION_NAMES = {
+    'left': ACTION_LEFT,
+    'right': ACTION_RIGHT,
+    'jump': ACTION_JUMP,
+    'dash': ACTION_DASH,
+    'attack': ACTION_ATTACK,
+}
+
+
+#pygame key codes for a list of key names ('a', 'space', 'right shift', ...). Unknown names are
+#skipped with a warning instead of stopping the game from starting
+def key_codes(names):
+    codes = []
+    for name in names:
+        try:
+            codes.append(pygame.key.key_code(name))
+        except ValueError:
+            print(f"Unknown key '{name}' in the controls config")
+    return codes
+
+#turns a {'action': ['key name', ...]} section of the config into {key code: action bits}
+def parse_keys(bindings):
+    keys = {}
+    for action, names in bindings.items():
+        if action not in ACTION_NAMES:
+            print(f"Unknown action '{action}' in the controls config")
+            continue
+        for code in key_codes(names):
+            keys[code] = keys.get(code, 0) | ACTION_NAMES[action]
+    return keys
+
+def parse_buttons(bindings):
+    buttons = {}
+    for action, button_ids in bindings.items():
+        if action not in ACTION_NAMES:
+            print(f"Unknown action '{action}' in the controls config")
+            continue
+        for button in button_ids:
+            buttons[button] = buttons.get(button, 0) | ACTION_NAMES[action]
+    return buttons
+
+
+#one player's controller, fed from the event queue. update() is called once per simulation tick
+#like any other controller and returns the action bits: what's held right now plus a pressed bit
+#for everything that went down since the last tick, so a tap shorter than a tick still counts.
+#pressed and released keep what the last tick saw for anything that wants the edges
+class PlayerInput:
+    def __init__(self, keys, buttons, deadzone=0.5):
+        self.keys = keys
+        self.buttons = buttons
+        self.deadzone = deadzone
+        self.keys_down = set()
+        self.buttons_down = set()
+        self.stick = 0
+        self.hat = 0
+        self.pad = None
+        self.new_presses = 0
+        self.new_releases = 0
+        self.pressed = 0
+        self.released = 0
+
+    def held(self):
+        held = self.stick | self.hat
+        for key in self.keys_down:
+            held |= self.keys[key]
+        for button in self.buttons_down:
+            held |= self.buttons[button]
+        return held
+
+    #runs a change to the held state and notes which actions went down or up because of it
+    def change(self, apply):
+        before = self.held()
+        apply()
+        after = self.held()
+        self.new_presses |= after & ~before
+        self.new_releases |= before & ~after
+
+    def key_down(self, key):
+        if key in self.keys:
+            self.change(lambda: self.keys_down.add(key))
+
+    def key_up(self, key):
+        if key in self.keys_down:
+            self.change(lambda: self.keys_down.discard(key))
+
+    def button_down(self, button):
+        if button in self.buttons:
+            self.change(lambda: self.buttons_down.add(button))
+
+    def button_up(self, button):
+        if button in self.buttons_down:
+            self.change(lambda: self.buttons_down.discard(button))
+
+    #left stick x axis
+    def axis(self, value):
+        bits = ACTION_LEFT if value < -self.deadzone else ACTION_RIGHT if value > self.deadzone else 0
+        if bits != self.stick:
+            self.change(lambda: setattr(self, 'stick', bits))
+
+    #d-pad left/right and up for jump
+    def hat_motion(self, value):
+        bits = (ACTION_LEFT if value[0] < 0 else ACTION_RIGHT if value[0] > 0 else 0) | (ACTION_JUMP if value[1] > 0 else 0)
+        if bits != self.hat:
+            self.change(lambda: setattr(self, 'hat', bits))
+
+    #drops everything held, e.g. when the window loses focus and the key ups would never arrive
+    def release_all(self):
+        self.change(self.clear_held)
+
+    def clear_held(self):
+        self.keys_down.clear()
+        self.clear_pad()
+
+    def clear_pad(self):
+        self.buttons_down.clear()
+        self.stick = 0
+        self.hat = 0
+
+    def update(self):
+        actions = self.held() | (self.new_presses & (ACTION_JUMP | ACTION_DASH | ACTION_ATTACK)) << PRESSED_SHIFT
+        self.pressed = self.new_presses
+        self.released = self.new_releases
+        self.new_presses = 0
+        self.new_releases = 0
+        return actions
+
+
+#reads the event queue for every player. Keyboard bindings and which gamepad (in the order they
+#were plugged in) belongs to who come from the 'controls' section of data/config.json
+class InputManager:
+    def __init__(self, config):
+        self.players = []
+        self.pad_slots = []
+        for player_config in config['players']:
+            self.players.append(PlayerInput(parse_keys(player_config['keys']), parse_buttons(config['gamepad']['buttons']), config['gamepad']['deadzone']))
+            self.pad_slots.append(player_config.get('gamepad'))
+        self.pause_keys = set(key_codes(config['pause']))
+        self.axis = config['gamepad']['axis']
+        self.pads = {}
+
+    #the controllers the simulation reads from, one per player
+    def controllers(self):
+        return list(self.players)
+
+    #feeds one event to whoever it belongs to, returns True if it was the pause key going up
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            for player in self.players:
+                player.key_down(event.key)
+        elif event.type == pygame.KEYUP:
+            for player in self.players:
+                player.key_up(event.key)
+            return event.key in self.pause_keys
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            for player in self.players:
+                player.release_all()
+        elif event.type == pygame.JOYDEVICEADDED:
+            pad = pygame.joystick.Joystick(event.device_index)
+            self.pads[pad.get_instance_id()] = pad
+            self.assign_pads()
+        elif event.type == pygame.JOYDEVICEREMOVED:
+            self.pads.pop(event.instance_id, None)
+            self.assign_pads()
+        elif event.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYAXISMOTION, pygame.JOYHATMOTION):
+            player = self.pad_owner(event.instance_id)
+            if player is None:
+                return False
+            if event.type == pygame.JOYBUTTONDOWN:
+                player.button_down(event.button)
+            elif event.type == pygame.JOYBUTTONUP:
+                player.button_up(event.button)
+            elif event.type == pygame.JOYAXISMOTION and event.axis == self.axis:
+                player.axis(event.value)
+            elif event.type == pygame.JOYHATMOTION and event.hat == 0:
+                player.hat_motion(event.value)
+        return False
+
+    #pads go to players by plug in order, a player whose pad is gone lets go of its buttons
+    def assign_pads(self):
+        order = list(self.pads)
+        for player, slot in zip(self.players, self.pad_slots):
+            pad = order[slot] if slot is not None and slot < len(order) else None
+            if pad != player.pad:
+                player.pad = pad
+                player.change(player.clear_pad)
+
+    def pad_owner(self, instance_id):
+        for player in self.players:
+            if player.pad == instance_id:
+                return player
+        return None
@@ -1,140 +1,296 @@
-import math
-import pygame
-import random
-
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0):
-        self.game = game
-        self.type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets['particle/' + p_type].copy()
-        self.animation.frame = frame
-    
-    def update(self):
-        kill = False
-        if self.animation.done:
-            kill = True
-        
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
-        
-        self.animation.update()
-        
-        return kill
-    
-    def render(self, surf, offset=(0, 0)):
-        img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
-
-
-class Spark:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
-    
-    def update(self):
-        #since position is in cartesian, and angle is polar, conversion is needed 
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
-        
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    
-    def render(self, surf, offset=(0, 0), color = (255,255,255)):
-        #essentially creating a polygon. Has to handle a spark in each orientation.
-        #casting points away from the center by adding cosine of angle*speed. 
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-        ]
-        pygame.draw.polygon(surf, color, render_points)
-        
-
-class EffectGenerator:
-    def __init__(self, game, assets, transition):
-        self.game = game
-        self.assets = assets
-        self.transition = transition
-
-    def create_explosion(self, entity):
-        for i in range(30):
-                        angle = random.random() * math.pi * 2
-                        speed = random.random() * 5
-                        self.game.sparks.append(Spark(entity.rect().center, angle, 2 + random.random()))
-                        self.game.particles.append(Particle(self, 'particle', 
-                                                            entity.rect().center,
-                                                            velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5],
-                                                            frame=random.randint(0, 7)))
-    
-    def create_leaf(self, rect):
-        if random.random() * 49999 < rect.width * rect.height:
-                    pos = (rect.x + random.random() * rect.width, 
-                           rect.y + random.random() * rect.height)
-                    self.game.particles.append(Particle(self, 'leaf', pos, velocity=[-0.1, 0.3], frame=random.randint(0, 20)))
-    
-    def create_shooting_spark(self, projectile, is_flip = 0):
-        pi = math.pi if is_flip else 0
-        for i in range(4):
-            self.game.sparks.append(Spark(projectile[-1][0], random.random() - 0.5 + pi, 2 + random.random()))       
-
-    def create_collision_spark(self, projectile):
-        for i in range(4):
-            #shooting sparks left if projectile is going right and vice versa                                                           
-            self.game.sparks.append(Spark(projectile[0], random.random() - 0.5 + (math.pi if projectile[1] > 0 else 0), 2 + random.random()))
-    
-    def create_ball(self, entity):
-        for i in range(20):
-            angle = random.random() * math.pi * 2 #random angle within 360 deg
-            speed = random.random() * 0.5 + 0.5 #random speed
-            pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed] #calculating based on speed and angle of particle
-            self.game.particles.append(Particle(self.game, 'particle', entity.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
-            
-    def create_damage(self, entity, amount = 1):
-            for i in range(20 * amount):
-                angle = random.random() * math.pi * 2 #random angle within 360 deg
-                speed = (random.random() * 0.5 + 0.5)*2 #random speed
-                pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed] #calculating based on speed and angle of particle
-                self.game.particles.append(Particle(self.game, 'blood', entity.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
-                
-    def create_dead(self, entity):
-        for i in range(50):
-            angle = random.random() * math.pi * 2
-            speed = random.random() * 8
-            self.game.particles.append(Particle(self, 'blood', 
-                                                entity.rect().center,
-                                                velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5],
-                                                frame=random.randint(0, 7)))
-            self.game.particles.append(Particle(self, 'particle', 
-                                                entity.rect().center,
-                                                velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5],
-                                                frame=random.randint(0, 7)))
-               
-    def create_pickup(self, entity):
-        for i in range(20):
-            angle = random.random() * math.pi * 2 #random angle within 360 deg
-            speed = (random.random() + 0.5) #random speed
-            pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed] #calculating based on speed and angle of particle
-            self.game.particles.append(Particle(self.game, 'particle', entity.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
-    
-    def create_pickup(self, entity):
-        for i in range(20):
-            angle = random.random() * math.pi * 2 #random angle within 360 deg
-            speed = (random.random() + 0.5) #random speed
-            pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed] #calculating based on speed and angle of particle
-            self.game.particles.append(Particle(self.game, 'particle', entity.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
-    
-    def create_respawn(self, entity):
-        for i in range(20):
-            angle = random.random() * math.pi * 2 #random angle within 360 deg
-            speed = random.random() * 0.5 + 0.5 #random speed
-            pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed] #calculating based on speed and angle of particle
-            self.game.sparks.append(Spark(entity.rect().center, angle, 2 + random.random()))
-            self.game.particles.append(Particle(self.game, 'particle', entity.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
-            
-    def create_dash_stream(self, entity):
-        pvelocity = [abs(entity.dashing) / entity.dashing * random.random() * 3, 0]
-        self.game.particles.append(Particle(self.game, 'particle', entity.rect().center, velocity=pvelocity, frame=random.randint(0, 7)))
+import math
+import random
+
+import numpy as np
+import pygame
+
+#max live particles per type, anything spawned past this is dropped
+PARTICLE_CAPACITY = {
+    'leaf': 256,
+    'particle': 2048,
+    'blood': 2048,
+}
+SPARK_CAPACITY = 1024
+
+#every live particle of one type, stored as arrays instead of one object each. Dead particles
+#get swapped with live ones from the end so the live ones always sit in [0, count)
+class ParticlePool:
+    def __init__(self, animation, capacity, sway=False):
+        self.images = animation.images
+        self.img_duration = animation.img_duration
+        self.last_frame = animation.img_duration * len(animation.images) - 1
+        self.sway = sway
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int32)
+        #draw offset (half the image size) for every animation frame
+        self.half_size = np.array([(img.get_width() // 2, img.get_height() // 2) for img in self.images], dtype=np.float64).reshape(-1, 2)
+        self.masks = [pygame.mask.from_surface(img) for img in self.images]
+
+    #spawns a batch. Every argument can be a scalar or an array, they get broadcast together
+    def spawn(self, x, y, vx, vy, frame):
+        x, y, vx, vy, frame = np.broadcast_arrays(x, y, vx, vy, frame)
+        n = min(x.size, self.capacity - self.count)
+        if n <= 0:
+            return
+        start = self.count
+        self.pos[start:start + n, 0] = x.ravel()[:n]
+        self.pos[start:start + n, 1] = y.ravel()[:n]
+        self.velocity[start:start + n, 0] = vx.ravel()[:n]
+        self.velocity[start:start + n, 1] = vy.ravel()[:n]
+        self.frame[start:start + n] = frame.ravel()[:n]
+        self.count += n
+
+    #single particle version of spawn, skips the array broadcasting for the per tick leaf/dash spawns
+    def spawn_one(self, x, y, vx, vy, frame):
+        if self.count < self.capacity:
+            i = self.count
+            self.pos[i] = (x, y)
+            self.velocity[i] = (vx, vy)
+            self.frame[i] = frame
+            self.count += 1
+
+    #same rules as Animation(loop=False): a particle dies on the tick after it reaches its last frame
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        dead = self.frame[:n] >= self.last_frame
+        self.pos[:n] += self.velocity[:n]
+        np.minimum(self.frame[:n] + 1, self.last_frame, out=self.frame[:n])
+        if self.sway:
+            self.pos[:n, 0] += np.sin(self.frame[:n] * 0.035) * 0.3
+        if dead.any():
+            self.remove(dead)
+
+    #swap-remove: holes left by dead particles below the new count get filled by the live ones above it
+    def remove(self, dead):
+        dead_idx = np.flatnonzero(dead)
+        new_count = self.count - dead_idx.size
+        holes = dead_idx[dead_idx < new_count]
+        movers = np.flatnonzero(~dead[new_count:]) + new_count
+        self.pos[holes] = self.pos[movers]
+        self.velocity[holes] = self.velocity[movers]
+        self.frame[holes] = self.frame[movers]
+        self.count = new_count
+
+    def clear(self):
+        self.count = 0
+
+    #the live particles, for saving and restoring the match (see scripts/netplay.py)
+    def save_state(self):
+        n = self.count
+        return (n, self.pos[:n].copy(), self.velocity[:n].copy(), self.frame[:n].copy())
+
+    def load_state(self, state):
+        n, pos, velocity, frame = state
+        self.count = n
+        self.pos[:n] = pos
+        self.velocity[:n] = velocity
+        self.frame[:n] = frame
+
+    #mask gets every particle's image mask drawn into it too, at the same spot the blit put it
+    def render(self, surf, offset=(0, 0), mask=None):
+        n = self.count
+        if not n:
+            return
+        img_idx = self.frame[:n] // self.img_duration
+        draw_pos = self.pos[:n] - offset - self.half_size[img_idx]
+        images = self.images
+        surf.blits([(images[i], pos) for i, pos in zip(img_idx.tolist(), draw_pos.tolist())], doreturn=False)
+        if mask is not None:
+            masks = self.masks
+            for i, (x, y) in zip(img_idx.tolist(), draw_pos.tolist()):
+                mask.draw(masks[i], (int(x), int(y)))
+
+
+#holds a pool per particle type. Effects spawn into it in batches, the simulation updates it
+#once a tick and the renderer draws it
+class ParticleSystem:
+    def __init__(self, assets, capacity=PARTICLE_CAPACITY):
+        self.pools = {}
+        for p_type in capacity:
+            self.pools[p_type] = ParticlePool(assets['particle/' + p_type], capacity[p_type], sway=(p_type == 'leaf'))
+
+    def spawn(self, p_type, x, y, vx, vy, frame):
+        self.pools[p_type].spawn(x, y, vx, vy, frame)
+
+    def spawn_one(self, p_type, x, y, vx, vy, frame):
+        self.pools[p_type].spawn_one(x, y, vx, vy, frame)
+
+    def update(self):
+        for pool in self.pools.values():
+            pool.update()
+
+    def clear(self):
+        for pool in self.pools.values():
+            pool.clear()
+
+    def save_state(self):
+        return {p_type: pool.save_state() for p_type, pool in self.pools.items()}
+
+    def load_state(self, state):
+        for p_type, pool in self.pools.items():
+            pool.load_state(state[p_type])
+
+    def render(self, surf, offset=(0, 0), mask=None):
+        for pool in self.pools.values():
+            pool.render(surf, offset=offset, mask=mask)
+
+    def __len__(self):
+        return sum(pool.count for pool in self.pools.values())
+
+
+#for when bullets hit objects, players dash, respawn ect. Sparks are stored as arrays like the
+#particles; the direction (cos/sin of the angle) is worked out once at spawn since it never changes
+class SparkSystem:
+    def __init__(self, capacity=SPARK_CAPACITY, color=(255, 255, 255)):
+        self.capacity = capacity
+        self.color = color
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.direction = np.zeros((capacity, 2))
+        self.speed = np.zeros(capacity)
+
+    #spawns a batch of sparks from (x, y). angle and speed can be scalars or arrays
+    def spawn(self, x, y, angle, speed):
+        angle, speed = np.broadcast_arrays(np.asarray(angle, dtype=np.float64), np.asarray(speed, dtype=np.float64))
+        n = min(angle.size, self.capacity - self.count)
+        if n <= 0:
+            return
+        start = self.count
+        self.pos[start:start + n] = (x, y)
+        self.direction[start:start + n, 0] = np.cos(angle.ravel()[:n])
+        self.direction[start:start + n, 1] = np.sin(angle.ravel()[:n])
+        self.speed[start:start + n] = speed.ravel()[:n]
+        self.count += n
+
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        #since position is in cartesian, and angle is polar, conversion is needed
+        self.pos[:n] += self.direction[:n] * self.speed[:n, None]
+        np.maximum(self.speed[:n] - 0.1, 0, out=self.speed[:n])
+
+        #a spark with no speed left is a zero size polygon, drop them all in one go
+        dead = self.speed[:n] == 0
+        if dead.any():
+            alive = np.flatnonzero(~dead)
+            self.pos[:alive.size] = self.pos[alive]
+            self.direction[:alive.size] = self.direction[alive]
+            self.speed[:alive.size] = self.speed[alive]
+            self.count = alive.size
+
+    def clear(self):
+        self.count = 0
+
+    def save_state(self):
+        n = self.count
+        return (n, self.pos[:n].copy(), self.direction[:n].copy(), self.speed[:n].copy())
+
+    def load_state(self, state):
+        n, pos, direction, speed = state
+        self.count = n
+        self.pos[:n] = pos
+        self.direction[:n] = direction
+        self.speed[:n] = speed
+
+    #essentially creating a polygon. Has to handle a spark in each orientation, so points are
+    #cast away from the center along the direction (speed * 3) and across it (speed * 0.5).
+    #All four corners of every spark are worked out in one array op. Returns the rect each spark was drawn in
+    def render(self, surf, offset=(0, 0)):
+        n = self.count
+        if not n:
+            return []
+        center = self.pos[:n] - offset
+        along = self.direction[:n] * (self.speed[:n, None] * 3)
+        across = self.direction[:n, ::-1] * (self.speed[:n, None] * 0.5) * (-1, 1)
+        points = np.stack([center + along, center + across, center - along, center - across], axis=1)
+        color = self.color
+        return [pygame.draw.polygon(surf, color, polygon) for polygon in points.tolist()]
+
+    def __len__(self):
+        return self.count
+
+
+class EffectGenerator:
+    def __init__(self, game, assets, transition, seed=None):
+        self.game = game
+        self.assets = assets
+        self.transition = transition
+        self.seed(seed)
+
+    #reseeds the effect randomness, so scripted runs and replays spawn the same particles every
+    #time. rng draws the batches, random the odd single value (much cheaper than numpy for one)
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+
+    #where both random streams are at, so a restored match spawns the same particles again
+    def save_state(self):
+        return (self.rng.bit_generator.state, self.random.getstate())
+
+    def load_state(self, state):
+        self.rng.bit_generator.state, random_state = state
+        self.random.setstate(random_state)
+
+    #n random angles (0 to 2pi) and the particle spawn frames that go with them
+    def burst(self, n):
+        return self.rng.random(n) * math.pi * 2, self.rng.integers(0, 8, n)
+
+    #the create_* effects that come off a player take the player's center
+    def create_explosion(self, center):
+        angle, frame = self.burst(30)
+        speed = self.rng.random(30) * 5
+        self.game.sparks.spawn(center[0], center[1], angle, 2 + self.rng.random(30))
+        self.game.particles.spawn('particle', center[0], center[1],
+                                  np.cos(angle + math.pi) * speed * 0.5, np.sin(angle + math.pi) * speed * 0.5, frame)
+    
+    def create_leaf(self, rect):
+        if self.random.random() * 49999 < rect.width * rect.height:
+            self.game.particles.spawn_one('leaf', rect.x + self.random.random() * rect.width, rect.y + self.random.random() * rect.height,
+                                      -0.1, 0.3, self.random.randint(0, 20))
+    
+    def create_shooting_spark(self, pos, is_flip = 0):
+        pi = math.pi if is_flip else 0
+        self.game.sparks.spawn(pos[0], pos[1], self.rng.random(4) - 0.5 + pi, 2 + self.rng.random(4))
+
+    def create_collision_spark(self, pos, speed):
+        #shooting sparks left if projectile is going right and vice versa
+        self.game.sparks.spawn(pos[0], pos[1], self.rng.random(4) - 0.5 + (math.pi if speed > 0 else 0), 2 + self.rng.random(4))
+    
+    #n particles flying out of center in random directions at speed_min to speed_min + speed_range
+    def create_burst(self, center, p_type, n, speed_min, speed_range):
+        angle, frame = self.burst(n)
+        speed = self.rng.random(n) * speed_range + speed_min
+        self.game.particles.spawn(p_type, center[0], center[1], np.cos(angle) * speed, np.sin(angle) * speed, frame)
+        return angle
+    
+    def create_ball(self, center):
+        self.create_burst(center, 'particle', 20, 0.5, 0.5)
+            
+    def create_damage(self, center, amount = 1):
+        self.create_burst(center, 'blood', 20 * amount, 1, 1)
+                
+    def create_dead(self, center):
+        angle, frame = self.burst(50)
+        speed = self.rng.random(50) * 8
+        vx = np.cos(angle + math.pi) * speed * 0.5
+        vy = np.sin(angle + math.pi) * speed * 0.5
+        self.game.particles.spawn('blood', center[0], center[1], vx, vy, frame)
+        self.game.particles.spawn('particle', center[0], center[1], vx, vy, self.rng.integers(0, 8, 50))
+               
+    def create_pickup(self, center):
+        self.create_burst(center, 'particle', 20, 0.5, 1)
+    
+    def create_respawn(self, center):
+        angle = self.create_burst(center, 'particle', 20, 0.5, 0.5)
+        self.game.sparks.spawn(center[0], center[1], angle, 2 + self.rng.random(20))
+            
+    #direction is 1 for a dash to the right, -1 to the left
+    def create_dash_stream(self, center, direction):
+        self.game.particles.spawn_one('particle', center[0], center[1],
+                                      direction * self.random.random() * 3, 0, self.random.randint(0, 7))
@@ -0,0 +1,494 @@
+import numpy as np
+import pygame
+
+from scripts.broadphase import SpatialHash
+from scripts.entities import (ACTION_LEFT, ACTION_RIGHT, ACTION_JUMP_PRESSED, ACTION_DASH_PRESSED, ACTION_ATTACK_PRESSED,
+                              JUMP_BUFFER_TICKS, COYOTE_TICKS, WEAPON_SWORD, WEAPON_GUN)
+
+#a match can't have more players than this (8 or 16 player free for alls are the big ones)
+MAX_FIGHTERS = 16
+FIGHTER_SIZE = (8, 15)
+#player looks, handed out in turn so any number of players can share them
+SKINS = ['player1', 'player2']
+#animation states, fighters store the index
+ANIMATIONS = ['idle', 'run', 'jump', 'wall_slide']
+ANIM_IDLE, ANIM_RUN, ANIM_JUMP, ANIM_WALL_SLIDE = range(len(ANIMATIONS))
+#creates padding around each animation image to account for space
+ANIM_OFFSET = (-3, -3)
+
+#movement in pixels per tick (scripts/navgraph.py plays the same rules through for the bots)
+GRAVITY = 0.1
+MAX_FALL_SPEED = 5
+JUMP_SPEED = 3
+WALL_JUMP_SPEED = (3.5, 2.5)
+WALL_SLIDE_SPEED = 0.5
+#how much x velocity is lost every tick
+FRICTION = 0.1
+#ticks off the ground before a player counts as in the air (wall slides, jump animation), and
+#before falling kills them
+AIRBORNE_TICKS = 4
+FALL_DEATH_TICKS = 120
+
+#a gun goes back to being a sword once it's fired this many times
+GUN_SHOTS = 6
+#a dash counts down from DASH_TICKS, it moves while it's above DASH_MOVING and the rest is cooldown
+DASH_TICKS = 60
+DASH_MOVING = 50
+
+#x axis movement for the left/right action bits (both held cancel out), and the animation for
+#moving that way on the ground, indexed by movement (-1 wraps to the end)
+MOVEMENT = np.array([0, -1, 1, 0])
+MOVE_ANIMATION = np.array([ANIM_IDLE, ANIM_RUN, ANIM_RUN])
+
+
+#swept collision of a box (x, y, w, h as pos and size pairs) that just moved delta along axis
+#(0 for x, 1 for y) from old to where pos is now. Instead of testing the tiles around it, walk the
+#tile columns (or rows) the leading edge actually crossed, so an 8px dash can't tunnel, and stop
+#at the first solid one. Returns the coord along axis to put the box back to, None if nothing was hit
+def sweep_box(is_solid, ts, axis, pos, size, old, delta):
+    lead = int(pos[axis])
+    side = int(pos[1 - axis])
+    across = range(side // ts, (side + size[1 - axis] - 1) // ts + 1)
+    if delta > 0:
+        lines = range((int(old) + size[axis] - 1) // ts, (lead + size[axis] - 1) // ts + 1)
+    else:
+        lines = range(int(old) // ts, lead // ts - 1, -1)
+
+    for line in lines:
+        for cross in across:
+            if is_solid(line, cross) if axis == 0 else is_solid(cross, line):
+                break
+        else:
+            continue
+        return line * ts - size[axis] if delta > 0 else (line + 1) * ts
+    return None
+
+
+#every player in the match, stored as one array per component instead of a Player object (with
+#its own Weapon) each. Player i is row i of every array. The systems (input, movement,
+#collisions, status, dashes, weapons) each run over all players at once, as array ops where
+#that's cheap and as a loop over plain lists where it's branchy, so an 8 or 16 player free for
+#all costs a few times a 1v1 rather than eight times. Arrays are never reallocated (the column
+#views stay valid), so copying state in and out is just copying arrays. Only render() touches images
+class Fighters:
+    def __init__(self, game, count=2, size=FIGHTER_SIZE):
+        if not 0 < count <= MAX_FIGHTERS:
+            raise ValueError(f"a match has 1 to {MAX_FIGHTERS} players, not {count}")
+        self.game = game
+        self.count = count
+
+        #transform, x/y and vx/vy are views of the columns
+        self.pos = np.zeros((count, 2))
+        self.prev_pos = np.zeros((count, 2))
+        self.velocity = np.zeros((count, 2))
+        self.size = np.tile(np.array(size, dtype=np.int64), (count, 1))
+        self.flip = np.zeros(count, dtype=bool)
+        #x axis input of the last tick, -1, 0 or 1
+        self.movement = np.zeros(count, dtype=np.int64)
+        #collision flags of the last move
+        self.collisions = np.zeros((4, count), dtype=bool)
+        self.x, self.y = self.pos.T
+        self.vx, self.vy = self.velocity.T
+        self.hit_up, self.hit_down, self.hit_left, self.hit_right = self.collisions
+
+        #health
+        self.damage = np.zeros(count)
+        self.dead = np.zeros(count, dtype=np.int64)
+        self.need_reset = np.zeros(count, dtype=bool)
+        self.respawn_pos = np.zeros((count, 2))
+
+        #movement state and timers
+        self.air_time = np.zeros(count, dtype=np.int64)
+        self.jumps = np.ones(count, dtype=np.int64)
+        self.wall_slide = np.zeros(count, dtype=bool)
+        self.jump_buffer = np.zeros(count, dtype=np.int64)
+        #ticks left to wall jump after sliding off, and which way the wall was
+        self.wall_coyote = np.zeros(count, dtype=np.int64)
+        self.wall_flip = np.zeros(count, dtype=bool)
+        self.dashing = np.zeros(count, dtype=np.int64)
+
+        #weapon state
+        self.weapon = np.zeros(count, dtype=np.int64)
+        self.attacking = np.zeros(count, dtype=np.int64)
+        self.attack_cooldown = np.zeros(count, dtype=np.int64)
+        self.shots = np.zeros(count, dtype=np.int64)
+
+        #animation, skins are handed out in turn
+        self.skin = np.arange(count) % len(SKINS)
+        self.action = np.zeros(count, dtype=np.int64)
+        self.anim_frame = np.zeros(count, dtype=np.int64)
+        self.animations = [[game.assets[skin + '/' + action] for action in ANIMATIONS] for skin in SKINS]
+        #ticks each animation runs for before looping, [skin, action]
+        self.anim_length = np.array([[anim.img_duration * len(anim.images) for anim in anims] for anims in self.animations], dtype=np.int64)
+
+        self.sword_size = game.assets['sword'].get_size()
+        self.gun_size = game.assets['gunImg'].get_size()
+
+        #where everyone is for the combat checks, see update_broadphase
+        self.broadphase = SpatialHash()
+
+    def __len__(self):
+        return self.count
+
+    #puts a player on a spawn point, which is also where it respawns from now on
+    def place(self, i, pos, face_left=False):
+        self.pos[i] = pos
+        self.respawn_pos[i] = pos
+        self.air_time[i] = 0
+        if face_left:
+            self.flip[i] = True
+
+    #collision rect of every player as (left, top, right, bottom) columns, same numbers as a pygame.Rect
+    def rects(self):
+        topleft = self.pos.astype(np.int64)
+        return np.concatenate([topleft, topleft + self.size], axis=1)
+
+    def centers(self):
+        return self.pos.astype(np.int64) + self.size // 2
+
+    def center(self, i):
+        return (int(self.x[i]) + int(self.size[i, 0]) // 2, int(self.y[i]) + int(self.size[i, 1]) // 2)
+
+    #(player, rect index) for every player overlapping one of rects. A handful of tiles against a
+    #handful of players, pygame's collidelistall beats building the arrays for it
+    def touching(self, rects):
+        pairs = []
+        sizes = self.size.tolist()
+        for i, (x, y) in enumerate(self.pos.tolist()):
+            for j in pygame.Rect(int(x), int(y), *sizes[i]).collidelistall(rects):
+                pairs.append((i, j))
+        return pairs
+
+    #every column a tick can change, for saving and restoring the match (rollback netplay, see
+    #scripts/netplay.py). size and skin never change, the broadphase is rebuilt from pos
+    def state_columns(self):
+        return (self.pos, self.prev_pos, self.velocity, self.flip, self.movement, self.collisions,
+                self.damage, self.dead, self.need_reset, self.respawn_pos,
+                self.air_time, self.jumps, self.wall_slide, self.jump_buffer, self.wall_coyote, self.wall_flip, self.dashing,
+                self.weapon, self.attacking, self.attack_cooldown, self.shots, self.action, self.anim_frame)
+
+    def save_state(self):
+        return [column.copy() for column in self.state_columns()]
+
+    #copied into the existing arrays, so the x/y, vx/vy and hit_* views keep pointing at them
+    def load_state(self, state):
+        for column, saved in zip(self.state_columns(), state):
+            column[...] = saved
+        self.update_broadphase()
+
+    #rebuilds the spatial hash sword, dash and bullet hits go through. Once a tick after moving,
+    #and again after a respawn moved someone
+    def update_broadphase(self):
+        self.broadphase.build(self.rects().tolist())
+
+    def is_dashing(self):
+        return np.abs(self.dashing) > DASH_MOVING
+
+    #one tick for every player. actions is a list of action bits, one per player (missing ones are no input)
+    def update(self, tilemap, actions):
+        self.prev_pos[:] = self.pos
+        movement = self.apply_input(actions)
+        self.move(tilemap, movement)
+        self.update_broadphase()
+        self.check_collisions()
+        self.update_status()
+        self.update_dashes()
+        self.update_weapons()
+        self.attack_cooldown -= self.attack_cooldown > 0
+
+    #applies a tick's action bits, returns the x axis movement. Jump, dash and attack only go off
+    #when pressed, a jump that can't happen yet is kept for JUMP_BUFFER_TICKS. Whatever nobody
+    #pressed this tick is skipped
+    def apply_input(self, actions):
+        actions = list(actions[:self.count]) + [0] * (self.count - len(actions))
+        bits = np.array(actions, dtype=np.int64)
+        pressed = 0
+        for player_actions in actions:
+            pressed |= player_actions
+
+        jump_buffer = self.jump_buffer
+        if pressed & ACTION_JUMP_PRESSED:
+            jump_buffer[(bits & ACTION_JUMP_PRESSED) != 0] = JUMP_BUFFER_TICKS
+        trying = jump_buffer > 0
+        if trying.any():
+            jumped = self.jump(trying)
+            jump_buffer -= trying
+            jump_buffer[jumped] = 0
+
+        if pressed & ACTION_DASH_PRESSED:
+            dash = ((bits & ACTION_DASH_PRESSED) != 0) & (self.dashing == 0)
+            if dash.any():
+                self.dashing[dash] = np.where(self.flip[dash], -DASH_TICKS, DASH_TICKS)
+                self.game.sounds.play('dash')
+
+        if pressed & ACTION_ATTACK_PRESSED:
+            attack = ((bits & ACTION_ATTACK_PRESSED) != 0) & (self.attack_cooldown == 0) & ~self.is_dashing()
+            self.attacking[attack] += 1
+            self.attack_cooldown[attack] = 10
+        return MOVEMENT[bits & (ACTION_LEFT | ACTION_RIGHT)]
+
+    #jumps for everyone in trying that can, returns who did. A wall jump (while sliding or just
+    #after) needs the last tick's movement to point into the wall, otherwise it's a normal jump
+    def jump(self, trying):
+        jumps = self.jumps
+        wall = trying & (self.wall_slide | (self.wall_coyote > 0))
+        off_left = wall & self.wall_flip & (self.movement < 0)
+        off_right = wall & ~self.wall_flip & (self.movement > 0)
+        wall_jump = off_left | off_right
+        ground = trying & ~wall_jump & (jumps > 0) & ~self.wall_slide
+
+        self.vx[off_left] = WALL_JUMP_SPEED[0]
+        self.vx[off_right] = -WALL_JUMP_SPEED[0]
+        self.vy[wall_jump] = -WALL_JUMP_SPEED[1]
+        jumps[wall_jump & (jumps > 0)] -= 1
+        self.wall_coyote[wall_jump] = 0
+        self.vy[ground] = -JUMP_SPEED
+        jumps[ground] -= 1
+
+        jumped = wall_jump | ground
+        self.air_time[jumped] = AIRBORNE_TICKS + 1
+        if jumped.any():
+            self.game.sounds.play('jump')
+        return jumped
+
+    #moves everyone by their input and velocity, x then y, then gravity
+    def move(self, tilemap, movement):
+        self.collisions[:] = False
+        dx = self.vx + movement
+        old = self.x.tolist()
+        self.x += dx
+        if dx.any():
+            self.sweep(tilemap, 0, old, dx.tolist())
+        old = self.y.tolist()
+        dy = self.vy.tolist()
+        self.y += self.vy
+        self.sweep(tilemap, 1, old, dy)
+        #a way to mimic terminal velocity
+        np.minimum(self.vy + GRAVITY, MAX_FALL_SPEED, out=self.vy)
+
+        self.flip[movement > 0] = False
+        self.flip[movement < 0] = True
+        self.movement[:] = movement
+        self.vy[self.hit_up | self.hit_down] = 0
+
+        self.anim_frame += 1
+        self.anim_frame %= self.anim_length[self.skin, self.action]
+
+    #swept collision along one axis, see sweep_box. Only a tile or two per player and very
+    #branchy, so it's a plain loop over the players that moved
+    def sweep(self, tilemap, axis, old, deltas):
+        ts = tilemap.tile_size
+        is_solid = tilemap.is_solid
+        coords = self.pos.tolist()
+        sizes = self.size.tolist()
+        for i, delta in enumerate(deltas):
+            if not delta:
+                continue
+            stop = sweep_box(is_solid, ts, axis, coords[i], sizes[i], old[i], delta)
+            if stop is None:
+                continue
+            self.pos[i, axis] = stop
+            if delta > 0:
+                (self.hit_right if axis == 0 else self.hit_down)[i] = True
+            else:
+                (self.hit_left if axis == 0 else self.hit_up)[i] = True
+
+    #updates based on environment collisions: landing, falling for too long, wall sliding, and
+    #which animation that all adds up to
+    def check_collisions(self):
+        air_time = self.air_time
+        wall_coyote = self.wall_coyote
+
+        #checking for free falling, kinda bad
+        air_time += 1
+        falling = air_time > FALL_DEATH_TICKS
+        if falling.any():
+            self.dead[falling & ~(self.hit_right & self.hit_left)] += 1
+
+        #on the ground
+        down = self.hit_down
+        if down.any():
+            air_time[down] = 0
+            self.jumps[down] = 1
+            wall_coyote[down] = 0
+
+        #wall jumping/sliding
+        wall_coyote -= wall_coyote > 0
+        airborne = air_time > AIRBORNE_TICKS
+        sliding = (self.hit_right | self.hit_left) & airborne
+        self.wall_slide[:] = sliding
+        if sliding.any():
+            self.vy[sliding] = np.minimum(self.vy[sliding], WALL_SLIDE_SPEED)
+            self.flip[sliding] = ~self.hit_right[sliding]
+            self.wall_flip[sliding] = ~self.hit_right[sliding]
+            wall_coyote[sliding] = COYOTE_TICKS
+
+        action = np.where(sliding, ANIM_WALL_SLIDE, np.where(airborne, ANIM_JUMP, MOVE_ANIMATION[self.movement]))
+        self.anim_frame[action != self.action] = 0
+        self.action[:] = action
+
+    #checking for damage, and respawning whoever the battle manager flagged
+    def update_status(self):
+        self.dead += self.damage > 3
+        if not self.need_reset.any():
+            return
+        resetting = self.need_reset & (self.dead > 0)
+        if resetting.any():
+            for i in np.flatnonzero(resetting).tolist():
+                self.game.effects.create_dead(self.center(i))
+                self.game.stats.death(i)
+            self.reset(resetting)
+
+    #back to full health with a sword, on the respawn point
+    def reset(self, picked):
+        for column in (self.air_time, self.dead, self.jump_buffer, self.wall_coyote, self.dashing, self.attacking, self.damage):
+            column[picked] = 0
+        self.jumps[picked] = 1
+        self.wall_slide[picked] = False
+        self.velocity[picked] = 0
+        indices = np.flatnonzero(picked).tolist()
+        for i in indices:
+            self.change_weapon(i)
+        self.pos[picked] = self.respawn_pos[picked]
+        self.need_reset[picked] = False
+        self.update_broadphase()
+        for i in indices:
+            self.game.effects.create_respawn(self.center(i))
+
+    #dash movement and its particles, then slowing everyone down along x
+    def update_dashes(self):
+        dashing = self.dashing
+        if dashing.any():
+            for i, dash in enumerate(dashing.tolist()):
+                if abs(dash) == DASH_TICKS or abs(dash) == DASH_MOVING:
+                    self.game.effects.create_ball(self.center(i))
+
+            direction = np.sign(dashing)
+            dashing -= direction
+            #full speed the first 10 ticks, dampened on the last one
+            moving = np.abs(dashing) > DASH_MOVING
+            if moving.any():
+                self.vx[moving] = direction[moving] * 8
+                self.vx[moving & (np.abs(dashing) == DASH_MOVING + 1)] *= 0.1
+                for i in np.flatnonzero(moving).tolist():
+                    self.game.effects.create_dash_stream(self.center(i), int(direction[i]))
+
+        #normalizing x axis movement, FRICTION closer to 0 without going past it
+        self.vx -= np.minimum(np.maximum(self.vx, -FRICTION), FRICTION)
+
+    #whoever attacked this tick shoots or swings, then dashing into someone hurts them (or you,
+    #if they're holding a sword)
+    def update_weapons(self):
+        attacking = self.attacking > 0
+        if attacking.any():
+            weapon = self.weapon
+            for i in np.flatnonzero(attacking & (weapon == WEAPON_GUN)).tolist():
+                self.shoot(i)
+            for i in np.flatnonzero(attacking & (weapon == WEAPON_SWORD)).tolist():
+                self.swing(i)
+            self.attacking[:] = 0
+            for i in np.flatnonzero((weapon == WEAPON_GUN) & (self.shots >= GUN_SHOTS)).tolist():
+                self.change_weapon(i)
+
+        if self.dashing.any():
+            for i in np.flatnonzero(self.is_dashing() & (self.weapon != WEAPON_GUN)).tolist():
+                self.dash_hits(i)
+
+    #top left of the sword's hitbox, it's held out in front at the player's middle
+    def sword_pos(self, i):
+        x, y = self.pos[i].tolist()
+        w, h = self.size[i].tolist()
+        sword_w, sword_h = self.sword_size
+        return (int(x - sword_w if self.flip[i] else x + w), int(y + (h - sword_h) // 2))
+
+    def gun_pos(self, i):
+        x, y = self.pos[i].tolist()
+        w, h = self.size[i].tolist()
+        gun_w, gun_h = self.gun_size
+        return (x - gun_w if self.flip[i] else x + w, y + (h - gun_h) // 2)
+
+    #since sword is default, change_weapon will always default to sword but can be overridden for gun
+    def change_weapon(self, i, weapon=WEAPON_SWORD):
+        self.weapon[i] = weapon
+        self.shots[i] = 0
+        self.game.effects.create_pickup(self.center(i))
+
+    def shoot(self, i):
+        self.shots[i] += 1
+        flip = bool(self.flip[i])
+        gun_x, gun_y = self.gun_pos(i)
+        muzzle = (gun_x, gun_y + self.gun_size[1] // 2)
+        self.game.projectiles.spawn(muzzle[0], muzzle[1], -2.5 if flip else 2.5, owner=i)
+        self.game.stats.shot(i)
+        self.game.effects.create_shooting_spark(muzzle, flip)
+        self.game.sounds.play('shoot')
+
+    #the sword hurts everyone else its hitbox overlaps
+    def swing(self, i):
+        x, y = self.sword_pos(i)
+        w, h = self.sword_size
+        for victim in self.broadphase.overlapping(x, y, x + w, y + h):
+            if victim != i:
+                self.hurt(victim, 'sword', i)
+                self.game.sounds.play('hit')
+
+    #a dash with a sword out hurts whoever's position is inside the dasher, unless they're
+    #holding a sword too, then it's the dasher that gets hurt
+    def dash_hits(self, i):
+        rects = self.broadphase.rects
+        left, top, right, bottom = rects[i]
+        for opponent in self.broadphase.near_rect(left, top, right, bottom):
+            x, y = rects[opponent][:2]
+            if opponent == i or not (left <= x < right and top <= y < bottom):
+                continue
+            if self.weapon[opponent] == WEAPON_SWORD:
+                self.hurt(i, 'sword', opponent)
+            else:
+                self.hurt(opponent, 'dash', i)
+            self.game.sounds.play('hit')
+
+    #damage by what hit them: 'sword', 'gun' or 'dash'. attacker is who did it, -1 if nobody
+    def hurt(self, i, source='dash', attacker=-1):
+        self.game.sounds.play('damage')
+        amount = 0
+        if source == 'sword':
+            amount += 2
+            self.game.effects.create_damage(self.center(i), 2)
+
+        if source == 'gun':
+            amount += 4
+        else:
+            amount += 1.5
+            self.game.effects.create_damage(self.center(i))
+        self.damage[i] += amount
+        self.game.stats.hit(attacker, i, source, amount)
+
+    #draws every player and their weapon, returns the rects it drew over. alpha is how far we are
+    #between the last tick and the next one, players are drawn that far along from their previous
+    #position (unless they teleported, e.g. respawn)
+    def render(self, surf, offset=(0, 0), alpha=1):
+        step = self.pos - self.prev_pos
+        lag = np.where((np.abs(step).sum(axis=1) < 32)[:, None], step * (1 - alpha), 0)
+        draw_offsets = (lag + offset).tolist()
+        columns = [column.tolist() for column in (self.pos, self.skin, self.action, self.anim_frame, self.flip, self.dashing, self.weapon, self.attack_cooldown)]
+        rects = []
+        for i, ((x, y), skin, action, frame, flip, dashing, weapon, cooldown) in enumerate(zip(*columns)):
+            ox, oy = draw_offsets[i]
+            if abs(dashing) <= DASH_MOVING:
+                anim = self.animations[skin][action]
+                img = anim.images[frame // anim.img_duration]
+                rects.append(surf.blit(pygame.transform.flip(img, flip, False), (x - ox + ANIM_OFFSET[0], y - oy + ANIM_OFFSET[1])))
+
+            #weapons go on top of the players if they aren't wall sliding or dashing
+            if action == ANIM_WALL_SLIDE or abs(dashing) > DASH_MOVING:
+                continue
+            if weapon == WEAPON_SWORD:
+                #lowers the sword during cooldown
+                img = self.game.assets['sword']
+                weapon_x, weapon_y = self.sword_pos(i)
+                weapon_y += 3 if cooldown > 0 else 0
+            else:
+                img = self.game.assets['gunImg']
+                weapon_x, weapon_y = self.gun_pos(i)
+            rects.append(surf.blit(pygame.transform.flip(img, True, False) if flip else img, (weapon_x - ox, weapon_y - oy)))
+        return rects
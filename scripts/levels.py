@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+
+import pygame
+
+from scripts.tilemap import Tilemap
+from scripts.mapformat import MAP_EXT, load_map, map_source, source_crc
+
+MAP_PATH = 'data/maps/'
+
+
+#a map loaded into its own Tilemap with everything the first frame needs already done: parsed,
+#indexed, chunks baked, spawners pulled out and tree rects found
+class Level:
+    def __init__(self, map_id, tilemap, spawners, leaf_spawners):
+        self.map_id = map_id
+        self.tilemap = tilemap
+        self.spawners = spawners
+        self.leaf_spawners = leaf_spawners
+
+#the binary version of a map when it was converted from the json that's there now, otherwise the
+#json. The .map records a checksum of the json it came from (file times don't survive checkouts
+#and copies), so an edited map is picked up until convert_maps.py is run again
+def map_path(map_id):
+    json_path = MAP_PATH + str(map_id) + '.json'
+    binary_path = MAP_PATH + str(map_id) + MAP_EXT
+    if not os.path.exists(binary_path):
+        return json_path
+    if not os.path.exists(json_path):
+        return binary_path
+    return binary_path if map_source(binary_path) == source_crc(json_path) else json_path
+
+#parsed map files kept around, for a process that builds the same maps over and over (the batch
+#runner) instead of reading and parsing the file every time. Every get() is a copy the level can
+#change. The game doesn't use one, the editor can save a map while it's running
+class MapCache:
+    def __init__(self):
+        self.maps = {}
+
+    def get(self, map_id):
+        if map_id not in self.maps:
+            self.maps[map_id] = load_map(map_path(map_id))
+        return self.maps[map_id].copy()
+
+
+#does all the work load_level used to do in the middle of a frame. If it tries to load a map
+#that doesn't exist, it loads the main menu instead. maps is a MapCache to take the map from
+def prepare_level(game, map_id, maps=None):
+    tilemap = Tilemap(game, tile_size=16)
+    try:
+        tilemap.load_map_data(maps.get(map_id) if maps else load_map(map_path(map_id)))
+    except Exception as e:
+        tilemap.load_map_data(maps.get(-1) if maps else load_map(map_path(-1)))
+        print(f"Failed to load map {map_id}, sent to main menu!")
+
+    leaf_spawners = []
+    for tree in tilemap.extract([('large_decor', 2)], keep=True):
+        leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))
+    spawners = tilemap.extract([('spawners', 0), ('spawners', 1), ('spawners', 2)])
+
+    #warm every cache the first tick would otherwise build
+    tilemap.solid_grid()
+    tilemap.get_transition_tiles_loc()
+    tilemap.get_gun_tile_loc()
+    tilemap.prebake()
+    return Level(map_id, tilemap, spawners, leaf_spawners)
+
+
+#keeps the maps a match can go to next prepared on the background loader, so changing maps is
+#just swapping the tilemap reference. A level is handed out once (it gets played on and changed),
+#asking for one that isn't ready yet waits for it if it's in flight or loads it on the spot.
+#history records how every load was served and how long the caller was held up
+class LevelLoader:
+    def __init__(self, game, prefetcher=None, maps=None):
+        self.game = game
+        self.prefetcher = prefetcher
+        self.maps = maps
+        self.ready = {}
+        self.pending = set()
+        self.done = threading.Condition()
+        self.history = []
+
+    #queues maps to be prepared in the background and forgets prepared ones that aren't wanted anymore
+    def prefetch(self, map_ids):
+        with self.done:
+            for map_id in list(self.ready):
+                if map_id not in map_ids:
+                    del self.ready[map_id]
+            if not self.prefetcher:
+                return
+            for map_id in map_ids:
+                if map_id not in self.ready and map_id not in self.pending:
+                    self.pending.add(map_id)
+                    self.prefetcher.submit(self.prepare, map_id)
+
+    def prepare(self, map_id):
+        level = None
+        try:
+            level = prepare_level(self.game, map_id, self.maps)
+        finally:
+            with self.done:
+                self.pending.discard(map_id)
+                if level is not None:
+                    self.ready[map_id] = level
+                self.done.notify_all()
+
+    def is_ready(self, map_id):
+        with self.done:
+            return map_id in self.ready
+
+    #the prepared level for map_id, removed from the cache. mode in the history is 'swap' if it was
+    #ready, 'wait' if it was still being prepared and 'sync' if it had to be loaded right here
+    def take(self, map_id):
+        start = time.perf_counter()
+        mode = 'swap'
+        with self.done:
+            while map_id in self.pending:
+                mode = 'wait'
+                self.done.wait()
+            level = self.ready.pop(map_id, None)
+        if level is None:
+            mode = 'sync'
+            level = prepare_level(self.game, map_id, self.maps)
+        self.history.append((map_id, mode, (time.perf_counter() - start) * 1000))
+        return level
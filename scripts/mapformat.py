@@ -0,0 +1,186 @@
+import json
+import mmap
+import zlib
+import struct
+
+import numpy as np
+
+#binary map layout (little endian), version 2:
+#   header      magic, version, tile size, bounding box origin x/y and width/height in tiles,
+#               number of type names, number of offgrid tiles, crc32 of the json file the map
+#               was converted from (0 if it wasn't)
+#   names       per type name: u8 length + utf-8 bytes. Tile and offgrid type ids index this
+#   (padding to an even offset)
+#   types       int16[height][width] type ids over the bounding box, -1 for air
+#   variants    int16[height][width]
+#   offgrid     OFFGRID_RECORD per offgrid tile, in draw order
+MAP_MAGIC = b'SMAP'
+MAP_VERSION = 2
+MAP_EXT = '.map'
+HEADER = struct.Struct('<4sHHiiIIHII')
+
+#offgrid positions are pixel floats, flags remember which ones were ints in the json so a
+#round trip gives back exactly what went in
+OFFGRID_RECORD = np.dtype([('type', '<u2'), ('variant', '<i2'), ('flags', 'u1'), ('x', '<f8'), ('y', '<f8')])
+INT_X = 1
+INT_Y = 2
+
+
+#a whole map as arrays: the grid over its bounding box plus the offgrid list as json style dicts
+class MapData:
+    def __init__(self, tile_size, origin, types, variants, names, offgrid):
+        self.tile_size = tile_size
+        self.origin = origin
+        self.types = types
+        self.variants = variants
+        self.names = names
+        self.offgrid = offgrid
+
+    #builds the arrays from (x, y, type name, variant) tuples
+    @classmethod
+    def from_tiles(cls, tile_size, tiles, offgrid):
+        tiles = list(tiles)
+        names = []
+        ids = {}
+        for tile in tiles:
+            if tile[2] not in ids:
+                ids[tile[2]] = len(names)
+                names.append(tile[2])
+        for tile in offgrid:
+            if tile['type'] not in ids:
+                ids[tile['type']] = len(names)
+                names.append(tile['type'])
+
+        if not tiles:
+            return cls(tile_size, (0, 0), np.full((0, 0), -1, dtype=np.int16), np.zeros((0, 0), dtype=np.int16), names, offgrid)
+        x0 = min(tile[0] for tile in tiles)
+        y0 = min(tile[1] for tile in tiles)
+        width = max(tile[0] for tile in tiles) - x0 + 1
+        height = max(tile[1] for tile in tiles) - y0 + 1
+        types = np.full((height, width), -1, dtype=np.int16)
+        variants = np.zeros((height, width), dtype=np.int16)
+        for x, y, tile_type, variant in tiles:
+            types[y - y0, x - x0] = ids[tile_type]
+            variants[y - y0, x - x0] = variant
+        return cls(tile_size, (x0, y0), types, variants, names, offgrid)
+
+    #from the json maps ({'tilemap': {'x;y': tile}, 'tile_size', 'offgrid'})
+    @classmethod
+    def from_json(cls, map_data):
+        tiles = [(int(tile['pos'][0]), int(tile['pos'][1]), tile['type'], tile['variant']) for tile in map_data['tilemap'].values()]
+        return cls.from_tiles(map_data['tile_size'], tiles, [dict(tile) for tile in map_data['offgrid']])
+
+    #another MapData to load into a second Tilemap. The arrays are shared (loading only reads
+    #them), the offgrid tiles are copied since a level takes its spawners out of them
+    def copy(self):
+        return MapData(self.tile_size, self.origin, self.types, self.variants, self.names, [dict(tile, pos=list(tile['pos'])) for tile in self.offgrid])
+
+    #grid tiles as (x, y, type name, variant), row by row
+    def tiles(self):
+        ys, xs = np.nonzero(self.types >= 0)
+        x0, y0 = self.origin
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            yield x + x0, y + y0, self.names[self.types[y, x]], int(self.variants[y, x])
+
+    def to_json(self):
+        tilemap = {}
+        for x, y, tile_type, variant in self.tiles():
+            tilemap[str(x) + ';' + str(y)] = {'type': tile_type, 'variant': variant, 'pos': [x, y]}
+        return {'tilemap': tilemap, 'tile_size': self.tile_size, 'offgrid': [dict(tile) for tile in self.offgrid]}
+
+
+#true if the file starts with the binary map magic, so Tilemap.load can take either format
+def is_binary_map(path):
+    f = open(path, 'rb')
+    magic = f.read(len(MAP_MAGIC))
+    f.close()
+    return magic == MAP_MAGIC
+
+#source is the source_crc() of the json the map came from, so the loader can tell if it's stale
+def write_map(path, data, source=0):
+    height, width = data.types.shape
+    out = [HEADER.pack(MAP_MAGIC, MAP_VERSION, data.tile_size, data.origin[0], data.origin[1], width, height, len(data.names), len(data.offgrid), source)]
+    for name in data.names:
+        encoded = name.encode('utf-8')
+        out.append(struct.pack('<B', len(encoded)) + encoded)
+    if sum(len(part) for part in out) % 2:
+        out.append(b'\0')
+    out.append(data.types.astype('<i2').tobytes())
+    out.append(data.variants.astype('<i2').tobytes())
+
+    ids = {name: i for i, name in enumerate(data.names)}
+    records = np.zeros(len(data.offgrid), dtype=OFFGRID_RECORD)
+    for i, tile in enumerate(data.offgrid):
+        x, y = tile['pos']
+        records[i] = (ids[tile['type']], tile['variant'], (INT_X if isinstance(x, int) else 0) | (INT_Y if isinstance(y, int) else 0), x, y)
+    out.append(records.tobytes())
+
+    f = open(path, 'wb')
+    f.write(b''.join(out))
+    f.close()
+
+#memory maps a binary map and reads the arrays straight out of it. The grid gets copied once
+#(the mapping is closed before returning), nothing goes through per tile python objects
+def read_map(path):
+    f = open(path, 'rb')
+    try:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    try:
+        magic, version, tile_size, x0, y0, width, height, name_count, offgrid_count, source = HEADER.unpack_from(buf, 0)
+        if magic != MAP_MAGIC:
+            raise ValueError(f"{path} is not a binary map")
+        if version != MAP_VERSION:
+            raise ValueError(f"{path} is map format version {version}, expected {MAP_VERSION}")
+
+        offset = HEADER.size
+        names = []
+        for i in range(name_count):
+            length = buf[offset]
+            names.append(buf[offset + 1:offset + 1 + length].decode('utf-8'))
+            offset += 1 + length
+        offset += offset % 2
+
+        cells = width * height
+        types = np.frombuffer(buf, dtype='<i2', count=cells, offset=offset).reshape(height, width).astype(np.int16)
+        offset += cells * 2
+        variants = np.frombuffer(buf, dtype='<i2', count=cells, offset=offset).reshape(height, width).astype(np.int16)
+        offset += cells * 2
+        records = np.frombuffer(buf, dtype=OFFGRID_RECORD, count=offgrid_count, offset=offset).copy()
+    finally:
+        buf.close()
+
+    offgrid = []
+    for tile_type, variant, flags, x, y in records.tolist():
+        offgrid.append({'type': names[tile_type], 'variant': variant, 'pos': [int(x) if flags & INT_X else x, int(y) if flags & INT_Y else y]})
+    return MapData(tile_size, (x0, y0), types, variants, names, offgrid)
+
+#checksum of a json map file's bytes, what a binary map converted from it records. Line endings
+#don't count, a checkout that rewrites them hasn't changed the map
+def source_crc(path):
+    f = open(path, 'rb')
+    crc = zlib.crc32(f.read().replace(b'\r\n', b'\n'))
+    f.close()
+    return crc
+
+#the source_crc a binary map was written with, None if it isn't one in the current version
+def map_source(path):
+    f = open(path, 'rb')
+    header = f.read(HEADER.size)
+    f.close()
+    if len(header) < HEADER.size:
+        return None
+    magic, version = HEADER.unpack(header)[:2]
+    if magic != MAP_MAGIC or version != MAP_VERSION:
+        return None
+    return HEADER.unpack(header)[-1]
+
+#either format, the binary one is recognised by its header
+def load_map(path):
+    if is_binary_map(path):
+        return read_map(path)
+    f = open(path, 'r')
+    map_data = json.load(f)
+    f.close()
+    return MapData.from_json(map_data)
@@ -0,0 +1,145 @@
+#where damage comes from and what a player can hold (indexed by WEAPON_SWORD/WEAPON_GUN)
+SOURCES = ['sword', 'gun', 'dash']
+WEAPONS = ['sword', 'gun']
+
+#what end_round() hands back, in column order. ttk_* are summed ticks from a player's first hit
+#taken to the kill, divide by kills_* for the mean. kills_with_*/deaths_with_* are by what the
+#killer and the one killed were holding. winner is the side (0 even, 1 odd players) that took the
+#map, -1 if the round was cut off
+ROUND_COLUMNS = (['map', 'players', 'ticks', 'winner', 'next_map', 'falls'] +
+                 [f"{stat}_{source}" for source in SOURCES for stat in ('damage', 'hits', 'kills', 'ttk')] +
+                 ['shots', 'pickups'] +
+                 [f"{stat}_{weapon}" for weapon in WEAPONS for stat in ('kills_with', 'deaths_with')])
+
+
+#tallies a match for balance numbers: damage by source, kills and how long they took, shots,
+#pickups and who took the map. The fighters and battle manager report here, nothing in it
+#changes the game. Counted per round (until the map changes), end_round() returns the round's
+#row and starts the next one
+class MatchStats:
+    def __init__(self, game):
+        self.game = game
+        self.start_round()
+
+    def start_round(self):
+        players = len(self.game.fighters)
+        self.round = {column: 0 for column in ROUND_COLUMNS}
+        self.round['map'] = self.game.level
+        self.round['players'] = players
+        self.round['winner'] = -1
+        self.round['next_map'] = self.game.level
+        self.start_tick = self.game.tick_count
+        self.ended = False
+        #per player: who last hurt them with what, and when the first hit since spawning landed
+        self.last_attacker = [-1] * players
+        self.last_source = [None] * players
+        self.first_hit = [None] * players
+
+    #the round so far, for saving and restoring the match (see scripts/netplay.py). A rolled back
+    #tick is played again, restoring the tallies with it stops it being counted twice
+    def save_state(self):
+        return (dict(self.round), self.start_tick, self.ended, list(self.last_attacker), list(self.last_source), list(self.first_hit))
+
+    def load_state(self, state):
+        tallies, self.start_tick, self.ended, last_attacker, last_source, first_hit = state
+        self.round = dict(tallies)
+        self.last_attacker = list(last_attacker)
+        self.last_source = list(last_source)
+        self.first_hit = list(first_hit)
+
+    def end_round(self):
+        row = self.round
+        row['ticks'] = self.game.tick_count - self.start_tick
+        self.start_round()
+        return row
+
+    def hit(self, attacker, victim, source, amount):
+        self.round['damage_' + source] += amount
+        self.round['hits_' + source] += 1
+        self.last_attacker[victim] = attacker
+        self.last_source[victim] = source
+        if self.first_hit[victim] is None:
+            self.first_hit[victim] = self.game.tick_count
+
+    #call before the player is reset. Dying with 3 or less damage means they fell
+    def death(self, victim):
+        fighters = self.game.fighters
+        source = self.last_source[victim]
+        if fighters.damage[victim] <= 3 or source is None:
+            self.round['falls'] += 1
+        else:
+            self.round['kills_' + source] += 1
+            self.round['ttk_' + source] += self.game.tick_count - self.first_hit[victim]
+            killer = self.last_attacker[victim]
+            if killer >= 0:
+                self.round['kills_with_' + WEAPONS[fighters.weapon[killer]]] += 1
+            self.round['deaths_with_' + WEAPONS[fighters.weapon[victim]]] += 1
+        self.last_attacker[victim] = -1
+        self.last_source[victim] = None
+        self.first_hit[victim] = None
+
+    def shot(self, shooter):
+        self.round['shots'] += 1
+
+    def pickup(self, player):
+        self.round['pickups'] += 1
+
+    #next_map was called, adv_player as it got it. Call after the new map is in
+    def transition(self, adv_player):
+        self.round['winner'] = {1: 0, 2: 1}.get(adv_player, -1)
+        self.round['next_map'] = self.game.level
+        self.ended = True
+
+
+#running totals over round rows, per map and per damage source / weapon, so any number of rows
+#can go through it without keeping them. Works on rows straight from the csv too (strings)
+class StatsSummary:
+    def __init__(self):
+        self.maps = {}
+        self.totals = {column: 0 for column in ROUND_COLUMNS}
+        self.rounds = 0
+
+    def add(self, row):
+        row = {column: float(row[column]) for column in ROUND_COLUMNS}
+        map_id = int(row['map'])
+        if map_id not in self.maps:
+            self.maps[map_id] = {'rounds': 0, 'wins': [0, 0], 'next': {}, 'stats': {column: 0 for column in ROUND_COLUMNS}}
+        stats = self.maps[map_id]
+        stats['rounds'] += 1
+        if row['winner'] >= 0:
+            stats['wins'][int(row['winner'])] += 1
+            next_map = int(row['next_map'])
+            stats['next'][next_map] = stats['next'].get(next_map, 0) + 1
+        for column in ROUND_COLUMNS:
+            stats['stats'][column] += row[column]
+            self.totals[column] += row[column]
+        self.rounds += 1
+
+    def report(self, tick_rate=60):
+        lines = [f"{self.rounds} rounds", '',
+                 f"{'map':>4} {'rounds':>7} {'left win':>9} {'right win':>10} {'cut off':>8} {'avg s':>7} {'kills':>6} {'falls':>6} {'avg ttk s':>10}  next maps"]
+        for map_id in sorted(self.maps):
+            stats = self.maps[map_id]
+            rounds = stats['rounds']
+            totals = stats['stats']
+            kills = sum(totals['kills_' + source] for source in SOURCES)
+            ttk = sum(totals['ttk_' + source] for source in SOURCES)
+            next_maps = ', '.join(f"{next_map}: {count}" for next_map, count in sorted(stats['next'].items()))
+            lines.append(f"{map_id:>4} {rounds:>7} {stats['wins'][0] / rounds:>9.1%} {stats['wins'][1] / rounds:>10.1%} "
+                         f"{(rounds - sum(stats['wins'])) / rounds:>8.1%} {totals['ticks'] / rounds / tick_rate:>7.1f} {kills:>6.0f} "
+                         f"{totals['falls']:>6.0f} {ttk / max(kills, 1) / tick_rate:>10.2f}  {next_maps}")
+
+        totals = self.totals
+        lines += ['', f"{'source':>7} {'damage':>9} {'hits':>7} {'kills':>6} {'avg ttk s':>10}"]
+        for source in SOURCES:
+            kills = totals['kills_' + source]
+            lines.append(f"{source:>7} {totals['damage_' + source]:>9.1f} {totals['hits_' + source]:>7.0f} {kills:>6.0f} "
+                         f"{totals['ttk_' + source] / max(kills, 1) / tick_rate:>10.2f}")
+
+        lines += ['', f"{'weapon':>7} {'kills':>6} {'deaths':>7} {'win rate':>9}"]
+        for weapon in WEAPONS:
+            kills = totals['kills_with_' + weapon]
+            deaths = totals['deaths_with_' + weapon]
+            lines.append(f"{weapon:>7} {kills:>6.0f} {deaths:>7.0f} {kills / max(kills + deaths, 1):>9.1%}")
+        lines.append(f"shots {totals['shots']:.0f}, gun pickups {totals['pickups']:.0f}")
+        return '\n'.join(lines)
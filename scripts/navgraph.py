@@ -0,0 +1,433 @@
+import os
+import zlib
+import itertools
+import heapq
+import struct
+
+import numpy as np
+
+from scripts.entities import ACTION_LEFT, ACTION_RIGHT, ACTION_JUMP, ACTION_JUMP_PRESSED, JUMP_BUFFER_TICKS, COYOTE_TICKS
+from scripts.fighters import (FIGHTER_SIZE, GRAVITY, MAX_FALL_SPEED, JUMP_SPEED, WALL_JUMP_SPEED, WALL_SLIDE_SPEED, FRICTION,
+                              AIRBORNE_TICKS, FALL_DEATH_TICKS, sweep_box)
+from scripts.levels import MAP_PATH
+
+#nav graph file layout (little endian), version 1, data/maps/<map id>.nav:
+#   header    magic, version, crc of the solid grid it was built from, node count, edge count,
+#             length of the actions
+#   nodes     NODE per node
+#   edges     EDGE per edge, sorted by src
+#   actions   one byte of action bits per tick, every edge's run back to back
+#bump NAV_VERSION whenever the movement rules change, old graphs get rebuilt
+NAV_MAGIC = b'SNAV'
+NAV_VERSION = 1
+NAV_EXT = '.nav'
+HEADER = struct.Struct('<4sHIIII')
+NODE = np.dtype([('x', '<i2'), ('y', '<i2')])
+EDGE = np.dtype([('src', '<u2'), ('dst', '<u2'), ('cost', '<u2'), ('kind', 'u1'), ('length', '<u2'), ('start', '<u4')])
+EDGE_KINDS = ['walk', 'fall', 'jump', 'wall_jump']
+WALK, FALL, JUMP, WALL_JUMP = range(len(EDGE_KINDS))
+
+#a move that hasn't landed after this many ticks is dropped (falling that long kills anyway)
+MAX_MOVE_TICKS = FALL_DEATH_TICKS
+#how the moves tried from every node are put together: ticks a direction is held (None for until
+#landing), ticks spent going straight up before steering, ticks of falling before an air jump,
+#and how many wall jumps in a row up one wall or up a shaft
+HOLDS = (4, 8, 12, 16, 24, 32, 48, None)
+DELAYS = (0, 8, 16)
+AIR_JUMP_WAITS = (2, 8, 16)
+WALL_JUMPS = (1, 2, 3)
+CLIMB_JUMPS = (2, 4, 6, 8)
+#a move has to land on the same node when started this many pixels either side of the middle,
+#the bots play them back blind and won't be standing exactly there
+START_SLACK = 1
+#fastest anything moves along either axis in pixels per tick, keeps the A* heuristic admissible
+MAX_SPEED = MAX_FALL_SPEED
+
+DIRECTION_BITS = {-1: ACTION_LEFT, 0: 0, 1: ACTION_RIGHT}
+JUMP_BITS = ACTION_JUMP | ACTION_JUMP_PRESSED
+
+
+#one player's movement, the same rules Fighters runs (input, move, check_collisions, friction)
+#with plain floats and without the combat, dashes or animation. What a move does here is what
+#it does in a match started from the same spot
+class Body:
+    def __init__(self, x, y, size=FIGHTER_SIZE):
+        self.x = x
+        self.y = y
+        self.size = size
+        self.vx = 0.0
+        self.vy = 0.0
+        self.air_time = 0
+        self.jumps = 1
+        self.jump_buffer = 0
+        self.wall_slide = False
+        self.wall_coyote = 0
+        self.wall_flip = False
+        self.movement = 0
+        self.hit_left = self.hit_right = self.hit_up = self.hit_down = False
+
+    #standing (gravity only pulls a standing player back into the ground every few ticks, the same
+    #window the wall slide waits out)
+    @property
+    def on_ground(self):
+        return self.air_time <= AIRBORNE_TICKS
+
+    def step(self, is_solid, ts, bits):
+        if bits & ACTION_JUMP_PRESSED:
+            self.jump_buffer = JUMP_BUFFER_TICKS
+        if self.jump_buffer > 0:
+            self.jump_buffer = 0 if self.jump() else self.jump_buffer - 1
+        movement = (0, -1, 1, 0)[bits & (ACTION_LEFT | ACTION_RIGHT)]
+
+        self.hit_left = self.hit_right = self.hit_up = self.hit_down = False
+        dx = self.vx + movement
+        old = self.x
+        self.x += dx
+        if dx:
+            stop = sweep_box(is_solid, ts, 0, (self.x, self.y), self.size, old, dx)
+            if stop is not None:
+                self.x = stop
+                self.hit_right = dx > 0
+                self.hit_left = dx < 0
+        old = self.y
+        dy = self.vy
+        self.y += dy
+        if dy:
+            stop = sweep_box(is_solid, ts, 1, (self.x, self.y), self.size, old, dy)
+            if stop is not None:
+                self.y = stop
+                self.hit_down = dy > 0
+                self.hit_up = dy < 0
+        self.vy = min(self.vy + GRAVITY, MAX_FALL_SPEED)
+        self.movement = movement
+        if self.hit_up or self.hit_down:
+            self.vy = 0
+
+        self.air_time += 1
+        if self.hit_down:
+            self.air_time = 0
+            self.jumps = 1
+            self.wall_coyote = 0
+        if self.wall_coyote > 0:
+            self.wall_coyote -= 1
+        self.wall_slide = (self.hit_right or self.hit_left) and self.air_time > AIRBORNE_TICKS
+        if self.wall_slide:
+            self.vy = min(self.vy, WALL_SLIDE_SPEED)
+            self.wall_flip = not self.hit_right
+            self.wall_coyote = COYOTE_TICKS
+        self.vx -= min(max(self.vx, -FRICTION), FRICTION)
+
+    def jump(self):
+        wall = self.wall_slide or self.wall_coyote > 0
+        off_left = wall and self.wall_flip and self.movement < 0
+        off_right = wall and not self.wall_flip and self.movement > 0
+        if off_left or off_right:
+            self.vx = WALL_JUMP_SPEED[0] if off_left else -WALL_JUMP_SPEED[0]
+            self.vy = -WALL_JUMP_SPEED[1]
+            if self.jumps > 0:
+                self.jumps -= 1
+            self.wall_coyote = 0
+        elif self.jumps > 0 and not self.wall_slide:
+            self.vy = -JUMP_SPEED
+            self.jumps -= 1
+        else:
+            return False
+        self.air_time = AIRBORNE_TICKS + 1
+        return True
+
+
+#the moves tried from every node, as (kind, program). A program is a generator of action bits
+#given the body it's steering, so the wall jumps can wait for the slide
+def walk(d):
+    def program(body):
+        while True:
+            yield DIRECTION_BITS[d]
+    return program
+
+def fall(d, hold):
+    def program(body):
+        for tick in range(hold):
+            yield DIRECTION_BITS[d]
+        while True:
+            yield 0
+    return program
+
+def jump(d, delay, hold):
+    def program(body):
+        yield JUMP_BITS | (0 if delay else DIRECTION_BITS[d])
+        for tick in range(delay):
+            yield 0
+        tick = 0
+        while hold is None or tick < hold:
+            yield DIRECTION_BITS[d]
+            tick += 1
+        while True:
+            yield 0
+    return program
+
+def air_jump(d, wait):
+    def program(body):
+        while body.on_ground:
+            yield DIRECTION_BITS[d]
+        for tick in range(wait):
+            yield DIRECTION_BITS[d]
+        yield JUMP_BITS | DIRECTION_BITS[d]
+        while True:
+            yield DIRECTION_BITS[d]
+    return program
+
+#jumps at the wall on side d and jumps off whatever wall it's sliding on, count times. In between
+#it holds into the wall it jumped off (climbing one wall), or with zigzag towards the one it's
+#heading for (climbing a shaft), then last for the rest
+def wall_jump(d, count, last, zigzag=False):
+    def program(body):
+        yield JUMP_BITS | DIRECTION_BITS[d]
+        left = count
+        hold = d
+        while True:
+            if left and body.wall_slide:
+                left -= 1
+                wall = -1 if body.wall_flip else 1
+                hold = (-wall if zigzag else wall) if left else last
+                yield JUMP_BITS | DIRECTION_BITS[wall]
+            else:
+                yield DIRECTION_BITS[hold]
+    return program
+
+def moves():
+    found = []
+    for d in (-1, 1):
+        found.append((WALK, walk(d)))
+        for hold in HOLDS[:-1]:
+            found.append((FALL, fall(d, hold)))
+        for wait in AIR_JUMP_WAITS:
+            found.append((JUMP, air_jump(d, wait)))
+        for count in WALL_JUMPS:
+            for last in (d, -d, 0):
+                found.append((WALL_JUMP, wall_jump(d, count, last)))
+        for count in CLIMB_JUMPS:
+            for last in (-1, 0, 1):
+                found.append((WALL_JUMP, wall_jump(d, count, last, zigzag=True)))
+    for d in (-1, 0, 1):
+        for delay in DELAYS if d else (0,):
+            for hold in HOLDS if d else (0,):
+                found.append((JUMP, jump(d, delay, hold)))
+    return found
+
+
+#where the walkable spots are and every move between them that the movement rules allow. Nodes
+#are tiles a player can stand in (air with a solid tile under it), an edge is the action bits
+#that take a player standing in the middle of one node to another, cost is ticks (including the
+#walk to the middle of where it lands). Paths are A* over integer costs, cached per (from, to)
+class NavGraph:
+    def __init__(self, tile_size, crc, nodes, edges, actions):
+        self.tile_size = tile_size
+        self.crc = crc
+        self.nodes = [tuple(node) for node in nodes]
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.edges = edges
+        self.actions = bytes(actions)
+        self.out = [[] for node in self.nodes]
+        for e, (src, dst, cost) in enumerate(zip(edges['src'].tolist(), edges['dst'].tolist(), edges['cost'].tolist())):
+            self.out[src].append((e, dst, cost))
+        self.paths = {}
+
+    #where a player stands in the middle of a node
+    def start(self, node):
+        x, y = self.nodes[node]
+        ts = self.tile_size
+        return (x * ts + (ts - FIGHTER_SIZE[0]) / 2, (y + 1) * ts - FIGHTER_SIZE[1])
+
+    def edge_actions(self, e):
+        start = int(self.edges['start'][e])
+        return self.actions[start:start + int(self.edges['length'][e])]
+
+    #the node a player at x, y is standing in (the tile under the middle of them, or under the
+    #other foot when that one's over a drop), None if there isn't one
+    def node_at(self, x, y):
+        ts = self.tile_size
+        w, h = FIGHTER_SIZE
+        row = (int(y) + h) // ts - 1
+        left = int(x)
+        for column in ((left + w // 2) // ts, left // ts, (left + w - 1) // ts):
+            node = self.node_index.get((column, row))
+            if node is not None:
+                return node
+        return None
+
+    #the first node at or below a spot, for aiming at someone in the air
+    def node_below(self, x, y, depth=16):
+        ts = self.tile_size
+        column = (int(x) + FIGHTER_SIZE[0] // 2) // ts
+        row = (int(y) + FIGHTER_SIZE[1]) // ts - 1
+        for r in range(row, row + depth):
+            node = self.node_index.get((column, r))
+            if node is not None:
+                return node
+        return None
+
+    def nearest(self, x, y):
+        ts = self.tile_size
+        best = None
+        for i, (nx, ny) in enumerate(self.nodes):
+            distance = abs(nx * ts - x) + abs(ny * ts - y)
+            if best is None or distance < best[0]:
+                best = (distance, i)
+        return best[1] if best else None
+
+    def heuristic(self, a, b):
+        ax, ay = self.nodes[a]
+        bx, by = self.nodes[b]
+        return max(abs(ax - bx), abs(ay - by)) * self.tile_size // MAX_SPEED
+
+    #edge ids from src to dst in order, None if dst can't be reached. Costs are whole ticks so
+    #the heap compares ints, and the heuristic never overestimates so the first time dst comes
+    #off the heap is the cheapest way there
+    def path(self, src, dst):
+        key = (src, dst)
+        if key in self.paths:
+            return self.paths[key]
+        g = {src: 0}
+        came = {}
+        heap = [(self.heuristic(src, dst), 0, src)]
+        path = None
+        while heap:
+            f, cost, node = heapq.heappop(heap)
+            if node == dst:
+                path = []
+                while node != src:
+                    node, e = came[node]
+                    path.append(e)
+                path.reverse()
+                break
+            if cost > g[node]:
+                continue
+            for e, nxt, step in self.out[node]:
+                new = cost + step
+                if new < g.get(nxt, new + 1):
+                    g[nxt] = new
+                    came[nxt] = (node, e)
+                    heapq.heappush(heap, (new + self.heuristic(nxt, dst), new, nxt))
+        self.paths[key] = path
+        return path
+
+
+def grid_crc(tilemap):
+    grid, x0, y0 = tilemap.solid_grid()
+    return zlib.crc32(grid.tobytes(), zlib.crc32(struct.pack('<iiii', x0, y0, *grid.shape)))
+
+#runs a program (or plays back recorded actions) from where a player stands on node, returns
+#(landing node, actions, ticks) or None if it never lands on another node
+def run_move(graph, is_solid, node, program=None, actions=None, offset=0):
+    x, y = graph.start(node)
+    body = Body(x + offset, y)
+    start_column = graph.nodes[node][0]
+    ts = graph.tile_size
+    #played back, the last bits are held until it lands (a walk started behind the middle needs a
+    #tick or two more), the same as the bots do
+    bits_source = program(body) if program else itertools.chain(actions, itertools.repeat(actions[-1]))
+    recorded = bytearray()
+    airborne = False
+    for bits in bits_source:
+        if len(recorded) >= MAX_MOVE_TICKS:
+            return None
+        body.step(is_solid, ts, bits)
+        recorded.append(bits)
+        if not body.on_ground:
+            airborne = True
+            continue
+        if abs(body.vx) > FRICTION:
+            continue
+        landed = graph.node_at(body.x, body.y)
+        if landed is None:
+            continue
+        if airborne or graph.nodes[landed][0] != start_column:
+            if landed == node:
+                return None
+            return landed, recorded, len(recorded) + int(abs(body.x - graph.start(landed)[0]))
+    return None
+
+#every node of the tilemap and every move between them
+def build_graph(tilemap):
+    ts = tilemap.tile_size
+    grid, x0, y0 = tilemap.solid_grid()
+    height, width = grid.shape
+    nodes = []
+    for y in range(height - 1):
+        for x in range(width):
+            if not grid[y, x] and grid[y + 1, x]:
+                nodes.append((x + x0, y + y0))
+    graph = NavGraph(ts, grid_crc(tilemap), nodes, np.zeros(0, dtype=EDGE), b'')
+    is_solid = tilemap.is_solid
+
+    found = []
+    actions = bytearray()
+    programs = moves()
+    for node in range(len(nodes)):
+        best = {}
+        for kind, program in programs:
+            result = run_move(graph, is_solid, node, program)
+            if result is None:
+                continue
+            dst, recorded, cost = result
+            if dst in best and best[dst][0] <= cost:
+                continue
+            #played back blind from a little off the middle it has to end up in the same place
+            if any((run_move(graph, is_solid, node, actions=recorded, offset=offset) or (None,))[0] != dst for offset in (-START_SLACK, START_SLACK)):
+                continue
+            best[dst] = (cost, kind, bytes(recorded))
+        for dst, (cost, kind, recorded) in sorted(best.items()):
+            found.append((node, dst, min(cost, 0xffff), kind, len(recorded), len(actions)))
+            actions.extend(recorded)
+    return NavGraph(ts, graph.crc, nodes, np.array(found, dtype=EDGE), actions)
+
+
+def nav_path(map_id):
+    return MAP_PATH + str(map_id) + NAV_EXT
+
+def write_graph(path, graph):
+    nodes = np.array(graph.nodes, dtype=NODE)
+    data = HEADER.pack(NAV_MAGIC, NAV_VERSION, graph.crc, nodes.size, graph.edges.size, len(graph.actions)) + nodes.tobytes() + graph.edges.tobytes() + graph.actions
+    #written next to it and swapped in, so a batch run's workers never read half a file
+    temp = f"{path}.{os.getpid()}.tmp"
+    f = open(temp, 'wb')
+    f.write(data)
+    f.close()
+    os.replace(temp, path)
+
+#the graph in path, None if it's missing, from an older version or for a different grid
+def read_graph(path, tile_size, crc):
+    if not os.path.exists(path):
+        return None
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+    if len(data) < HEADER.size:
+        return None
+    magic, version, file_crc, node_count, edge_count, actions_size = HEADER.unpack_from(data, 0)
+    if magic != NAV_MAGIC or version != NAV_VERSION or file_crc != crc:
+        return None
+    offset = HEADER.size
+    nodes = np.frombuffer(data, dtype=NODE, count=node_count, offset=offset)
+    offset += nodes.nbytes
+    edges = np.frombuffer(data, dtype=EDGE, count=edge_count, offset=offset)
+    offset += edges.nbytes
+    return NavGraph(tile_size, crc, nodes.tolist(), edges, data[offset:offset + actions_size])
+
+
+#graphs already loaded in this process, by (map id, grid crc)
+graphs = {}
+
+#the nav graph for a level's tilemap: from memory, from the cache file next to the map, or built
+#(a second or so) and written there
+def load_graph(map_id, tilemap):
+    crc = grid_crc(tilemap)
+    key = (map_id, crc)
+    if key not in graphs:
+        path = nav_path(map_id)
+        graph = read_graph(path, tilemap.tile_size, crc)
+        if graph is None:
+            graph = build_graph(tilemap)
+            write_graph(path, graph)
+        graphs[key] = graph
+    return graphs[key]
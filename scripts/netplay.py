@@ -0,0 +1,319 @@
+import time
+import heapq
+import random
+import socket
+import struct
+
+from scripts.entities import ACTION_LEFT, ACTION_RIGHT, BUTTON_ACTIONS
+
+#packet layout (little endian), every packet is the same kind:
+#   header   magic, sender's frame, ack (first frame of the receiver's inputs the sender is still
+#            missing), frame advantage, hash frame, state hash at it, first frame of the inputs,
+#            count of inputs
+#   inputs   one byte of action bits per frame, the sender's unacked inputs from first frame on
+PACKET_MAGIC = b'SNP1'
+HEADER = struct.Struct('<4sIIhIIIB')
+#inputs a packet carries at most, the rest go in the next ones
+MAX_PACKET_INPUTS = 255
+
+#ticks the local input waits before it's used. The other side gets that long for it to arrive
+#before anything has to be predicted
+INPUT_DELAY = 2
+#how far back a late input can rewind the match. A peer that's this far ahead of the other's
+#inputs waits for them instead of predicting further
+MAX_ROLLBACK = 8
+#state hashes are compared this often (ticks) to catch the two sides drifting apart
+HASH_INTERVAL = 60
+#frame advantage is evened out this often (ticks), by the side that's ahead sitting a tick out
+SYNC_INTERVAL = 60
+#a remote input is predicted to be the last one held, without the went-down bits (those are one
+#tick events, repeating them would jump or swing every tick)
+HELD_ACTIONS = ACTION_LEFT | ACTION_RIGHT | BUTTON_ACTIONS
+
+
+#a UDP socket to one peer. Non blocking, receive() returns whatever has arrived
+class UdpTransport:
+    def __init__(self, port, peer, host=''):
+        self.peer = peer
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.peer)
+        except OSError:
+            #nobody listening yet (some platforms report it on the next send), the next packet retries
+            pass
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            if addr[0] == self.peer[0] or self.peer[0] in ('', '0.0.0.0'):
+                packets.append(data)
+
+    def close(self):
+        self.sock.close()
+
+
+#two ends of an in-process link, what one sends the other receives straight away. For testing
+#on one machine without sockets, usually wrapped in a LossyTransport
+class MemoryTransport:
+    def __init__(self):
+        self.inbox = []
+        self.peer = None
+
+    @staticmethod
+    def pair():
+        a, b = MemoryTransport(), MemoryTransport()
+        a.peer, b.peer = b, a
+        return a, b
+
+    def send(self, data):
+        self.peer.inbox.append(bytes(data))
+
+    def receive(self):
+        packets = self.inbox
+        self.inbox = []
+        return packets
+
+    def close(self):
+        pass
+
+
+#makes any transport a bad connection: every packet sent waits latency ms plus up to jitter ms
+#more (so they can overtake each other) and loss of them (0 to 1) never go out at all. clock is
+#seconds, the loopback harness passes a simulated one to run faster than real time
+class LossyTransport:
+    def __init__(self, transport, latency=0, jitter=0, loss=0, seed=0, clock=time.perf_counter):
+        self.transport = transport
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.clock = clock
+        #(due time, order sent, data)
+        self.queue = []
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        due = self.clock() + self.latency + self.rng.random() * self.jitter
+        heapq.heappush(self.queue, (due, self.sent, bytes(data)))
+        self.flush()
+
+    def flush(self):
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            self.transport.send(heapq.heappop(self.queue)[2])
+
+    def receive(self):
+        self.flush()
+        return self.transport.receive()
+
+    def close(self):
+        self.transport.close()
+
+
+#peer to peer rollback netplay for a two player match, one player on each machine. Both sides
+#run the same Simulation from the same seed. Every tick the local input goes out (INPUT_DELAY
+#ticks ahead of when it's used) and the match steps on straight away, with the other side's
+#input predicted where it hasn't arrived yet. When it does and it isn't what was predicted, the
+#match is put back to the snapshot from that tick and played forward again with the real input,
+#all inside the one tick. Snapshots are Simulation.save_state(), one per tick for the last
+#MAX_ROLLBACK ticks. Sounds and map change callbacks are held back while replaying ticks that
+#already happened, and the match stats are part of the snapshot so nothing counts twice
+class RollbackSession:
+    def __init__(self, sim, local_player, transport, input_delay=INPUT_DELAY, max_rollback=MAX_ROLLBACK):
+        if len(sim.fighters) != 2:
+            raise ValueError(f"netplay is one player a side, not {len(sim.fighters)} players")
+        self.sim = sim
+        self.local_player = local_player
+        self.transport = transport
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        #next tick to simulate
+        self.frame = 0
+        #every local input by the tick it's used on, the first input_delay are nothing
+        self.local_inputs = bytearray(input_delay)
+        #every remote input received, in order. Anything past the end is predicted
+        self.remote_inputs = bytearray()
+        #what was predicted for the ticks simulated past the end of remote_inputs
+        self.predicted = {}
+        #earliest tick a received input didn't match the prediction for, None if all did
+        self.rollback_frame = None
+        #snapshot of the state at the start of each of the last few ticks, by tick % len
+        self.snapshots = [None] * (max_rollback + 2)
+        #first of our inputs the other side hasn't got, and how many ticks it's simulated
+        self.remote_ack = 0
+        self.remote_frame = 0
+        self.remote_advantage = 0
+        #went-down bits from ticks spent waiting, so a press isn't lost
+        self.held_back = 0
+        #state hash at every HASH_INTERVAL tick, ours and the other side's settled ones not yet compared
+        self.hashes = {}
+        self.remote_hashes = {}
+        self.desync = None
+        self.hash_checks = 0
+        self.checked_tick = -1
+        self.stats = {'ticks': 0, 'stalls': 0, 'rollbacks': 0, 'rollback_frames': 0, 'max_rollback': 0, 'rollback_time': 0.0, 'max_rollback_time': 0.0}
+
+    #the tick after the last one with both sides' inputs
+    @property
+    def confirmed_frame(self):
+        return min(len(self.remote_inputs), len(self.local_inputs))
+
+    #how many ticks ahead of the other side this one is, as far as it can tell
+    @property
+    def advantage(self):
+        return self.frame - self.remote_frame
+
+    #one tick of play with this tick's local action bits. Returns False if it had to wait for the
+    #other side instead (too far ahead of its inputs, or evening out the frame advantage)
+    def advance(self, local_actions):
+        self.poll()
+        if self.should_wait():
+            self.stats['stalls'] += 1
+            self.held_back |= local_actions & ~HELD_ACTIONS
+            self.send()
+            return False
+        self.local_inputs.append(local_actions | self.held_back)
+        self.held_back = 0
+        self.send()
+        self.rollback()
+        self.save(self.frame)
+        self.step(self.frame)
+        self.frame += 1
+        self.stats['ticks'] += 1
+        return True
+
+    def should_wait(self):
+        if self.frame - len(self.remote_inputs) >= self.max_rollback:
+            return True
+        #both sides measure how far ahead they are, the one ahead by more waits a tick now and then
+        return self.frame > 0 and self.frame % SYNC_INTERVAL == 0 and self.advantage - self.remote_advantage >= 2
+
+    #everything that's arrived: the other side's inputs, how far it's got and its state hashes
+    def poll(self):
+        for data in self.transport.receive():
+            if len(data) < HEADER.size:
+                continue
+            magic, frame, ack, advantage, hash_frame, state_hash, first, count = HEADER.unpack_from(data)
+            if magic != PACKET_MAGIC or len(data) < HEADER.size + count:
+                continue
+            if frame >= self.remote_frame:
+                self.remote_frame = frame
+                self.remote_advantage = advantage
+            self.remote_ack = max(self.remote_ack, ack)
+            if (state_hash or hash_frame) and hash_frame > self.checked_tick:
+                self.remote_hashes[hash_frame] = state_hash
+            #inputs always start at or before what we're missing (they're resent until acked),
+            #anything from a packet that overtook the one before it is picked up next time
+            received = len(self.remote_inputs)
+            if first > received:
+                continue
+            inputs = data[HEADER.size + received - first:HEADER.size + count]
+            for tick, actions in enumerate(inputs, received):
+                predicted = self.predicted.pop(tick, None)
+                if predicted is not None and predicted != actions and (self.rollback_frame is None or tick < self.rollback_frame):
+                    self.rollback_frame = tick
+            self.remote_inputs.extend(inputs)
+        self.check_hashes()
+
+    #our unacked inputs, how far we've got and our latest settled state hash
+    def send(self):
+        first = self.remote_ack
+        inputs = self.local_inputs[first:first + MAX_PACKET_INPUTS]
+        hash_frame, state_hash = self.settled_hash()
+        header = HEADER.pack(PACKET_MAGIC, self.frame, len(self.remote_inputs), max(-32768, min(self.advantage, 32767)),
+                             hash_frame, state_hash, first, len(inputs))
+        self.transport.send(header + bytes(inputs))
+
+    def remote_actions(self, tick):
+        if tick < len(self.remote_inputs):
+            return self.remote_inputs[tick]
+        actions = self.remote_inputs[-1] & HELD_ACTIONS if self.remote_inputs else 0
+        self.predicted[tick] = actions
+        return actions
+
+    def step(self, tick):
+        actions = [0, 0]
+        actions[self.local_player] = self.local_inputs[tick]
+        actions[1 - self.local_player] = self.remote_actions(tick)
+        self.sim.step(actions)
+
+    def save(self, tick):
+        self.snapshots[tick % len(self.snapshots)] = self.sim.save_state()
+        if tick % HASH_INTERVAL == 0:
+            self.hashes[tick] = self.sim.state_hash()
+            #a settled hash is only ever asked for about the last few
+            self.hashes.pop(tick - HASH_INTERVAL * 4, None)
+
+    #back to the first mispredicted tick and forward again to where we were
+    def rollback(self):
+        start = self.rollback_frame
+        if start is None:
+            return
+        self.rollback_frame = None
+        began = time.perf_counter()
+        sim = self.sim
+        tilemap = sim.tilemap
+        sounds = set(sim.sounds.requests)
+        on_load_level = sim.on_load_level
+        sim.on_load_level = None
+
+        sim.load_state(self.snapshots[start % len(self.snapshots)])
+        for tick in range(start, self.frame):
+            if tick != start:
+                self.save(tick)
+            self.step(tick)
+
+        #the sounds of ticks that already played were heard the first time round
+        sim.sounds.requests = sounds
+        sim.on_load_level = on_load_level
+        if sim.tilemap is not tilemap and on_load_level:
+            on_load_level(sim.level)
+        frames = self.frame - start
+        elapsed = time.perf_counter() - began
+        stats = self.stats
+        stats['rollbacks'] += 1
+        stats['rollback_frames'] += frames
+        stats['max_rollback'] = max(stats['max_rollback'], frames)
+        stats['rollback_time'] += elapsed
+        stats['max_rollback_time'] = max(stats['max_rollback_time'], elapsed)
+
+    #the latest hash from a tick both sides' inputs before it are in for, (0, 0) if none yet
+    def settled_hash(self):
+        settled = self.confirmed_frame
+        if self.rollback_frame is not None:
+            settled = min(settled, self.rollback_frame)
+        ticks = [tick for tick in self.hashes if tick <= settled]
+        if not ticks:
+            return 0, 0
+        tick = max(ticks)
+        return tick, self.hashes[tick]
+
+    #compares the other side's hashes with ours once ours from the same tick have settled too.
+    #desync is the first tick they didn't match at
+    def check_hashes(self):
+        settled = self.settled_hash()[0]
+        for tick in list(self.remote_hashes):
+            if tick > settled:
+                continue
+            state_hash = self.remote_hashes.pop(tick)
+            if tick in self.hashes and tick > self.checked_tick:
+                self.checked_tick = tick
+                self.hash_checks += 1
+                if self.hashes[tick] != state_hash and self.desync is None:
+                    self.desync = tick
+
+    def close(self):
+        self.transport.close()
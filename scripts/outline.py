@@ -0,0 +1,57 @@
+import pygame
+
+OUTLINE_COLOR = (0, 0, 0, 180)
+OUTLINE_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+#the dark outline of a mask, as a surface one pixel bigger on every side (draw it one pixel up
+#and left of where the mask sits). rle=True for outlines that get drawn over and over, the
+#mostly empty surface then blits in a fraction of the time
+def bake_outline(mask, rle=False):
+    silhouette = mask.to_surface(setcolor=OUTLINE_COLOR, unsetcolor=(0, 0, 0, 0))
+    width, height = mask.get_size()
+    outline = pygame.Surface((width + 2, height + 2), pygame.SRCALPHA)
+    for offset in OUTLINE_OFFSETS:
+        outline.blit(silhouette, (offset[0] + 1, offset[1] + 1))
+    if rle:
+        outline.set_alpha(255, pygame.RLEACCEL)
+    return outline
+
+#draws the outline around everything on the display layer without masking the whole frame.
+#The tilemap's outlines are baked per chunk and just get blitted. Moving things go into a
+#separate mask: particles and bullets draw their image masks straight into it, players and
+#sparks get masked from the display only inside the rects they were drawn in. Tiles are taken
+#back out of that mask, so every pixel is outlined exactly once like with the old full frame mask
+class OutlineRenderer:
+    def __init__(self, size):
+        self.static_mask = pygame.mask.Mask(size)
+        self.dynamic_mask = pygame.mask.Mask(size)
+
+    #call before drawing a frame, forgets last frame's moving things
+    def begin(self):
+        self.dynamic_mask.clear()
+
+    def render(self, surf, display, tilemap, offset, dirty_rects):
+        self.static_mask.clear()
+        for pos, outline, mask in tilemap.chunk_outlines(display.get_size(), offset):
+            surf.blit(outline, (pos[0] - 1, pos[1] - 1))
+            self.static_mask.draw(mask, pos)
+
+        dynamic = self.dynamic_mask
+        bounds = display.get_rect()
+        for rect in dirty_rects:
+            rect = rect.clip(bounds)
+            if rect.width and rect.height:
+                dynamic.draw(pygame.mask.from_surface(display.subsurface(rect)), rect.topleft)
+        dynamic.erase(self.static_mask, (0, 0))
+
+        #one silhouette per blob of moving pixels. Each blob is cut out of the mask as it's
+        #drawn so overlapping bounding rects can't outline anything twice
+        for rect in dynamic.get_bounding_rects():
+            part = pygame.mask.Mask(rect.size)
+            part.draw(dynamic, (-rect.x, -rect.y))
+            if not part.count():
+                continue
+            dynamic.erase(part, rect.topleft)
+            silhouette = part.to_surface(setcolor=OUTLINE_COLOR, unsetcolor=(0, 0, 0, 0))
+            for outline_offset in OUTLINE_OFFSETS:
+                surf.blit(silhouette, (rect.x + outline_offset[0], rect.y + outline_offset[1]))
@@ -0,0 +1,90 @@
+import math
+
+import pygame
+
+#the circle wipe between maps runs over this many frames each way
+WIPE_FRAMES = 30
+
+
+#gets the finished low res frame onto the window. Everything it needs is made up front: the
+#scaled frame goes straight into the window (or a kept surface when it has to be offset for
+#screenshake), and the circle wipe for every transition step is drawn once instead of per frame.
+#source is a surface in the pixel format the frames come in, a plain one of internal_size if not given
+class Presenter:
+    def __init__(self, screen, internal_size, integer_scale=False, source=None):
+        self.screen = screen
+        self.internal_size = tuple(internal_size)
+        self.integer_scale = integer_scale
+        self.source = source if source else pygame.Surface(self.internal_size)
+        self.wipes = self.build_wipes()
+        self.resize()
+
+    #works out where the frame goes in the window. Stretched to fill it like before, or with
+    #integer_scale the biggest whole number multiple that fits, centered with black bars around it
+    def resize(self):
+        window = self.screen.get_rect()
+        if self.integer_scale:
+            scale = max(1, min(window.width // self.internal_size[0], window.height // self.internal_size[1]))
+            self.rect = pygame.Rect(0, 0, self.internal_size[0] * scale, self.internal_size[1] * scale)
+            self.rect.center = window.center
+        else:
+            self.rect = window.copy()
+        self.rect = self.rect.clip(window)
+        self.target = self.screen.subsurface(self.rect)
+        #scale only writes into a surface of the frame's pixel format. When the window's isn't, the
+        #frame is scaled into this kept surface instead and that gets blitted (converting) every frame
+        self.frame = pygame.Surface(self.rect.size, 0, self.source)
+        self.direct = same_format(self.frame, self.target)
+        self.bars = [bar for bar in self.bar_rects(window) if bar.width and bar.height]
+        self.shaken = False
+        self.screen.fill((0, 0, 0))
+
+    def bar_rects(self, window):
+        return [
+            pygame.Rect(0, 0, window.width, self.rect.top),
+            pygame.Rect(0, self.rect.bottom, window.width, window.height - self.rect.bottom),
+            pygame.Rect(0, self.rect.top, self.rect.left, self.rect.height),
+            pygame.Rect(self.rect.right, self.rect.top, window.width - self.rect.right, self.rect.height),
+        ]
+
+    #the frame drawn over everything for each transition step. Black with a see through circle
+    #that's (WIPE_FRAMES - step) * step_size big, same as the old per frame circle. The step size
+    #grows with the resolution so the last step still uncovers the corners
+    def build_wipes(self):
+        width, height = self.internal_size
+        center = (width // 2, height // 2)
+        step_size = max(8, math.ceil(math.hypot(width, height) / 2 / (WIPE_FRAMES - 1)))
+        wipes = [None]
+        for step in range(1, WIPE_FRAMES + 1):
+            wipe = pygame.Surface(self.internal_size)
+            pygame.draw.circle(wipe, (255, 255, 255), center, (WIPE_FRAMES - step) * step_size)
+            wipe.set_colorkey((255, 255, 255), pygame.RLEACCEL)
+            wipes.append(wipe)
+        return wipes
+
+    #the wipe for the simulation's transition counter (-30 to 30, 0 when there's no transition)
+    def wipe(self, transition):
+        return self.wipes[min(abs(transition), WIPE_FRAMES)]
+
+    #scales the frame into the window. With no shake the scale writes straight into the window,
+    #otherwise into the kept frame surface which then gets blitted shaken
+    def present(self, surf, shake=(0, 0)):
+        if shake[0] or shake[1]:
+            pygame.transform.scale(surf, self.rect.size, self.frame)
+            self.screen.blit(self.frame, (self.rect.x + shake[0], self.rect.y + shake[1]))
+            self.shaken = True
+            return
+        if self.shaken:
+            for bar in self.bars:
+                self.screen.fill((0, 0, 0), bar)
+            self.shaken = False
+        if self.direct:
+            pygame.transform.scale(surf, self.rect.size, self.target)
+        else:
+            pygame.transform.scale(surf, self.rect.size, self.frame)
+            self.screen.blit(self.frame, self.rect)
+
+
+#true if transform.scale can write from one surface straight into the other
+def same_format(a, b):
+    return a.get_bitsize() == b.get_bitsize() and a.get_masks() == b.get_masks()
@@ -0,0 +1,253 @@
+import os
+import csv
+import json
+import time
+
+import numpy as np
+import pygame
+
+PROFILE_PATH = 'data/profiles/'
+#timed scopes kept (a frame has about ten of them) and frames kept for the overlay and exports
+SCOPE_CAPACITY = 8192
+FRAME_CAPACITY = 600
+#what the overlay and exports count each frame, filled in by whoever calls end_frame
+COUNTERS = ['players', 'projectiles', 'particles', 'sparks']
+
+
+#does nothing, handed out by a disabled profiler so a scope costs one method call and an
+#empty with block
+class NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = NullScope()
+
+
+#one named timer. There's a single Scope per name that gets reused, so timing something doesn't
+#allocate. That means the same name can't be nested inside itself
+class Scope:
+    __slots__ = ('profiler', 'index', 'start')
+
+    def __init__(self, profiler, index):
+        self.profiler = profiler
+        self.index = index
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler.record(self.index, self.start, end - self.start)
+        return False
+
+
+#named timing scopes written into fixed size ring buffers, plus one record per frame with its
+#length and the entity counts. Only the main thread should time things, nothing here is locked.
+#    with profiler.scope('tilemap.render'):
+#        ...
+class Profiler:
+    def __init__(self, enabled=False, scope_capacity=SCOPE_CAPACITY, frame_capacity=FRAME_CAPACITY):
+        self.enabled = enabled
+        self.names = []
+        self.scopes = {}
+
+        self.scope_capacity = scope_capacity
+        self.scope_ids = np.zeros(scope_capacity, dtype=np.int16)
+        self.scope_frames = np.zeros(scope_capacity, dtype=np.int64)
+        self.scope_starts = np.zeros(scope_capacity, dtype=np.int64)
+        self.scope_durations = np.zeros(scope_capacity, dtype=np.int64)
+        self.scope_total = 0
+
+        self.frame_capacity = frame_capacity
+        self.frame_starts = np.zeros(frame_capacity, dtype=np.int64)
+        self.frame_durations = np.zeros(frame_capacity, dtype=np.int64)
+        self.frame_counts = np.zeros((frame_capacity, len(COUNTERS)), dtype=np.int32)
+        self.frame_total = 0
+        self.frame_start = None
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = Scope(self, len(self.names))
+            self.names.append(name)
+            self.scopes[name] = scope
+        return scope
+
+    def record(self, index, start, duration):
+        i = self.scope_total % self.scope_capacity
+        self.scope_ids[i] = index
+        self.scope_frames[i] = self.frame_total
+        self.scope_starts[i] = start
+        self.scope_durations[i] = duration
+        self.scope_total += 1
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter_ns()
+
+    #counts is a list in COUNTERS order. A frame that started before profiling was switched on is skipped
+    def end_frame(self, counts):
+        if not self.enabled or self.frame_start is None:
+            return
+        i = self.frame_total % self.frame_capacity
+        self.frame_starts[i] = self.frame_start
+        self.frame_durations[i] = time.perf_counter_ns() - self.frame_start
+        self.frame_counts[i] = counts
+        self.frame_total += 1
+        self.frame_start = None
+
+    def clear(self):
+        self.scope_total = 0
+        self.frame_total = 0
+        self.frame_start = None
+
+    #indices into a ring buffer from the oldest entry to the newest
+    def ring_order(self, total, capacity):
+        if total <= capacity:
+            return np.arange(total)
+        return (np.arange(capacity) + total) % capacity
+
+    def scope_samples(self):
+        order = self.ring_order(self.scope_total, self.scope_capacity)
+        return self.scope_ids[order], self.scope_frames[order], self.scope_starts[order], self.scope_durations[order]
+
+    def frame_samples(self):
+        order = self.ring_order(self.frame_total, self.frame_capacity)
+        first = self.frame_total - order.size
+        return np.arange(first, self.frame_total), self.frame_starts[order], self.frame_durations[order], self.frame_counts[order]
+
+    #mean and max ms per frame of every scope over the last `frames` frames, in first use order
+    def stats(self, frames=60):
+        ids, frame_ids, starts, durations = self.scope_samples()
+        recent = frame_ids >= self.frame_total - frames
+        ids = ids[recent]
+        frame_ids = frame_ids[recent]
+        durations = durations[recent]
+        stats = []
+        for index, name in enumerate(self.names):
+            picked = ids == index
+            if not picked.any():
+                continue
+            per_frame = np.bincount(frame_ids[picked] - frame_ids[picked].min(), weights=durations[picked])
+            per_frame = per_frame[per_frame > 0]
+            stats.append((name, per_frame.mean() / 1e6, per_frame.max() / 1e6))
+        return stats
+
+    #one row per timed scope and one per frame (scope 'frame', with the counts filled in)
+    def export_csv(self, path):
+        f = open(path, 'w', newline='')
+        writer = csv.writer(f)
+        writer.writerow(['frame', 'scope', 'start_ms', 'duration_ms'] + COUNTERS)
+        origin = self.origin()
+        for frame, start, duration, counts in zip(*[array.tolist() for array in self.frame_samples()]):
+            writer.writerow([frame, 'frame', (start - origin) / 1e6, duration / 1e6] + counts)
+        ids, frame_ids, starts, durations = self.scope_samples()
+        for index, frame, start, duration in zip(ids.tolist(), frame_ids.tolist(), starts.tolist(), durations.tolist()):
+            writer.writerow([frame, self.names[index], (start - origin) / 1e6, duration / 1e6] + [''] * len(COUNTERS))
+        f.close()
+
+    #chrome://tracing / Perfetto trace event json. Frames and scopes are complete ('X') events on
+    #one thread, so scopes nest under their frame, and the counts are counter ('C') events
+    def export_trace(self, path):
+        origin = self.origin()
+        events = []
+        for frame, start, duration, counts in zip(*[array.tolist() for array in self.frame_samples()]):
+            ts = (start - origin) / 1000
+            events.append({'name': 'frame', 'cat': 'frame', 'ph': 'X', 'ts': ts, 'dur': duration / 1000, 'pid': 0, 'tid': 0, 'args': {'frame': frame}})
+            events.append({'name': 'counts', 'ph': 'C', 'ts': ts, 'pid': 0, 'tid': 0, 'args': dict(zip(COUNTERS, counts))})
+        ids, frame_ids, starts, durations = self.scope_samples()
+        for index, start, duration in zip(ids.tolist(), starts.tolist(), durations.tolist()):
+            events.append({'name': self.names[index], 'cat': 'scope', 'ph': 'X', 'ts': (start - origin) / 1000, 'dur': duration / 1000, 'pid': 0, 'tid': 0})
+        f = open(path, 'w')
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        f.close()
+
+    #earliest timestamp still in the buffers, exports are relative to it
+    def origin(self):
+        starts = [self.scope_samples()[2], self.frame_samples()[1]]
+        starts = [array.min() for array in starts if array.size]
+        return int(min(starts)) if starts else 0
+
+    #writes everything in the buffers as <folder>/capture-<time>.csv and .json, returns both paths
+    def capture(self, folder=PROFILE_PATH):
+        os.makedirs(folder, exist_ok=True)
+        name = os.path.join(folder, 'capture-' + time.strftime('%Y%m%d-%H%M%S'))
+        self.export_csv(name + '.csv')
+        self.export_trace(name + '.json')
+        return name + '.csv', name + '.json'
+
+
+#the profiler drawn over the window: a graph of recent frame times with the 60fps budget marked,
+#per scope mean/max and the counts from the last frame. The text only gets rebuilt a few times
+#a second so it stays readable and cheap
+class ProfilerOverlay:
+    def __init__(self, profiler, graph_size=(240, 60), refresh=15):
+        self.profiler = profiler
+        self.graph_size = graph_size
+        self.refresh = refresh
+        self.visible = False
+        self.font = None
+        self.text = None
+        self.frames_since_text = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.text = None
+
+    def render(self, surf, pos):
+        if not self.visible:
+            return
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.SysFont('consolas,dejavusansmono,couriernew,monospace', 16)
+        self.frames_since_text += 1
+        if self.text is None or self.frames_since_text >= self.refresh:
+            self.text = self.build_text()
+            self.frames_since_text = 0
+
+        surf.blit(self.text, pos)
+        self.render_graph(surf, (pos[0], pos[1] + self.text.get_height() + 4))
+
+    def build_text(self):
+        frames, starts, durations, counts = self.profiler.frame_samples()
+        lines = []
+        if durations.size:
+            recent = durations[-60:] / 1e6
+            lines.append(f"frame {recent.mean():6.2f} ms avg {recent.max():6.2f} ms max")
+            lines.append('  '.join(f"{name} {count}" for name, count in zip(COUNTERS, counts[-1].tolist())))
+        for name, mean, peak in self.profiler.stats():
+            lines.append(f"{name:<18} {mean:6.3f} {peak:6.3f}")
+        if not lines:
+            lines.append('profiler: no frames yet')
+
+        rendered = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(line.get_width() for line in rendered) + 8
+        text = pygame.Surface((max(width, self.graph_size[0]), sum(line.get_height() for line in rendered) + 8), pygame.SRCALPHA)
+        text.fill((0, 0, 0, 160))
+        y = 4
+        for line in rendered:
+            text.blit(line, (4, y))
+            y += line.get_height()
+        return text
+
+    #one column per frame, newest on the right. The full height is two frame budgets (33 ms)
+    def render_graph(self, surf, pos):
+        width, height = self.graph_size
+        pygame.draw.rect(surf, (0, 0, 0), (pos[0], pos[1], width, height))
+        durations = self.profiler.frame_samples()[2][-width:] / 1e6
+        scale = height / (2000 / 60)
+        x = pos[0] + width - durations.size
+        for duration in durations.tolist():
+            bar = min(height, max(1, int(duration * scale)))
+            color = (80, 220, 80) if duration <= 1000 / 60 else (230, 70, 50)
+            pygame.draw.line(surf, color, (x, pos[1] + height - 1), (x, pos[1] + height - bar))
+            x += 1
+        budget_y = pos[1] + height - int(1000 / 60 * scale)
+        pygame.draw.line(surf, (255, 255, 255), (pos[0], budget_y), (pos[0] + width - 1, budget_y))
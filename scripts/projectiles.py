@@ -0,0 +1,148 @@
+import numpy as np
+import pygame
+
+PROJECTILE_CAPACITY = 256
+#disposing of bullets after 6 seconds
+PROJECTILE_LIFETIME = 360
+
+#every bullet in flight, stored as arrays. Movement, wall hits, player hits and expiry are
+#each done for all bullets at once instead of looping over [[x, y], speed, age] lists
+class ProjectileManager:
+    def __init__(self, game, capacity=PROJECTILE_CAPACITY):
+        self.game = game
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.speed = np.zeros(capacity)
+        self.age = np.zeros(capacity, dtype=np.int32)
+        #index of the player who fired it, -1 for nobody
+        self.owner = np.zeros(capacity, dtype=np.int32)
+        #the bullet image's mask, built the first time render gets that image
+        self.mask_img = None
+        self.img_mask = None
+
+    def spawn(self, x, y, speed, owner=-1):
+        if self.count < self.capacity:
+            i = self.count
+            self.pos[i] = (x, y)
+            self.speed[i] = speed
+            self.age[i] = 0
+            self.owner[i] = owner
+            self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    #the live bullets, for saving and restoring the match (see scripts/netplay.py)
+    def save_state(self):
+        n = self.count
+        return (n, self.pos[:n].copy(), self.speed[:n].copy(), self.age[:n].copy(), self.owner[:n].copy())
+
+    def load_state(self, state):
+        n, pos, speed, age, owner = state
+        self.count = n
+        self.pos[:n] = pos
+        self.speed[:n] = speed
+        self.age[:n] = age
+        self.owner[:n] = owner
+
+    def __len__(self):
+        return self.count
+
+    #one tick for every bullet: player hits, then movement against the walls, then expiry
+    def update(self, tilemap, fighters):
+        if not self.count:
+            return
+        self.player_collisions(fighters)
+        if not self.count:
+            return
+
+        n = self.count
+        old_x = self.pos[:n, 0].copy()
+        self.pos[:n, 0] += self.speed[:n]
+        self.age[:n] += 1
+
+        hit, hit_x = self.sweep(tilemap, old_x, self.pos[:n, 0], self.pos[:n, 1])
+        for i in np.flatnonzero(hit).tolist():
+            self.game.effects.create_collision_spark((hit_x[i], self.pos[i, 1]), self.speed[i])
+
+        self.remove(hit | (self.age[:n] > PROJECTILE_LIFETIME))
+
+    #ray vs grid: walks every tile column a bullet crossed this tick (not just the one it ended
+    #up in) so fast shots can't skip thin walls. All bullets step through their columns together.
+    #Returns which bullets hit a wall and the x of the wall face they hit
+    def sweep(self, tilemap, old_x, new_x, y):
+        ts = tilemap.tile_size
+        grid, grid_x, grid_y = tilemap.solid_grid()
+        rows = np.floor(y / ts).astype(np.int64) - grid_y
+        start = np.floor(old_x / ts).astype(np.int64)
+        end = np.floor(new_x / ts).astype(np.int64)
+        step = np.where(end >= start, 1, -1)
+        steps = np.abs(end - start)
+
+        hit = np.zeros(old_x.size, dtype=bool)
+        hit_col = np.zeros(old_x.size, dtype=np.int64)
+        row_ok = (rows >= 0) & (rows < grid.shape[0])
+        for k in range(int(steps.max()) + 1):
+            cols = start + step * k
+            check = ~hit & (k <= steps) & row_ok & (cols - grid_x >= 0) & (cols - grid_x < grid.shape[1])
+            if not check.any():
+                continue
+            solid = np.zeros(old_x.size, dtype=bool)
+            solid[check] = grid[rows[check], cols[check] - grid_x]
+            hit_col[solid] = cols[solid]
+            hit |= solid
+
+        #face of the tile the bullet ran into, clamped to where it actually travelled
+        face = np.where(step > 0, hit_col * ts, (hit_col + 1) * ts)
+        hit_x = np.clip(face, np.minimum(old_x, new_x), np.maximum(old_x, new_x))
+        return hit, hit_x
+
+    #looks up every bullet in the players' spatial hash, only the players in its cell get tested.
+    #A bullet only hurts the first (non dashing) player it's inside of, and hits are handed out
+    #player by player, same as when each weapon removed the bullets it got hit by
+    def player_collisions(self, fighters):
+        n = self.count
+        containing = fighters.broadphase.containing
+        dashing = fighters.is_dashing().tolist()
+        hits = {}
+        taken = []
+        for bullet, (x, y) in enumerate(self.pos[:n].tolist()):
+            for i in containing(x, y):
+                if not dashing[i]:
+                    hits.setdefault(i, []).append(bullet)
+                    taken.append(bullet)
+                    break
+        if taken:
+            owners = self.owner[:n].tolist()
+            for i in sorted(hits):
+                for bullet in hits[i]:
+                    fighters.hurt(i, 'gun', owners[bullet])
+            removed = np.zeros(n, dtype=bool)
+            removed[taken] = True
+            self.remove(removed)
+
+    #drops every flagged bullet in one compaction
+    def remove(self, dead):
+        if not dead.any():
+            return
+        alive = np.flatnonzero(~dead)
+        self.pos[:alive.size] = self.pos[alive]
+        self.speed[:alive.size] = self.speed[alive]
+        self.age[:alive.size] = self.age[alive]
+        self.owner[:alive.size] = self.owner[alive]
+        self.count = alive.size
+
+    #mask gets every bullet's image mask drawn into it too, at the same spot the blit put it
+    def render(self, surf, img, offset=(0, 0), mask=None):
+        if not self.count:
+            return
+        draw_pos = self.pos[:self.count] - offset - (img.get_width() / 2, img.get_height() / 2)
+        surf.blits([(img, pos) for pos in draw_pos.tolist()], doreturn=False)
+        if mask is not None:
+            if img is not self.mask_img:
+                self.mask_img = img
+                self.img_mask = pygame.mask.from_surface(img)
+            img_mask = self.img_mask
+            for x, y in draw_pos.tolist():
+                mask.draw(img_mask, (int(x), int(y)))
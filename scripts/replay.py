@@ -0,0 +1,138 @@
+import os
+import time
+import zlib
+import struct
+
+import numpy as np
+
+from scripts.simulation import create_headless
+
+#replay file layout (little endian), version 3. 1 had no pressed bits in the actions, 2 was from
+#before the players were updated system by system (the same inputs play out differently):
+#   header        magic, version, seed, starting level, player count, ticks, number of checkpoints,
+#                 length of the compressed actions
+#   checkpoints   CHECKPOINT per checkpoint
+#   actions       zlib compressed, one byte of action bits per player per tick, tick after tick
+REPLAY_MAGIC = b'SRPL'
+REPLAY_VERSION = 3
+REPLAY_EXT = '.rpl'
+REPLAY_PATH = 'data/replays/'
+HEADER = struct.Struct('<4sHQiBIII')
+CHECKPOINT = np.dtype([('tick', '<u4'), ('hash', '<u4')])
+#ticks between state hashes, a second of play
+CHECKPOINT_INTERVAL = 60
+
+
+#a recorded match: the seed and level it started from plus every tick's actions. That's all a
+#Simulation needs to play it out again exactly, checkpoints are (tick, Simulation.state_hash())
+#along the way so playback can say when it stopped matching
+class Replay:
+    def __init__(self, seed, level, players, actions=None, checkpoints=None):
+        self.seed = seed
+        self.level = level
+        self.players = players
+        self.actions = actions if actions is not None else bytearray()
+        self.checkpoints = checkpoints if checkpoints is not None else []
+
+    @property
+    def ticks(self):
+        return len(self.actions) // self.players
+
+    def add_tick(self, actions):
+        self.actions.extend(actions)
+
+    def tick_actions(self, tick):
+        start = tick * self.players
+        return list(self.actions[start:start + self.players])
+
+
+def write_replay(path, replay):
+    checkpoints = np.array(replay.checkpoints, dtype=CHECKPOINT)
+    actions = zlib.compress(bytes(replay.actions), 9)
+    f = open(path, 'wb')
+    f.write(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, replay.seed, replay.level, replay.players, replay.ticks, checkpoints.size, len(actions)))
+    f.write(checkpoints.tobytes())
+    f.write(actions)
+    f.close()
+
+def read_replay(path):
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+    magic, version, seed, level, players, ticks, checkpoint_count, actions_size = HEADER.unpack_from(data, 0)
+    if magic != REPLAY_MAGIC:
+        raise ValueError(f"{path} is not a replay")
+    if version != REPLAY_VERSION:
+        raise ValueError(f"{path} is replay format version {version}, expected {REPLAY_VERSION}")
+    offset = HEADER.size
+    checkpoints = np.frombuffer(data, dtype=CHECKPOINT, count=checkpoint_count, offset=offset)
+    offset += checkpoints.nbytes
+    actions = bytearray(zlib.decompress(data[offset:offset + actions_size]))
+    if len(actions) != ticks * players:
+        raise ValueError(f"{path} is truncated, {len(actions)} action bytes for {ticks} ticks")
+    return Replay(seed, level, players, actions, [tuple(checkpoint) for checkpoint in checkpoints.tolist()])
+
+#a new file name in REPLAY_PATH for a recording started now
+def new_replay_path():
+    os.makedirs(REPLAY_PATH, exist_ok=True)
+    return REPLAY_PATH + time.strftime('%Y%m%d-%H%M%S') + REPLAY_EXT
+
+
+#steps a simulation and writes down what it was given. Has to start on a fresh Simulation, the
+#replay only knows the seed and level it was built with
+class ReplayRecorder:
+    def __init__(self, sim, interval=CHECKPOINT_INTERVAL):
+        self.sim = sim
+        self.interval = interval
+        self.replay = Replay(sim.seed, sim.level, len(sim.fighters))
+
+    def step(self, actions):
+        self.replay.add_tick(actions)
+        self.sim.step(actions)
+        if self.replay.ticks % self.interval == 0:
+            self.replay.checkpoints.append((self.sim.tick_count, self.sim.state_hash()))
+
+    def save(self, path):
+        write_replay(path, self.replay)
+
+
+#feeds a replay back into a simulation built with the replay's seed and level, checking the
+#state against every checkpoint it passes. desync is the tick of the first one that didn't match
+class ReplayPlayer:
+    def __init__(self, replay, sim):
+        self.replay = replay
+        self.sim = sim
+        self.tick = 0
+        self.checkpoints = dict(replay.checkpoints)
+        self.desync = None
+
+    @property
+    def done(self):
+        return self.tick >= self.replay.ticks
+
+    def next_actions(self):
+        actions = self.replay.tick_actions(self.tick)
+        self.tick += 1
+        return actions
+
+    #call once the tick's actions have been applied
+    def verify(self):
+        expected = self.checkpoints.get(self.sim.tick_count)
+        if expected is not None and self.desync is None and self.sim.state_hash() != expected:
+            self.desync = self.sim.tick_count
+            print(f"Replay desynced at tick {self.desync}")
+
+    def step(self):
+        self.sim.step(self.next_actions())
+        self.verify()
+
+
+#plays a replay with no window as fast as it goes. Returns the player (desync, final sim state)
+#and how long it took in seconds
+def play_headless(replay):
+    sim = create_headless(level=replay.level, seed=replay.seed, players=replay.players)
+    player = ReplayPlayer(replay, sim)
+    start = time.perf_counter()
+    while not player.done:
+        player.step()
+    return player, time.perf_counter() - start
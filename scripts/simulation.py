@@ -0,0 +1,200 @@
+import os
+import zlib
+import random
+import struct
+
+import pygame
+
+from scripts.assets import load_assets, load_sounds
+from scripts.entities import BattleManager
+from scripts.fighters import Fighters
+from scripts.levels import LevelLoader
+from scripts.matchstats import MatchStats
+from scripts.effects import EffectGenerator, ParticleSystem, SparkSystem
+from scripts.projectiles import ProjectileManager
+from scripts.profiler import Profiler
+from scripts.sound import SoundManager
+
+TICK_RATE = 60
+TICK_TIME = 1 / TICK_RATE
+
+#all the game logic, stepped at a fixed 60 ticks a second. Nothing in here draws to a surface,
+#so it runs the same in the window (Game) or headless for testing and tuning.
+#Entities still take this as their 'game', so it carries assets, sfx, effects and the lists they poke at.
+#players is how many are in the match, 2 for 1v1 up to 16 for a free for all. maps is a MapCache
+#for processes that set up lots of matches (see scripts/levels.py)
+class Simulation:
+    def __init__(self, assets, sfx, level=-1, on_load_level=None, prefetcher=None, profiler=None, seed=None, players=2, maps=None):
+        self.assets = assets
+        self.sfx = sfx
+        #entities ask for sounds here, the game starts them once a frame
+        self.sounds = SoundManager(sfx)
+        #timing scopes are free unless the game switches the profiler on
+        self.profiler = profiler if profiler else Profiler()
+        self.on_load_level = on_load_level
+        self.projectiles = ProjectileManager(self)
+        self.particles = ParticleSystem(self.assets)
+        self.sparks = SparkSystem()
+        self.leaf_spawners = []
+        self.tick_count = 0
+
+        #maps are prepared by the loader (in the background when there's a prefetcher), load_level swaps them in
+        self.levels = LevelLoader(self, prefetcher, maps)
+        self.tilemap = None
+        #every player's state lives in one set of arrays, see scripts/fighters.py
+        self.fighters = Fighters(self, players)
+        self.battle_manager = BattleManager(self)
+        self.transition = 0
+        #every random roll the game logic makes comes from this seed, so the same seed and the same
+        #actions always play out the same match (see scripts/replay.py)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.effects = EffectGenerator(self, self.assets, self.transition, self.seed)
+        self.level = level
+        self.load_level(self.level)
+        #balance numbers for the batch runner, see scripts/matchstats.py
+        self.stats = MatchStats(self)
+
+    def reseed(self, seed):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.effects.seed(seed)
+
+    #checksum of everything a tick can change: players, bullets, particles, sparks and where the
+    #match is at. Replays store it every so often so playback can tell exactly when it went off
+    def state_hash(self):
+        crc = zlib.crc32(struct.pack('<iiii', self.tick_count, self.level, self.transition, self.battle_manager.current_map))
+        fighters = self.fighters
+        for column in (fighters.pos, fighters.velocity, fighters.damage, fighters.air_time, fighters.dashing, fighters.dead, fighters.weapon, fighters.attacking):
+            crc = zlib.crc32(column.tobytes(), crc)
+        crc = zlib.crc32(self.projectiles.pos[:self.projectiles.count].tobytes(), crc)
+        crc = zlib.crc32(self.sparks.pos[:self.sparks.count].tobytes(), crc)
+        for pool in self.particles.pools.values():
+            crc = zlib.crc32(pool.pos[:pool.count].tobytes(), crc)
+        return crc
+
+    #a copy of everything step() can change, load_state() puts the match back exactly there (the
+    #same actions from it play out the same again). For rollback netplay, see scripts/netplay.py.
+    #The level is kept by reference: a map change since is undone by swapping the old one back in
+    def save_state(self):
+        return SimState(self)
+
+    def load_state(self, state):
+        if state.tilemap is not self.tilemap:
+            self.level = state.level
+            self.main_menu = state.main_menu
+            self.tilemap = state.tilemap
+            self.leaf_spawners = state.leaf_spawners
+        self.tilemap.restore_weapon_tiles(state.weapon_tiles)
+        self.tick_count = state.tick_count
+        self.transition = state.transition
+        self.rng.setstate(state.rng)
+        self.effects.load_state(state.effects)
+        self.fighters.load_state(state.fighters)
+        self.battle_manager.load_state(state.battle_manager)
+        self.projectiles.load_state(state.projectiles)
+        self.particles.load_state(state.particles)
+        self.sparks.load_state(state.sparks)
+        self.stats.load_state(state.stats)
+
+    def next_map_effect(self):
+        self.transition = min(30, self.transition + 1)
+
+    #swaps in the level, then queues up the maps the players can go to from here.
+    #Handles placing the players on their spawners and clears the lists for particles, sparks, ect
+    def load_level(self, map_id):
+        with self.profiler.scope('load_level'):
+            self.level = map_id
+            self.main_menu = True if map_id == -1 else False
+            level = self.levels.take(map_id)
+            self.tilemap = level.tilemap
+            self.leaf_spawners = level.leaf_spawners
+            self.particles.clear()
+            self.sparks.clear()
+
+            #places players based on the off grid spawner tiles, the last one of each variant counts.
+            #Player i takes variant i (0 and 1 on every map so far), going round again when there are
+            #more players than variants. Variant 1 spawns face left
+            spawns = {}
+            for spawner in level.spawners:
+                spawns[spawner['variant']] = spawner['pos']
+            variants = sorted(spawns)
+            if variants:
+                for i in range(len(self.fighters)):
+                    variant = variants[i % len(variants)]
+                    self.fighters.place(i, spawns[variant], face_left=(variant == 1))
+            self.transition = -30
+            self.levels.prefetch(self.upcoming_levels())
+
+            if self.on_load_level:
+                self.on_load_level(map_id)
+
+    #maps next_map can send us to from the current one
+    def upcoming_levels(self):
+        if self.main_menu:
+            return [self.battle_manager.current_map]
+        return [map_id for map_id in (self.level - 1, self.level + 1) if map_id in self.battle_manager.maps]
+
+    #advances the game by one tick. actions is a list of action bits, one per player
+    def step(self, actions):
+        with self.profiler.scope('update_battle'):
+            self.begin_tick()
+            self.update_players(actions)
+            self.battle_manager.update()
+            self.update_projectiles()
+        with self.profiler.scope('update_particles'):
+            self.update_particles()
+
+    #bookkeeping done before any entity moves
+    def begin_tick(self):
+        self.tick_count += 1
+        if self.transition < 0:
+            self.transition += 1
+
+    def update_players(self, actions):
+        self.fighters.update(self.tilemap, actions)
+
+    #moves bullets, checks them against walls and players and expires old ones
+    def update_projectiles(self):
+        self.projectiles.update(self.tilemap, self.fighters)
+
+    #updates all the effects, such as sparks, particles, leafs ect
+    def update_particles(self):
+        for rect in self.leaf_spawners:
+            self.effects.create_leaf(rect)
+
+        #handling sparks
+        self.sparks.update()
+
+        #handling leaves, blood and the rest in one go
+        self.particles.update()
+
+
+#a saved match, see Simulation.save_state
+class SimState:
+    def __init__(self, sim):
+        self.tick_count = sim.tick_count
+        self.level = sim.level
+        self.main_menu = sim.main_menu
+        self.tilemap = sim.tilemap
+        self.leaf_spawners = sim.leaf_spawners
+        self.weapon_tiles = sim.tilemap.weapon_tiles()
+        self.transition = sim.transition
+        self.rng = sim.rng.getstate()
+        self.effects = sim.effects.save_state()
+        self.fighters = sim.fighters.save_state()
+        self.battle_manager = sim.battle_manager.save_state()
+        self.projectiles = sim.projectiles.save_state()
+        self.particles = sim.particles.save_state()
+        self.sparks = sim.sparks.save_state()
+        self.stats = sim.stats.save_state()
+
+
+#builds a simulation with no window and no audio, using SDL's dummy video driver so images
+#can still be converted. Good for running matches far faster than real time
+def create_headless(level=-1, seed=None, players=2):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    if not pygame.display.get_surface():
+        pygame.display.set_mode((1, 1))
+    return Simulation(load_assets(), load_sounds(), level=level, seed=seed, players=players)
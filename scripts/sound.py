@@ -0,0 +1,112 @@
+import pygame
+
+from scripts.utils import NullSound
+
+#mixer channels kept for sound effects. They're reserved, so a plain Sound.play() somewhere else
+#can never take one over
+SOUND_CHANNELS = 8
+
+#per sound: priority (a higher one can cut off a lower one when every channel is busy), how many
+#copies may play at once and how soon (ms) it may start again after the last time
+SOUND_SETTINGS = {
+    'transition': {'priority': 4, 'max_voices': 1, 'cooldown': 250},
+    'damage': {'priority': 3, 'max_voices': 2, 'cooldown': 60},
+    'hit': {'priority': 3, 'max_voices': 2, 'cooldown': 60},
+    'pickup': {'priority': 2, 'max_voices': 1, 'cooldown': 100},
+    'shoot': {'priority': 2, 'max_voices': 3, 'cooldown': 40},
+    'dash': {'priority': 1, 'max_voices': 2, 'cooldown': 80},
+    'jump': {'priority': 1, 'max_voices': 2, 'cooldown': 80},
+    'ambience': {'priority': 0, 'max_voices': 1, 'cooldown': 0},
+}
+DEFAULT_SETTING = {'priority': 1, 'max_voices': 1, 'cooldown': 50}
+
+
+#where sound effects go instead of calling play() on them. Requests are collected during the
+#frame (asking for the same sound twice is one request) and started together in flush() on a
+#fixed pool of channels, so the cost per frame is bounded by the number of sound names rather
+#than by how many things happened. Runs without a mixer too, the requests are just dropped
+class SoundManager:
+    def __init__(self, sfx, channels=SOUND_CHANNELS, settings=SOUND_SETTINGS):
+        self.sfx = sfx
+        self.channel_count = channels
+        self.settings = settings
+        self.requests = set()
+        self.channels = None
+        #per channel: (name, priority, start time) of what was last started on it
+        self.voices = []
+        self.last_played = {}
+        self.stats = {'requested': 0, 'played': 0, 'cooldown': 0, 'stolen': 0, 'dropped': 0}
+
+    def play(self, name):
+        self.requests.add(name)
+
+    #grabs the reserved channels the first time the mixer is there
+    def init_channels(self):
+        if pygame.mixer.get_num_channels() < self.channel_count:
+            pygame.mixer.set_num_channels(self.channel_count)
+        pygame.mixer.set_reserved(self.channel_count)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self.voices = [None] * self.channel_count
+
+    #starts this frame's requests, most important first. now is in ms (pygame.time.get_ticks())
+    def flush(self, now=None):
+        if not self.requests:
+            return
+        requests = self.requests
+        self.requests = set()
+        self.stats['requested'] += len(requests)
+        if not pygame.mixer.get_init():
+            return
+        if self.channels is None:
+            self.init_channels()
+        now = pygame.time.get_ticks() if now is None else now
+
+        for name in sorted(requests, key=lambda name: -self.setting(name)['priority']):
+            setting = self.setting(name)
+            if now - self.last_played.get(name, -setting['cooldown']) < setting['cooldown']:
+                self.stats['cooldown'] += 1
+                continue
+            sound = self.sfx[name]
+            #missing file, nothing to play
+            if isinstance(sound, NullSound):
+                continue
+            channel = self.pick_channel(name, setting)
+            if channel is None:
+                self.stats['dropped'] += 1
+                continue
+            self.channels[channel].play(sound)
+            self.voices[channel] = (name, setting['priority'], now)
+            self.last_played[name] = now
+            self.stats['played'] += 1
+
+    def setting(self, name):
+        return self.settings.get(name, DEFAULT_SETTING)
+
+    #a free channel if there is one. At the voice limit the oldest copy of the same sound is
+    #restarted, otherwise the oldest voice of the lowest priority at or below this one is cut off
+    def pick_channel(self, name, setting):
+        free = None
+        same = []
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                self.voices[i] = None
+                if free is None:
+                    free = i
+            elif self.voices[i] and self.voices[i][0] == name:
+                same.append(i)
+        if len(same) >= setting['max_voices']:
+            self.stats['stolen'] += 1
+            return min(same, key=lambda i: self.voices[i][2])
+        if free is not None:
+            return free
+
+        victim = None
+        for i, voice in enumerate(self.voices):
+            if voice is None or voice[1] > setting['priority']:
+                continue
+            if victim is None or (voice[1], voice[2]) < (self.voices[victim][1], self.voices[victim][2]):
+                victim = i
+        if victim is not None:
+            self.stats['stolen'] += 1
+        return victim
+
@@ -1,165 +1,590 @@
-import json
-import random
-import pygame
-
-#autotiling logic, determines if adj tiles are the same or not.
-AUTOTILE_MAP = {
-    tuple(sorted([(1, 0), (0, 1)])): 0,
-    tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 1,
-    tuple(sorted([(-1, 0), (0, 1)])): 2, 
-    tuple(sorted([(-1, 0), (0, -1), (0, 1)])): 3,
-    tuple(sorted([(-1, 0), (0, -1)])): 4,
-    tuple(sorted([(-1, 0), (0, -1), (1, 0)])): 5,
-    tuple(sorted([(1, 0), (0, -1)])): 6,
-    tuple(sorted([(1, 0), (0, -1), (0, 1)])): 7,
-    tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
-}
-
-NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
-
-#makes it easier to follow the logic, and kinda modular 
-PHYSICS_TILES = {'grass', 'stone'}
-WEAPON_TILES = {'gunTile'}
-TRANSITION_TILES = {'transition'}
-AUTOTILE_TYPES = {'grass', 'stone'}
-
-class Tilemap:
-    def __init__(self, game, tile_size=16):
-        self.game = game
-        self.tile_size = tile_size
-        self.tilemap = {}
-        self.offgrid_tiles = []
-    
-    #returns a list of tile, regardless if its on or off grid. Super useful
-    #for spawners
-    def extract(self, id_pairs, keep=False):
-        matches = []
-        for tile in self.offgrid_tiles.copy():
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                if not keep:
-                    self.offgrid_tiles.remove(tile)
-                    
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                matches[-1]['pos'] = matches[-1]['pos'].copy()
-                matches[-1]['pos'][0] *= self.tile_size
-                matches[-1]['pos'][1] *= self.tile_size
-                if not keep:
-                    del self.tilemap[loc]
-        return matches
-    
-    #returns the tiles immediately around a entity. Useful for physics
-    def get_tiles_around(self, pos):
-        tiles = []
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
-        for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
-        return tiles
-    
-    #serializing map dictionaries to json
-    def save(self, path):
-        f = open(path, 'w')
-        json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
-        f.close()
-    
-    #deserializing json map and loading it into dictionaries 
-    def load(self, path):
-        f = open(path, 'r')
-        map_data = json.load(f)
-        f.close()
-        self.tilemap = map_data['tilemap']
-        self.tile_size = map_data['tile_size']
-        self.offgrid_tiles = map_data['offgrid']
-    
-    #checks for tiles that arent air tiles 
-    def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
-    
-    #returns a dictionary of the location and variant of the transition tiles  
-    def get_transition_tiles_loc(self):
-        transition_tiles = []
-        for tile_loc in self.tilemap:
-            tile = self.tilemap[tile_loc]
-            if tile['type'] in TRANSITION_TILES:
-                transition_tile = {
-                    'coord': pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size),
-                    'variant': tile.get('variant', 0)
-                }
-                transition_tiles.append(transition_tile)
-        return transition_tiles
-    
-    #returns a list of gun tile locations
-    def get_gun_tile_loc(self):
-        gun_tile = []
-        for tile_loc in self.tilemap:
-            tile = self.tilemap[tile_loc]
-            if tile['type'] in WEAPON_TILES:
-                tile_rect = pygame.Rect(tile['pos'][0] * self.tile_size,
-                                        tile['pos'][1] * self.tile_size,
-                                        self.tile_size,
-                                        self.tile_size)
-                gun_tile.append(tile_rect)
-        return gun_tile
-    
-    #gives a 'random' chance for the gun to be immediately despawned when the map is loaded 
-    def spawn_gun_by_chance(self):
-        if random.random() > 0.5:
-            self.despawn_gun_tile()
-    
-    #removes gun tile from the runtime map dictionary 
-    def despawn_gun_tile(self):
-        for tile_loc in list(self.tilemap.keys()):
-            tile = self.tilemap[tile_loc]
-            if tile['type'] in WEAPON_TILES:
-                del self.tilemap[tile_loc]
-    
-    #returns the pygame rect of all the adj tiles around the passed entity pos
-    def get_physics_rects(self, pos):
-        rects = []
-        for tile in self.get_tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size,
-                                         tile['pos'][1] * self.tile_size,
-                                         self.tile_size,
-                                         self.tile_size))
-        return rects
-    
-    #logic behind autotiling, stolen from the guide and I haven't thought about it since..
-    def autotile(self):
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']:
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]
-    
-    #applying tile images ontop of map based on the: list position for offtiles (expensive) dict xy string coord (cheap). 
-    def render(self, surf, offset=(0, 0)):
-        for tile in self.offgrid_tiles:
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
-        
-        #pretty annoying, but overall worth it given the performance gains 
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    try:
-                        surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
-                    except Exception as e:
-                        #top tier error handling I know..
-                        print(f"Error rendering: {tile['type']}, {tile['variant']}, {tile['pos']}" )
-    
\ No newline at end of file
+import json
+import math
+import random
+from array import array
+
+import numpy as np
+import pygame
+
+from scripts.mapformat import MapData, MAP_EXT, load_map, write_map
+from scripts.outline import bake_outline
+
+#autotiling logic, determines if adj tiles are the same or not.
+AUTOTILE_MAP = {
+    tuple(sorted([(1, 0), (0, 1)])): 0,
+    tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 1,
+    tuple(sorted([(-1, 0), (0, 1)])): 2,
+    tuple(sorted([(-1, 0), (0, -1), (0, 1)])): 3,
+    tuple(sorted([(-1, 0), (0, -1)])): 4,
+    tuple(sorted([(-1, 0), (0, -1), (1, 0)])): 5,
+    tuple(sorted([(1, 0), (0, -1)])): 6,
+    tuple(sorted([(1, 0), (0, -1), (0, 1)])): 7,
+    tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
+}
+
+NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
+
+#makes it easier to follow the logic, and kinda modular
+PHYSICS_TILES = {'grass', 'stone'}
+WEAPON_TILES = {'gunTile'}
+TRANSITION_TILES = {'transition'}
+AUTOTILE_TYPES = {'grass', 'stone'}
+#tile types the battle manager asks about every frame, kept in their own index
+INDEXED_TILES = WEAPON_TILES | TRANSITION_TILES
+
+#grid tiles are stored in square chunks of CHUNK_SIZE x CHUNK_SIZE cells. Each chunk holds two
+#typed arrays (type id and variant), so lookups are a couple of shifts instead of building 'x;y' strings
+CHUNK_SHIFT = 4
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+CHUNK_MASK = CHUNK_SIZE - 1
+EMPTY = -1
+
+#offgrid tiles are bucketed by the OFFGRID_BUCKET sized cells their image covers
+OFFGRID_BUCKET = 64
+
+
+class Chunk:
+    def __init__(self):
+        self.types = array('h', [EMPTY]) * (CHUNK_SIZE * CHUNK_SIZE)
+        self.variants = array('h', [0]) * (CHUNK_SIZE * CHUNK_SIZE)
+        self.count = 0
+
+
+#assets=False is for tools that only read and write maps (convert_maps.py, no game to take tile
+#images from): offgrid tiles count as one tile big, nothing overhangs and nothing gets drawn
+class Tilemap:
+    def __init__(self, game, tile_size=16, assets=True):
+        self.game = game
+        self.has_assets = assets
+        self.tile_size = tile_size
+        self.chunks = {}
+        self.type_names = []
+        self.type_ids = {}
+        self.physics_ids = set()
+        self.tile_index = {}
+        self.index_cache = {}
+        self.solid_cache = None
+        self.offgrid_tiles = []
+        self.offgrid_buckets = {}
+        self.offgrid_entries = {}
+        self.offgrid_order = 0
+        self.render_cache = {}
+        self.outline_cache = {}
+        self.overflow = None
+
+    #maps a tile type name to a small integer id, registering it the first time it's seen
+    def tile_id(self, tile_type):
+        if tile_type not in self.type_ids:
+            self.type_ids[tile_type] = len(self.type_names)
+            self.type_names.append(tile_type)
+            if tile_type in PHYSICS_TILES:
+                self.physics_ids.add(self.type_ids[tile_type])
+            self.overflow = None
+        return self.type_ids[tile_type]
+
+    #places a tile on the grid, replacing whatever was there
+    def set_tile(self, x, y, tile_type, variant=0):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = Chunk()
+        i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+        type_id = self.tile_id(tile_type)
+        if chunk.types[i] == type_id and chunk.variants[i] == variant:
+            return
+        if chunk.types[i] == EMPTY:
+            chunk.count += 1
+        else:
+            self.unindex_tile(x, y, self.type_names[chunk.types[i]])
+        chunk.types[i] = type_id
+        chunk.variants[i] = variant
+        self.index_tile(x, y, tile_type, variant)
+        self.solid_cache = None
+        self.invalidate(x * self.tile_size, y * self.tile_size)
+
+    #removes a tile from the grid, returns True if there was one
+    def remove_tile(self, x, y):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            return False
+        i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+        if chunk.types[i] == EMPTY:
+            return False
+        self.unindex_tile(x, y, self.type_names[chunk.types[i]])
+        self.solid_cache = None
+        chunk.types[i] = EMPTY
+        chunk.variants[i] = 0
+        chunk.count -= 1
+        if not chunk.count:
+            del self.chunks[key]
+        self.invalidate(x * self.tile_size, y * self.tile_size)
+        return True
+
+    #keeps the per type index of transition/gun tiles in step with the grid
+    def index_tile(self, x, y, tile_type, variant):
+        if tile_type in INDEXED_TILES:
+            self.tile_index.setdefault(tile_type, {})[(x, y)] = variant
+            self.index_cache = {}
+
+    def unindex_tile(self, x, y, tile_type):
+        if tile_type in INDEXED_TILES:
+            del self.tile_index[tile_type][(x, y)]
+            self.index_cache = {}
+
+    #world space rect an offgrid tile's image covers
+    def offgrid_rect(self, tile):
+        size = (self.tile_size, self.tile_size)
+        if self.has_assets:
+            try:
+                size = self.game.assets[tile['type']][tile['variant']].get_size()
+            except (KeyError, IndexError) as e:
+                #no image for it, bake_chunk reports that when it gets drawn
+                pass
+        return pygame.Rect(math.floor(tile['pos'][0]), math.floor(tile['pos'][1]), size[0], size[1])
+
+    #puts an offgrid tile into every bucket its rect touches. The order number keeps the
+    #draw order of the offgrid list when tiles come back out of the buckets
+    def index_offgrid(self, tile):
+        rect = self.offgrid_rect(tile)
+        entry = (self.offgrid_order, tile, rect)
+        self.offgrid_order += 1
+        self.offgrid_entries[id(tile)] = entry
+        for bx in range(rect.left // OFFGRID_BUCKET, (rect.right - 1) // OFFGRID_BUCKET + 1):
+            for by in range(rect.top // OFFGRID_BUCKET, (rect.bottom - 1) // OFFGRID_BUCKET + 1):
+                self.offgrid_buckets.setdefault((bx, by), []).append(entry)
+
+    #takes an offgrid tile back out of its buckets, returns the rect its image covered
+    def unindex_offgrid(self, tile):
+        entry = self.offgrid_entries.pop(id(tile))
+        rect = entry[2]
+        for bx in range(rect.left // OFFGRID_BUCKET, (rect.right - 1) // OFFGRID_BUCKET + 1):
+            for by in range(rect.top // OFFGRID_BUCKET, (rect.bottom - 1) // OFFGRID_BUCKET + 1):
+                bucket = self.offgrid_buckets[(bx, by)]
+                bucket.remove(entry)
+                if not bucket:
+                    del self.offgrid_buckets[(bx, by)]
+        return rect
+
+    #rebuilds the buckets from the offgrid list, the list stays the source of truth for saving
+    def rebuild_offgrid_index(self):
+        self.offgrid_buckets = {}
+        self.offgrid_entries = {}
+        self.offgrid_order = 0
+        for tile in self.offgrid_tiles:
+            self.index_offgrid(tile)
+
+    #offgrid tiles whose image overlaps the world space rect, in draw order
+    def offgrid_in_rect(self, rect):
+        rect = pygame.Rect(rect)
+        found = {}
+        for bx in range(rect.left // OFFGRID_BUCKET, (rect.right - 1) // OFFGRID_BUCKET + 1):
+            for by in range(rect.top // OFFGRID_BUCKET, (rect.bottom - 1) // OFFGRID_BUCKET + 1):
+                for entry in self.offgrid_buckets.get((bx, by), ()):
+                    if entry[0] not in found and rect.colliderect(entry[2]):
+                        found[entry[0]] = entry[1]
+        return [found[order] for order in sorted(found)]
+
+    #offgrid tiles under a world space point, used by the editor to delete decor
+    def offgrid_at(self, pos):
+        x = math.floor(pos[0])
+        y = math.floor(pos[1])
+        hits = []
+        for entry in self.offgrid_buckets.get((x // OFFGRID_BUCKET, y // OFFGRID_BUCKET), ()):
+            if entry[2].collidepoint(x, y):
+                hits.append(entry)
+        return [entry[1] for entry in sorted(hits, key=lambda entry: entry[0])]
+
+    #adds a decor/spawner tile that isn't snapped to the grid
+    def add_offgrid(self, tile):
+        self.offgrid_tiles.append(tile)
+        self.index_offgrid(tile)
+        self.invalidate_rect(self.offgrid_entries[id(tile)][2])
+
+    def remove_offgrid(self, tile):
+        rect = self.unindex_offgrid(tile)
+        for i in range(len(self.offgrid_tiles)):
+            if self.offgrid_tiles[i] is tile:
+                del self.offgrid_tiles[i]
+                break
+        self.invalidate_rect(rect)
+
+    #returns the type name of the tile at a grid coord, or None for air
+    def tile_type_at(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is not None:
+            type_id = chunk.types[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+            if type_id != EMPTY:
+                return self.type_names[type_id]
+
+    #returns a tile in the same dict format the json maps use, or None for air
+    def get_tile(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is not None:
+            i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+            if chunk.types[i] != EMPTY:
+                return {'type': self.type_names[chunk.types[i]], 'variant': chunk.variants[i], 'pos': [x, y]}
+
+    #true if the grid coord holds a grass/stone tile
+    def is_solid(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return False
+        return chunk.types[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)] in self.physics_ids
+
+    #dense bool grid of solid tiles over the chunks' bounding box, for vectorized lookups
+    #(e.g. every projectile at once). Returns (grid, origin x, origin y) in tile coords,
+    #grid is indexed [y, x]. Cached until a tile changes
+    def solid_grid(self):
+        if self.solid_cache is None:
+            if not self.chunks:
+                self.solid_cache = (np.zeros((0, 0), dtype=bool), 0, 0)
+                return self.solid_cache
+            min_cx = min(key[0] for key in self.chunks)
+            min_cy = min(key[1] for key in self.chunks)
+            width = max(key[0] for key in self.chunks) - min_cx + 1
+            height = max(key[1] for key in self.chunks) - min_cy + 1
+            grid = np.zeros((height * CHUNK_SIZE, width * CHUNK_SIZE), dtype=bool)
+            solid_ids = np.array(sorted(self.physics_ids), dtype=np.int16)
+            for (cx, cy), chunk in self.chunks.items():
+                types = np.frombuffer(chunk.types, dtype=np.int16).reshape(CHUNK_SIZE, CHUNK_SIZE)
+                gx = (cx - min_cx) * CHUNK_SIZE
+                gy = (cy - min_cy) * CHUNK_SIZE
+                grid[gy:gy + CHUNK_SIZE, gx:gx + CHUNK_SIZE] = np.isin(types, solid_ids)
+            self.solid_cache = (grid, min_cx * CHUNK_SIZE, min_cy * CHUNK_SIZE)
+        return self.solid_cache
+
+    #walks every grid tile as (x, y, type id, variant), chunk by chunk
+    def iter_tiles(self):
+        for (cx, cy), chunk in list(self.chunks.items()):
+            types = chunk.types
+            for i in range(CHUNK_SIZE * CHUNK_SIZE):
+                if types[i] != EMPTY:
+                    yield (cx << CHUNK_SHIFT) | (i & CHUNK_MASK), (cy << CHUNK_SHIFT) | (i >> CHUNK_SHIFT), types[i], chunk.variants[i]
+
+    #all grid tiles as json style dicts
+    def tiles(self):
+        return [{'type': self.type_names[type_id], 'variant': variant, 'pos': [x, y]} for x, y, type_id, variant in self.iter_tiles()]
+
+    #returns a list of tile, regardless if its on or off grid. Super useful
+    #for spawners
+    def extract(self, id_pairs, keep=False):
+        matches = []
+        remaining = []
+        for tile in self.offgrid_tiles:
+            if (tile['type'], tile['variant']) in id_pairs:
+                matches.append(tile.copy())
+                if not keep:
+                    self.invalidate_rect(self.unindex_offgrid(tile))
+                    continue
+            remaining.append(tile)
+        self.offgrid_tiles = remaining
+
+        for x, y, type_id, variant in self.iter_tiles():
+            if (self.type_names[type_id], variant) in id_pairs:
+                matches.append({'type': self.type_names[type_id], 'variant': variant, 'pos': [x * self.tile_size, y * self.tile_size]})
+                if not keep:
+                    self.remove_tile(x, y)
+        return matches
+
+    #returns the tiles immediately around a entity. Useful for physics
+    def get_tiles_around(self, pos):
+        tiles = []
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        for offset in NEIGHBOR_OFFSETS:
+            tile = self.get_tile(tile_x + offset[0], tile_y + offset[1])
+            if tile:
+                tiles.append(tile)
+        return tiles
+
+    #serializing the grid back into the original 'x;y' keyed json so maps stay editable, or into
+    #the binary format if the path ends in .map
+    def save(self, path):
+        if path.endswith(MAP_EXT):
+            write_map(path, self.map_data())
+            return
+        tilemap = {}
+        for tile in self.tiles():
+            tilemap[str(tile['pos'][0]) + ';' + str(tile['pos'][1])] = tile
+        f = open(path, 'w')
+        json.dump({'tilemap': tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
+        f.close()
+
+    #the grid and offgrid tiles as arrays, what the binary format stores
+    def map_data(self):
+        tiles = [(x, y, self.type_names[type_id], variant) for x, y, type_id, variant in self.iter_tiles()]
+        return MapData.from_tiles(self.tile_size, tiles, [dict(tile) for tile in self.offgrid_tiles])
+
+    #loads either map format, the binary one is recognised by its header
+    def load(self, path):
+        self.load_map_data(load_map(path))
+
+    #fills the chunks straight from the map's type/variant arrays, a chunk sized block at a time
+    def load_map_data(self, data):
+        self.chunks = {}
+        self.tile_index = {}
+        self.index_cache = {}
+        self.solid_cache = None
+        self.render_cache = {}
+        self.outline_cache = {}
+        self.tile_size = data.tile_size
+
+        #file type ids -> our ids. -1 (air) picks the EMPTY on the end
+        lookup = np.array([self.tile_id(name) for name in data.names] + [EMPTY], dtype=np.int16)
+        types = lookup[data.types]
+        x0, y0 = data.origin
+        height, width = types.shape
+        if width and height:
+            for cy in range(y0 >> CHUNK_SHIFT, ((y0 + height - 1) >> CHUNK_SHIFT) + 1):
+                for cx in range(x0 >> CHUNK_SHIFT, ((x0 + width - 1) >> CHUNK_SHIFT) + 1):
+                    #overlap of this chunk and the map's bounding box, in map array coords
+                    left = max(cx << CHUNK_SHIFT, x0) - x0
+                    right = min((cx + 1) << CHUNK_SHIFT, x0 + width) - x0
+                    top = max(cy << CHUNK_SHIFT, y0) - y0
+                    bottom = min((cy + 1) << CHUNK_SHIFT, y0 + height) - y0
+                    block = types[top:bottom, left:right]
+                    count = int(np.count_nonzero(block != EMPTY))
+                    if not count:
+                        continue
+                    chunk_types = np.full((CHUNK_SIZE, CHUNK_SIZE), EMPTY, dtype=np.int16)
+                    chunk_variants = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.int16)
+                    cell_x = (left + x0) & CHUNK_MASK
+                    cell_y = (top + y0) & CHUNK_MASK
+                    chunk_types[cell_y:cell_y + bottom - top, cell_x:cell_x + right - left] = block
+                    chunk_variants[cell_y:cell_y + bottom - top, cell_x:cell_x + right - left] = np.where(block != EMPTY, data.variants[top:bottom, left:right], 0)
+                    chunk = self.chunks[(cx, cy)] = Chunk()
+                    chunk.types = array('h', chunk_types.tobytes())
+                    chunk.variants = array('h', chunk_variants.tobytes())
+                    chunk.count = count
+
+        for i, name in enumerate(data.names):
+            if name in INDEXED_TILES:
+                for y, x in zip(*np.nonzero(data.types == i)):
+                    self.index_tile(int(x) + x0, int(y) + y0, name, int(data.variants[y, x]))
+
+        self.offgrid_tiles = data.offgrid
+        self.rebuild_offgrid_index()
+
+    #checks for tiles that arent air tiles
+    def solid_check(self, pos):
+        return self.is_solid(int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+
+    #returns a dictionary of the location and variant of the transition tiles. Built from the
+    #tile index and cached until a transition tile changes, so don't mutate what comes back
+    def get_transition_tiles_loc(self):
+        if 'transition' not in self.index_cache:
+            transition_tiles = []
+            for tile_type in TRANSITION_TILES:
+                for (x, y), variant in self.tile_index.get(tile_type, {}).items():
+                    transition_tile = {
+                        'coord': pygame.Rect(x * self.tile_size, y * self.tile_size, self.tile_size, self.tile_size),
+                        'variant': variant
+                    }
+                    transition_tiles.append(transition_tile)
+            self.index_cache['transition'] = transition_tiles
+        return self.index_cache['transition']
+
+    #returns a list of gun tile locations, cached the same way as the transition tiles
+    def get_gun_tile_loc(self):
+        if 'weapon' not in self.index_cache:
+            gun_tile = []
+            for tile_type in WEAPON_TILES:
+                for (x, y) in self.tile_index.get(tile_type, {}):
+                    gun_tile.append(pygame.Rect(x * self.tile_size, y * self.tile_size, self.tile_size, self.tile_size))
+            self.index_cache['weapon'] = gun_tile
+        return self.index_cache['weapon']
+
+    #gives a 'random' chance for the gun to be immediately despawned when the map is loaded.
+    #Pass the simulation's rng so replays roll the same way
+    def spawn_gun_by_chance(self, rng=random):
+        if rng.random() > 0.5:
+            self.despawn_gun_tile()
+
+    #the gun tiles still on the map as (type, (x, y), variant), for saving and restoring the match
+    #(see scripts/netplay.py). Picking the gun up removes its tile, restoring puts it back
+    def weapon_tiles(self):
+        return sorted((tile_type, pos, variant) for tile_type in WEAPON_TILES for pos, variant in self.tile_index.get(tile_type, {}).items())
+
+    def restore_weapon_tiles(self, tiles):
+        if self.weapon_tiles() == tiles:
+            return
+        self.despawn_gun_tile()
+        for tile_type, (x, y), variant in tiles:
+            self.set_tile(x, y, tile_type, variant)
+
+    #removes gun tile from the runtime map
+    def despawn_gun_tile(self):
+        for tile_type in WEAPON_TILES:
+            for (x, y) in list(self.tile_index.get(tile_type, {})):
+                self.remove_tile(x, y)
+
+    #returns the pygame rect of all the adj tiles around the passed entity pos
+    def get_physics_rects(self, pos):
+        rects = []
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        for offset in NEIGHBOR_OFFSETS:
+            if self.is_solid(tile_x + offset[0], tile_y + offset[1]):
+                rects.append(pygame.Rect((tile_x + offset[0]) * self.tile_size,
+                                         (tile_y + offset[1]) * self.tile_size,
+                                         self.tile_size,
+                                         self.tile_size))
+        return rects
+
+    #logic behind autotiling, stolen from the guide and I haven't thought about it since..
+    def autotile(self):
+        for x, y, type_id, variant in self.iter_tiles():
+            if self.type_names[type_id] not in AUTOTILE_TYPES:
+                continue
+            neighbors = set()
+            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
+                if self.tile_type_at(x + shift[0], y + shift[1]) == self.type_names[type_id]:
+                    neighbors.add(shift)
+            neighbors = tuple(sorted(neighbors))
+            if neighbors in AUTOTILE_MAP:
+                self.set_tile(x, y, self.type_names[type_id], AUTOTILE_MAP[neighbors])
+
+    #how many tiles past its own cell the biggest tile image reaches (large decor hangs over its neighbours).
+    #Indexing the registry loads any group that isn't yet, so what gets cached is the real size
+    def overflow_tiles(self):
+        if self.overflow is None:
+            overflow = 0
+            for tile_type in self.type_names if self.has_assets else ():
+                try:
+                    images = self.game.assets[tile_type]
+                except KeyError:
+                    continue
+                for img in images:
+                    overflow = max(overflow, (max(img.get_size()) - 1) // self.tile_size)
+            self.overflow = overflow
+        return self.overflow
+
+    #throws away the baked chunks that can show a grid tile drawn at this pixel position
+    def invalidate(self, x, y):
+        if not self.render_cache:
+            return
+        chunk_px = CHUNK_SIZE * self.tile_size
+        reach = (self.overflow_tiles() + 1) * self.tile_size
+        for cx in range(int(x // chunk_px), int((x + reach) // chunk_px) + 1):
+            for cy in range(int(y // chunk_px), int((y + reach) // chunk_px) + 1):
+                self.render_cache.pop((cx, cy), None)
+                self.outline_cache.pop((cx, cy), None)
+
+    #throws away the baked chunks a world space rect overlaps, for offgrid tiles whose image can
+    #start anywhere and be any size
+    def invalidate_rect(self, rect):
+        if not self.render_cache:
+            return
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1):
+            for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1):
+                self.render_cache.pop((cx, cy), None)
+                self.outline_cache.pop((cx, cy), None)
+
+    #pre-composites every tile that touches a chunk into one surface. Offgrid tiles go first
+    #and the grid goes on top in the same x then y order the old per tile loop used
+    def bake_chunk(self, cx, cy):
+        chunk_px = CHUNK_SIZE * self.tile_size
+        origin = (cx * chunk_px, cy * chunk_px)
+        area = pygame.Rect(origin, (chunk_px, chunk_px))
+        surf = None
+        if not self.has_assets:
+            self.render_cache[(cx, cy)] = surf
+            return surf
+        assets = self.game.assets
+
+        for tile in self.offgrid_in_rect(area):
+            try:
+                img = assets[tile['type']][tile['variant']]
+            except Exception as e:
+                print(f"Error rendering: {tile['type']}, {tile['variant']}, {tile['pos']}" )
+                continue
+            if surf is None:
+                surf = pygame.Surface((chunk_px, chunk_px), pygame.SRCALPHA)
+            surf.blit(img, (tile['pos'][0] - origin[0], tile['pos'][1] - origin[1]))
+
+        #tiles from the neighbouring chunks up and left can hang into this one
+        overflow = self.overflow_tiles()
+        for x in range((cx << CHUNK_SHIFT) - overflow, (cx + 1) << CHUNK_SHIFT):
+            for y in range((cy << CHUNK_SHIFT) - overflow, (cy + 1) << CHUNK_SHIFT):
+                chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+                if chunk is None:
+                    continue
+                i = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+                type_id = chunk.types[i]
+                if type_id != EMPTY:
+                    try:
+                        img = assets[self.type_names[type_id]][chunk.variants[i]]
+                    except Exception as e:
+                        #top tier error handling I know..
+                        print(f"Error rendering: {self.type_names[type_id]}, {chunk.variants[i]}, {[x, y]}" )
+                        continue
+                    if surf is None:
+                        surf = pygame.Surface((chunk_px, chunk_px), pygame.SRCALPHA)
+                    surf.blit(img, (x * self.tile_size - origin[0], y * self.tile_size - origin[1]))
+
+        self.render_cache[(cx, cy)] = surf
+        return surf
+
+    #chunk coords and screen position of every chunk a surface of this size can see
+    def visible_chunks(self, size, offset):
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(offset[0] // chunk_px, (offset[0] + size[0]) // chunk_px + 1):
+            for cy in range(offset[1] // chunk_px, (offset[1] + size[1]) // chunk_px + 1):
+                yield cx, cy, (cx * chunk_px - offset[0], cy * chunk_px - offset[1])
+
+    #level geometry barely changes, so instead of blitting every tile each frame we blit the
+    #baked chunks that overlap the camera (usually 2-4 of them)
+    def render(self, surf, offset=(0, 0)):
+        for cx, cy, pos in self.visible_chunks(surf.get_size(), offset):
+            if (cx, cy) in self.render_cache:
+                baked = self.render_cache[(cx, cy)]
+            else:
+                baked = self.bake_chunk(cx, cy)
+            if baked is not None:
+                surf.blit(baked, pos)
+
+    #the outline around a baked chunk and the mask it came from, or None for an empty chunk.
+    #Cached and thrown away together with the chunk
+    def chunk_outline(self, cx, cy):
+        if (cx, cy) not in self.outline_cache:
+            baked = self.render_cache[(cx, cy)] if (cx, cy) in self.render_cache else self.bake_chunk(cx, cy)
+            outline = None
+            if baked is not None:
+                mask = pygame.mask.from_surface(baked)
+                outline = (bake_outline(mask, rle=True), mask)
+            self.outline_cache[(cx, cy)] = outline
+        return self.outline_cache[(cx, cy)]
+
+    #(screen position, outline, mask) of every visible chunk with something in it
+    def chunk_outlines(self, size, offset=(0, 0)):
+        outlines = []
+        for cx, cy, pos in self.visible_chunks(size, offset):
+            outline = self.chunk_outline(cx, cy)
+            if outline is not None:
+                outlines.append((pos, outline[0], outline[1]))
+        return outlines
+
+    #bakes every chunk (and its outline) that can show something right away instead of on first
+    #sight. The level loader does this off the main thread so a freshly swapped in map never bakes mid frame
+    def prebake(self):
+        chunk_px = CHUNK_SIZE * self.tile_size
+        reach = self.overflow_tiles() * self.tile_size
+        areas = [entry[2] for entry in self.offgrid_entries.values()]
+        for (cx, cy) in self.chunks:
+            areas.append(pygame.Rect(cx * chunk_px, cy * chunk_px, chunk_px + reach, chunk_px + reach))
+
+        keys = set()
+        for rect in areas:
+            for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1):
+                for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1):
+                    keys.add((cx, cy))
+        scratch = pygame.Surface((1, 1), pygame.SRCALPHA)
+        for key in keys:
+            if key not in self.render_cache:
+                self.bake_chunk(key[0], key[1])
+            outline = self.chunk_outline(key[0], key[1])
+            #the first blit is what run length encodes the outline, get that done here too
+            if outline is not None:
+                scratch.blit(outline[0], (0, 0))
@@ -1,48 +1,82 @@
-import os
-import fnmatch
-import pygame
-
-BASE_IMG_PATH = 'data/images/'
-
-#helper methods that load in image assets 
-def load_image(path):
-    image = pygame.image.load(BASE_IMG_PATH + path).convert()
-    #im not happy with this.. but were running out of time...
-    #accidentally used a different background color for the idle player 2 sprite
-    if fnmatch.fnmatch(path, 'entities/player2/idle/*'):
-        image.set_colorkey((255,255,255))
-    else:
-        image.set_colorkey((0, 0, 0))
-    return image
-
-def load_images(path):
-    images = []
-    try:
-        for img_name in sorted(os.listdir(BASE_IMG_PATH + path)):
-            images.append(load_image(path + '/' + img_name))
-    except Exception as e:
-        print(f"Failed to load {BASE_IMG_PATH + path}") 
-    return images
-
-
-class Animation:
-    def __init__(self, images, img_dur=5, loop=True):
-        self.images = images
-        self.loop = loop
-        self.img_duration = img_dur
-        self.done = False
-        self.frame = 0
-    
-    def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
-    
-    def update(self):
-        if self.loop:
-            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
-        else:
-            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
-                self.done = True
-    
-    def img(self):
-        return self.images[int(self.frame / self.img_duration)]
\ No newline at end of file
+import os
+import threading
+
+import pygame
+
+from scripts.atlas import Atlas, colorkey_for
+
+BASE_IMG_PATH = 'data/images/'
+BASE_SFX_PATH = 'data/sfx/'
+
+#all the images packed into a couple of sheets, built (or loaded from data/cache) on first use.
+#If that fails for whatever reason we fall back to loading the pngs one by one.
+#Locked since the asset prefetcher can get here first from its own thread
+atlas = None
+atlas_lock = threading.Lock()
+
+def get_atlas():
+    global atlas
+    if atlas is None:
+        with atlas_lock:
+            if atlas is None:
+                try:
+                    atlas = Atlas(BASE_IMG_PATH)
+                except Exception as e:
+                    print(f"Failed to build texture atlas, loading images one by one ({e})")
+                    atlas = False
+    return atlas
+
+#helper methods that load in image assets 
+def load_image(path):
+    if get_atlas() and path in atlas:
+        return atlas.image(path)
+    image = pygame.image.load(BASE_IMG_PATH + path).convert()
+    image.set_colorkey(colorkey_for(path))
+    return image
+
+def load_images(path):
+    images = []
+    try:
+        names = get_atlas().listdir(path) if get_atlas() else None
+        if names is None:
+            names = sorted(os.listdir(BASE_IMG_PATH + path))
+        for img_name in names:
+            images.append(load_image(path + '/' + img_name))
+    except Exception as e:
+        print(f"Failed to load {BASE_IMG_PATH + path}") 
+    return images
+
+
+class Animation:
+    def __init__(self, images, img_dur=5, loop=True):
+        self.images = images
+        self.loop = loop
+        self.img_duration = img_dur
+        self.done = False
+        self.frame = 0
+    
+    def copy(self):
+        return Animation(self.images, self.img_duration, self.loop)
+    
+    def update(self):
+        if self.loop:
+            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
+        else:
+            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
+            if self.frame >= self.img_duration * len(self.images) - 1:
+                self.done = True
+    
+    def img(self):
+        return self.images[int(self.frame / self.img_duration)]
+
+#stands in for pygame.mixer.Sound when there's no audio device (headless runs) or a file is missing
+class NullSound:
+    def play(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+